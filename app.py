@@ -4,20 +4,36 @@ import pandas as pd
 import logging
 import json
 import datetime
+from functools import partial
+from pathlib import Path
 
 # Import files
 from utils.helper_functions import (
-    built_prompt_rows,  
     apply_config_func,
     create_feedback_prompt,
-    create_grading_prompt,
     process_model_response,
     load_json,
     combine_students,
     pick_random_student
     )
 
-from utils.excel_export import ExcelExporter
+from utils.excel_export import iter_store_records, new_export_paths
+from utils.results_store import EDITABLE_COLUMNS
+from utils.batch_grading import StudentBatchEngine
+from utils.confidence import SelfConsistency, DEFAULT_MAX_SAMPLES
+from utils.grading_engine import GradingEngine, DEFAULT_CONCURRENCY
+from utils.cascade_grading import CascadeEngine
+from utils.job_runner import get_job_runner, submit_grading_job, submit_ingest_job, submit_export_job
+from utils.app_cache import (
+    load_defaults_cached,
+    set_assignment,
+    invalidate_assignment,
+    new_results_store,
+    student_prompt_rows,
+    cached_custom_model,
+    cached_model_fallback,
+    cached_model_cascade
+    )
 
 try:
     from utils.helper_functions import save_config_func
@@ -27,7 +43,7 @@ except ImportError as e:
     def save_config_func():
         st.session_state.save_config = True
         st.session_state.apply_config = False
-        st.session_state.df = None
+        st.session_state.results_store = None
     
 try:
     from utils.helper_functions import combine_students
@@ -46,8 +62,8 @@ except ImportError as e:
     students = combine_students("sample/students/student_a.json", "sample/students/student_b.json")
     rubric = load_json("sample/rubric.json")
 
-from model_manager.custom_model import CustomModel
-from model_manager.model_fallback import ModelFallback
+from model_manager.hedging import is_valid_grade
+from model_manager.usage_tracker import get_usage_tracker, track_run, usage_scope
 
 # Set page configuration
 st.set_page_config(
@@ -63,12 +79,27 @@ defaults = {
     "students": None,
     "apply_config": False,
     "save_config": False,
-    "df": None,
     "final_df": None,
     "feedback_length": "Standard",
     "custom_model_flag": False,
     "custom_model_name": None,
-    "s_id": None
+    "s_id": None,
+    "bypass_cache": False,
+    "batch_questions": False,
+    "results_store": None,
+    "job_id": None,
+    "graded_job": None,
+    "assignment_key": None,
+    "ingest_job_id": None,
+    "ingest_signature": None,
+    "ingested_job": None,
+    "export_job_id": None,
+    "session_job_ids": [],
+    "confidence_threshold": 90,
+    "confidence_sampling": False,
+    "model_cascade": False,
+    "review_version": 0,
+    "review_errors": []
 }
 
 for k, v in defaults.items():
@@ -76,9 +107,266 @@ for k, v in defaults.items():
 
 # load sample data
 if st.session_state.gt is None or st.session_state.students is None or st.session_state.rubric is None:
-    st.session_state.gt, st.session_state.students, st.session_state.rubric = load_defaults()
+    set_assignment(*load_defaults_cached())
+
+EXPORT_MIME = {
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".csv": "text/csv",
+    ".parquet": "application/vnd.apache.parquet",
+}
+REVIEW_PAGE_SIZES = [25, 50, 100, 250]
+
+
+def custom_model():
+    """The CustomModel for the name, API key and endpoint URL in the settings."""
+    return cached_custom_model(
+        st.session_state.custom_model_api,
+        st.session_state.custom_model_name,
+        endpoint_url=st.session_state.get("custom_model_url") or None
+        )
+
+
+def grading_calls():
+    """Async grading and feedback calls for the model selected in the settings."""
+    if st.session_state.custom_model_flag:
+        CM = custom_model()
+        feedback_call = partial(CM.async_model_pipeline, bypass_cache=st.session_state.bypass_cache)
+        return partial(feedback_call, validate=is_valid_grade), feedback_call
+
+    MF = cached_model_fallback()
+    grading_call = partial(
+        MF.async_call_with_fallback,
+        bypass_cache=st.session_state.bypass_cache,
+        validate=is_valid_grade
+        )
+    feedback_call = partial(MF.async_call_with_fallback, bypass_cache=st.session_state.bypass_cache)
+    return grading_call, feedback_call
+
+
+def confidence_scoring():
+    """Self-consistency settings for the grading engines, or None when confidence scoring is off."""
+    return SelfConsistency() if st.session_state.confidence_sampling else None
+
+
+def build_grading_engine(grading_call, concurrency=DEFAULT_CONCURRENCY):
+    """Grading engine for the settings: one request per student, a model cascade, or one request per answer."""
+    confidence = confidence_scoring()
+    if st.session_state.batch_questions:
+        return StudentBatchEngine(grading_call, concurrency=concurrency, confidence=confidence)
+    if st.session_state.model_cascade and not st.session_state.custom_model_flag:
+        tiers = cached_model_cascade().calls(bypass_cache=st.session_state.bypass_cache, validate=is_valid_grade)
+        return CascadeEngine(
+            tiers, concurrency=concurrency, confidence=confidence,
+            escalate_below=st.session_state.confidence_threshold / 100
+            )
+    return GradingEngine(grading_call, concurrency=concurrency, confidence=confidence)
+
+
+def start_grading_job():
+    """Grade every script in a background job, so reruns and clicks do not interrupt the run."""
+    store = new_results_store()
+    apply_config_func(store)
+    grading_call, feedback_call = grading_calls()
+    engine = build_grading_engine(grading_call)
+    job = submit_grading_job(
+        get_job_runner(),
+        engine,
+        store.rows(),
+        name=f"Grading {len(st.session_state.students)} scripts",
+        feedback_call=feedback_call,
+        question_ids=[q.get("id") for q in st.session_state.gt.get("questions", [])],
+        feedback_length=st.session_state.feedback_length,
+        store=store
+        )
+    st.session_state.job_id = job.id
+    st.session_state.session_job_ids.append(job.id)
+
+
+UPLOAD_KEYS = {"scripts": "key_uploaded_scripts", "rubric": "key_uploaded_rubric", "gt": "key_uploaded_gt"}
+
+
+def sync_uploads():
+    """Read newly uploaded documents in a background job; go back to the sample data when all are removed."""
+    uploads = {kind: st.session_state.get(key) or [] for kind, key in UPLOAD_KEYS.items()}
+    signature = tuple(
+        (kind, getattr(file, "file_id", file.name), file.size) for kind, files in uploads.items() for file in files
+        )
+    if signature == st.session_state.ingest_signature:
+        return
+    st.session_state.ingest_signature = signature
+    if not signature:
+        st.session_state.ingest_job_id = None
+        set_assignment(*load_defaults_cached())
+        return
+
+    job = submit_ingest_job(
+        get_job_runner(),
+        {kind: [(file.name, file.getvalue()) for file in files] for kind, files in uploads.items()},
+        load_defaults_cached(),
+        name=f"Reading {len(signature)} documents"
+        )
+    st.session_state.ingest_job_id = job.id
+    st.session_state.session_job_ids.append(job.id)
+
+
+@st.fragment(run_every=1)
+def ingest_progress():
+    """Poll the document-reading job until it finishes."""
+    job = get_job_runner().get(st.session_state.ingest_job_id)
+    if job is None:
+        return
+    snapshot = job.snapshot()
+    st.progress(
+        snapshot["progress"] or 0.0,
+        text=f"Reading documents: {snapshot['done']} / {snapshot['total']} ({snapshot['elapsed_seconds']}s)"
+        )
+    if not job.is_active:
+        st.rerun()
+
+
+def start_export_job():
+    """Write the reviewed results to Excel, CSV and Parquet in a background job that reads the store in chunks."""
+    store = st.session_state.results_store
+    job = submit_export_job(
+        get_job_runner(),
+        iter_store_records(store),
+        new_export_paths(),
+        total=len(store),
+        feedback=store.feedback(),
+        name=f"Exporting {len(store)} results"
+        )
+    st.session_state.export_job_id = job.id
+    st.session_state.session_job_ids.append(job.id)
+
+
+@st.fragment(run_every=1)
+def export_progress():
+    """Poll the export job until the report files are written."""
+    job = get_job_runner().get(st.session_state.export_job_id)
+    if job is None:
+        return
+    snapshot = job.snapshot()
+    st.progress(snapshot["progress"] or 0.0, text=f"Writing report: {snapshot['done']} / {snapshot['total']} rows")
+    if not job.is_active:
+        st.rerun()
+
+
+def reset_review_page(key):
+    st.session_state[f"{key}_page"] = 1
+
+
+def review_filters(store, key, review_only=False):
+    """Filter controls for the review grid; returns the matching entry indices of the store.
+
+    With review_only the low-confidence filter is always on, so auto-published answers are hidden.
+    """
+    student_col, question_col, confidence_col, changed_col = st.columns([2, 2, 1, 1])
+    student = student_col.text_input(
+        "Student", placeholder="Search student id", key=f"{key}_student",
+        on_change=reset_review_page, args=(key,)
+        )
+    questions = question_col.multiselect(
+        "Questions", store.q_ids.astype(str).tolist(), key=f"{key}_questions",
+        on_change=reset_review_page, args=(key,)
+        )
+    if review_only:
+        st.session_state[f"{key}_low_confidence"] = True
+    low_confidence = confidence_col.toggle(
+        "Low confidence", key=f"{key}_low_confidence", on_change=reset_review_page, args=(key,),
+        disabled=review_only,
+        help=f"Answers not graded at or above the {st.session_state.confidence_threshold}% confidence threshold"
+        )
+    changed = changed_col.toggle(
+        "Score changed", key=f"{key}_changed", on_change=reset_review_page, args=(key,),
+        help="Answers whose marks you changed"
+        )
+    threshold = st.session_state.confidence_threshold / 100 if low_confidence else None
+    return store.filter_positions(student, questions, threshold, changed)
+
 
-excel = ExcelExporter()
+def review_page(positions, key):
+    """Page controls for the review grid; returns the entry indices on the current page."""
+    size_col, page_col, info_col = st.columns([1, 1, 4])
+    page_size = size_col.selectbox(
+        "Rows per page", REVIEW_PAGE_SIZES, index=1, key=f"{key}_page_size",
+        on_change=reset_review_page, args=(key,)
+        )
+    pages = max(-(-len(positions) // page_size), 1)
+    # Keep the page in range when the results shrink, before the widget reads it
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        reset_review_page(key)
+    page = page_col.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    info_col.markdown("")
+    info_col.caption(
+        f"Showing {min(start + 1, len(positions))}-{min(start + page_size, len(positions))} "
+        f"of {len(positions)} answers ({pages} pages)"
+        )
+    return positions[start:start + page_size]
+
+
+def commit_review_edits(store, positions, editor_key):
+    """Apply the cells edited on one page of the review grid to the results store."""
+    errors = []
+    for row, changes in st.session_state[editor_key]["edited_rows"].items():
+        for column, value in changes.items():
+            try:
+                store.apply_edit(int(positions[int(row)]), column, value)
+            except ValueError as e:
+                errors.append(str(e))
+    st.session_state.review_errors = errors
+    # A new editor key starts the next page render from the store, with no stale delta
+    st.session_state.review_version += 1
+
+
+def review_grid(store, key, editable=False, review_only=False):
+    """Filtered, paginated view of the results store. Only the current page is sent to the
+    browser, and only the edited cells of that page are written back to the store."""
+    positions = review_filters(store, key, review_only=review_only)
+    page_positions = review_page(positions, key)
+    table = store.review_table(page_positions)
+    column_config = {
+        "Confidence": st.column_config.NumberColumn(format="%.0f%%"),
+        "Marks Awarded": st.column_config.NumberColumn(min_value=0),
+    }
+    if not editable:
+        st.dataframe(table, hide_index=True, column_config=column_config)
+        return
+
+    editor_key = f"{key}_editor_{st.session_state.review_version}_{hash(page_positions.tobytes())}"
+    st.data_editor(
+        table,
+        key=editor_key,
+        hide_index=True,
+        column_config=column_config,
+        disabled=[column for column in table.columns if column not in EDITABLE_COLUMNS],
+        on_change=commit_review_edits,
+        args=(store, page_positions, editor_key)
+        )
+    for error in st.session_state.review_errors:
+        st.error(error)
+
+
+@st.fragment(run_every=1)
+def grading_progress():
+    """Poll the background grading job and show the results received so far."""
+    job = get_job_runner().get(st.session_state.job_id)
+    if job is None:
+        st.warning("The grading job could not be found. Please generate the results again.")
+        return
+
+    snapshot = job.snapshot()
+    st.progress(
+        snapshot["progress"] or 0.0,
+        text=f"Graded {snapshot['done']} / {snapshot['total']} answers, "
+             f"{snapshot['feedback']} feedback written ({snapshot['elapsed_seconds']}s)"
+        )
+    st.button("Cancel Grading", on_click=get_job_runner().cancel, args=(job.id,), key="key_button_cancel")
+    review_grid(job.store, "key_live")
+
+    if not job.is_active:
+        # Rerun the whole app to swap the live view for the editable table
+        st.rerun()
 
 # Sidebar
 with st.sidebar:
@@ -97,6 +385,34 @@ with st.sidebar:
                 3. **Publish**: Finalise and publish the reviewed result.
                 """)
     st.markdown("---")
+    st.markdown("## Model Health")
+    for health in cached_model_fallback().provider_health():
+        if health["state"] == "closed":
+            st.markdown(f"🟢 **{health['provider']}** - healthy")
+        elif health["state"] == "half_open":
+            st.markdown(f"🟡 **{health['provider']}** - probing")
+        else:
+            st.markdown(f"🔴 **{health['provider']}** - unavailable, retry in {health['retry_in_seconds']}s")
+    st.markdown("---")
+    st.markdown("## Token Usage")
+    usage = get_usage_tracker().summary()
+    st.markdown(f"**{usage['calls']}** model calls since app start")
+    st.markdown(
+        f"Prompt: {usage['prompt_tokens']:,.0f} ({usage['cached_tokens']:,.0f} cached)  \n"
+        f"Completion: {usage['completion_tokens']:,.0f}  \n"
+        f"Est. cost: ${usage['cost_usd']:.4f}"
+        )
+    if usage["oversized_prompts"]:
+        st.markdown(f"⚠️ {len(usage['oversized_prompts'])} oversized prompt(s) flagged")
+    st.markdown("---")
+    # The job runner is shared by every session, so only this session's jobs are listed
+    jobs = get_job_runner().list_jobs(st.session_state.session_job_ids)
+    st.session_state.session_job_ids = [job["id"] for job in jobs]
+    if jobs:
+        st.markdown("## Background Jobs")
+        for job in jobs:
+            st.markdown(f"**{job['name']}** - {job['status']} ({job['done']} / {job['total']})")
+        st.markdown("---")
     st.markdown("## Contact")
     st.markdown("Nura")
     st.markdown('<a href="mailto:nura.jamil@gmail.com">📧 Email Me</a>', unsafe_allow_html=True)
@@ -144,7 +460,8 @@ with tab1:
             type=["txt", "pdf", "docx"], 
             accept_multiple_files=True,
             label_visibility="collapsed",
-            key="key_uploaded_scripts"
+            key="key_uploaded_scripts",
+            on_change=invalidate_assignment
             )
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -155,7 +472,8 @@ with tab1:
         type=["txt", "pdf", "docx"], 
         accept_multiple_files=True,
         label_visibility="collapsed",
-        key="key_uploaded_rubric"
+        key="key_uploaded_rubric",
+        on_change=invalidate_assignment
         )
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -166,10 +484,33 @@ with tab1:
         type=["txt", "pdf", "docx"], 
         accept_multiple_files=True,
         label_visibility="collapsed",
-        key="key_uploaded_gt"
+        key="key_uploaded_gt",
+        on_change=invalidate_assignment
         )
         st.markdown("</div>", unsafe_allow_html=True)
 
+        # Uploaded documents are read in the background and replace the sample data once parsed
+        sync_uploads()
+        ingest_job = get_job_runner().get(st.session_state.ingest_job_id) if st.session_state.ingest_job_id else None
+        if ingest_job is not None and ingest_job.is_active:
+            ingest_progress()
+        elif ingest_job is not None:
+            if ingest_job.finished_ok and st.session_state.ingested_job != ingest_job.id:
+                set_assignment(*ingest_job.stats["assignment"])
+                st.session_state.ingested_job = ingest_job.id
+            if ingest_job.finished_ok:
+                extraction = ingest_job.stats["extraction"]
+                st.success(
+                    f"Read {extraction['files']} documents ({extraction['cached']} from cache): "
+                    f"{len(st.session_state.students)} scripts, "
+                    f"{len(st.session_state.gt.get('questions', []))} questions."
+                    )
+            else:
+                st.error(f"Could not read the uploaded documents: {ingest_job.error or ingest_job.status}")
+            for record in ingest_job.results_since(0):
+                if record["error"] is not None:
+                    st.warning(f"Could not read {record['name']}: {record['error']}")
+
         # Step 4: Edit advanced settings
         st.markdown("<div class='field-title'>4. Edit Advance Settings (Optional)</div>", unsafe_allow_html=True)
         with st.expander("4. Advance Settings", expanded=False):
@@ -209,11 +550,21 @@ with tab1:
                 "Confidence Threshold (%)", 
                 min_value=0, 
                 max_value=100, 
-                value=90,
                 step=1,
-                label_visibility="collapsed"
+                label_visibility="collapsed",
+                key="confidence_threshold"
+                )
+            st.info(
+                f"Current confidence threshold is set to **{confidence_threshold}%**. "
+                "Grades below it are flagged as low confidence for review."
+                )
+            st.toggle(
+                "Score confidence by resampling each grade until two samples agree",
+                key="confidence_sampling",
+                help="Each answer is graded at least twice, so grading costs at least double; answers the model "
+                     f"disagrees with itself on are sampled up to {DEFAULT_MAX_SAMPLES} times. Without it, only "
+                     "providers that return token probabilities give grades a confidence score."
                 )
-            st.info(f"Current confidence threshold is set to **{confidence_threshold}%**.")
             st.markdown("</div>", unsafe_allow_html=True)
 
             # Step 4.4: Enable auto-publish
@@ -226,17 +577,50 @@ with tab1:
                 )
             if auto_publish == True:
                 auto_text = "Auto-publish is **enabled**. Results that meet the confidence threshold will be automatically reviewed and published by the AI system."
+                if not st.session_state.confidence_sampling:
+                    auto_text += " Turn on confidence scoring above, or most grades will have no confidence score to meet it."
             else:
                 auto_text = "Auto-publish is **disabled**. You will need to manually review all results."
             st.info(auto_text)               
             st.markdown("</div>", unsafe_allow_html=True)
 
+            # Step 4.5: Bypass response cache
+            st.markdown("<div class='field-title'>5. Bypass Response Cache</div>", unsafe_allow_html=True)
+            st.toggle(
+                "Always request fresh responses instead of reusing cached ones",
+                key="bypass_cache"
+                )
+            st.markdown("</div>", unsafe_allow_html=True)
+
+            # Step 4.6: Batch questions per student
+            st.markdown("<div class='field-title'>6. Batch Questions</div>", unsafe_allow_html=True)
+            st.toggle(
+                "Grade all of a student's questions in a single request",
+                key="batch_questions"
+                )
+            st.markdown("</div>", unsafe_allow_html=True)
+
+            # Step 4.7: Model cascade
+            st.markdown("<div class='field-title'>7. Model Cascade</div>", unsafe_allow_html=True)
+            tiers = " → ".join(cached_model_cascade().models().values())
+            st.toggle(
+                "Grade with the cheapest model first and escalate only when needed",
+                key="model_cascade",
+                disabled=st.session_state.batch_questions or st.session_state.custom_model_flag,
+                help=f"Tiers: {tiers}. An answer moves to the next tier when its grade is invalid, below the "
+                     "confidence threshold (from token probabilities, or sampling when confidence scoring is on), "
+                     "borderline (40-60% of the marks), or when a tier without token probabilities disagrees "
+                     "with itself on a second sample. Not used with batched questions or a custom model."
+                )
+            st.markdown("</div>", unsafe_allow_html=True)
+
         # Step 5: Preview AI output
         st.markdown("---")
         st.markdown("<div class='field-title'>5. Click To Preview AI Output", unsafe_allow_html=True)
         preview = st.button("Preview", key="key_button_review")
-        prompt_rows = built_prompt_rows(st.session_state.gt, st.session_state.students, st.session_state.rubric)
-        print(f"Prompt rows generated: {prompt_rows}")
+        if preview:
+            st.session_state.s_id = pick_random_student(st.session_state.students)
+            student_rows = student_prompt_rows(st.session_state.s_id)
                 
         left, right = st.columns(2)
 
@@ -248,14 +632,11 @@ with tab1:
                 st.markdown("---")
 
                 if preview:
-                    st.session_state.s_id = pick_random_student(st.session_state.students)
-                    for row in prompt_rows:
-                        s_id = row.get("s_id")
-                        if s_id == st.session_state.s_id:
-                            st.markdown(f"Q{row.get('q_id')}. {row.get('q_text')}")
-                            st.markdown("**Answer:**")
-                            st.markdown(f"**{row.get('s_answer', 'No answers provided.')}**")
-                            st.markdown("---")
+                    for row in student_rows:
+                        st.markdown(f"Q{row.get('q_id')}. {row.get('q_text')}")
+                        st.markdown("**Answer:**")
+                        st.markdown(f"**{row.get('s_answer', 'No answers provided.')}**")
+                        st.markdown("---")
 
 
         with right:
@@ -265,52 +646,40 @@ with tab1:
                 st.markdown("---")
                 if preview:
 
-                    with st.spinner("Running preview..."):
-                        grading_set = []
-
-                        # 1. Grading
-                        for i, prompt in enumerate(prompt_rows):
-                            s_id = prompt.get("s_id")
-                            q_id = prompt.get("q_id")
-                            if s_id == st.session_state.s_id:
-                                system_prompt, user_prompt = create_grading_prompt(prompt)
-                                st.markdown(f"Q{q_id}")
-
-                                try:
-                                    if st.session_state.custom_model_flag:
-                                        CM = CustomModel(
-                                            st.session_state.custom_model_api, 
-                                            st.session_state.custom_model_name
-                                            )
-                                        response = CM.model_pipeline(system_prompt, user_prompt)
-                                    else:
-                                        MF = ModelFallback()
-                                        response = MF.call_with_fallback(system_prompt, user_prompt)
-
-                                    if response is None:
-                                        response = {
-                                        "marks_awarded": 10,
-                                        "max_marks": 10, 
-                                        "reasoning": "Correct application, clear working, and correct answer. Full marks as per rubric."
-                                        }
-                                    parsed = process_model_response(response)
-                                    grading_set.append(parsed)
-                                    st.markdown("---")
-                                
-                                except Exception as e:
-                                    fallback = {
-                                        "marks_awarded": 10,
-                                        "max_marks": 10, 
-                                        "reasoning": "Correct application, clear working, and correct answer. Full marks as per rubric."
-                                    }
-                                    parsed = process_model_response(fallback)
-                                    print(f"Default parsed response: {parsed}")
-                                    grading_set.append(fallback)
-                                    st.markdown("---")
-                            
-                            
+                    with st.spinner("Running preview..."), track_run() as preview_usage, usage_scope(s_id=st.session_state.s_id):
+                        # 1. Grading - all questions of the student are sent concurrently
+                        grading_call, _ = grading_calls()
+
+                        engine = build_grading_engine(grading_call, concurrency=max(len(student_rows), 1))
+
+                        # Each question's grade is rendered into its own slot as soon as it completes
+                        placeholders = {}
+                        for row in student_rows:
+                            st.markdown(f"Q{row.get('q_id')}")
+                            placeholders[row.get("q_id")] = st.empty()
+                            placeholders[row.get("q_id")].markdown("_Grading..._")
+                            st.markdown("---")
+
+                        parsed_grades = {}
+                        def show_grade(result):
+                            response = result["response"]
+                            if result["error"] is not None or response is None:
+                                response = {
+                                "marks_awarded": 10,
+                                "max_marks": 10, 
+                                "reasoning": "Correct application, clear working, and correct answer. Full marks as per rubric."
+                                }
+                            with placeholders[result["q_id"]].container():
+                                parsed_grades[result["index"]] = process_model_response(response)
+                                if result.get("confidence") is not None:
+                                    st.caption(f"Confidence: {result['confidence']:.0%} ({result['samples']} samples)")
+                                if result.get("tier") is not None:
+                                    st.caption(f"Graded by the {result['tier']} tier")
+
+                        results = engine.run(student_rows, on_result=show_grade)
+                        grading_set = [parsed_grades[result["index"]] for result in results]
                         
-                        # 2. Feedback
+                        # 2. Feedback - streamed so the text appears as it is generated
                         st.markdown("**Overall Feedback:**")
                         system_prompt, user_prompt = create_feedback_prompt(
                             grading_set,
@@ -319,20 +688,22 @@ with tab1:
 
                         try:
                             if st.session_state.custom_model_flag:
-                                CM = CustomModel(
-                                        st.session_state.custom_model_api, 
-                                        st.session_state.custom_model_name
+                                CM = custom_model()
+                                stream = CM.model_pipeline(
+                                    system_prompt, user_prompt, bypass_cache=st.session_state.bypass_cache, stream=True
                                     )
-                                response = CM.model_pipeline(system_prompt, user_prompt)
                             else:
-                                MF = ModelFallback()
-                                response = MF.call_with_fallback(system_prompt, user_prompt)
+                                MF = cached_model_fallback()
+                                stream = MF.call_with_fallback(
+                                    system_prompt, user_prompt, bypass_cache=st.session_state.bypass_cache, stream=True
+                                    )
+                            response = st.write_stream(stream)
                             
-                            if response is None:
+                            if not response:
                                 response =  """
                                             Great effort on this assignment! You demonstrated a solid understanding of the key concepts.
                                             """
-                            st.markdown(response)
+                                st.markdown(response)
                         
                         except Exception as e:
                             st.markdown("**Overall Feedback (Sample):**")
@@ -340,6 +711,17 @@ with tab1:
                                 Great effort on this assignment! You demonstrated a solid understanding of the key concepts.
                                 """)
                         
+                    usage = preview_usage.summary()
+                    st.caption(
+                        f"Preview usage: {usage['calls']} calls, {usage['prompt_tokens']:,.0f} prompt tokens "
+                        f"({usage['cached_tokens']:,.0f} cached), {usage['completion_tokens']:,.0f} completion tokens, "
+                        f"est. ${usage['cost_usd']:.4f}"
+                        )
+                    for entry in usage["oversized_prompts"]:
+                        st.warning(
+                            f"Prompt for Q{', Q'.join(entry['q_ids']) or '?'} is ~{entry['estimated_prompt_tokens']:,} tokens, "
+                            f"over the {entry['provider']} limit of {entry['limit']:,}."
+                            )
                                     
                                     
         st.markdown("---")
@@ -364,18 +746,62 @@ with tab2:
         st.info("Please **save your configuration** before proceeding to review the results.")
         st.markdown("")
     else:
-        st.button("Generate Results", on_click=apply_config_func, disabled=st.session_state.apply_config, key="key_button_apply")
+        st.button("Generate Results", on_click=start_grading_job, disabled=st.session_state.apply_config, key="key_button_apply")
         st.markdown("")
         st.info("Click to generate and review the results.")
         st.markdown("")
-    if st.session_state.apply_config:
-        st.info("Double click on the cells to edit. Press Enter to save changes.")
+    job = get_job_runner().get(st.session_state.job_id) if st.session_state.job_id else None
+    if st.session_state.apply_config and job is not None and job.is_active:
+        st.info("Grading runs in the background, so you can keep using the app. Results appear below as they arrive.")
+        grading_progress()
+
+    elif st.session_state.apply_config:
+        store = st.session_state.results_store
+        if job is not None and st.session_state.graded_job != job.id:
+            # First run after the job finished
+            st.session_state.graded_job = job.id
+            if job.status == "cancelled":
+                st.warning("Grading was cancelled. Answers that were not graded are marked as pending.")
+            elif job.status == "failed":
+                st.error(f"Grading failed: {job.error}")
+        if job is not None and "cascade" in job.stats:
+            cascade = job.stats["cascade"]
+            with st.expander("Model Cascade"):
+                st.dataframe(
+                    pd.DataFrame([
+                        {"Tier": name, "Attempts": tier["attempts"], "Accepted": tier["accepted"],
+                         "Hit Rate": tier["hit_rate"], "Share of Answers": tier["share_of_rows"],
+                         **{f"Escalated ({reason.replace('_', ' ')})": count for reason, count in tier["escalated"].items()},
+                         "Verified": tier["verified"],
+                         "Mean Latency (s)": tier["mean_latency"], "Cost ($)": tier["cost_usd"]}
+                        for name, tier in cascade["tiers"].items()
+                        ]),
+                    hide_index=True
+                    )
+                estimate = cascade.get("last_tier_only_estimate")
+                if estimate is not None:
+                    st.caption(
+                        f"Cascade cost ${cascade['cost_usd']:.4f} vs. an estimated ${estimate['cost_usd']:.4f} "
+                        f"grading every answer on the last tier."
+                        )
+
+        st.info("Double click on the Marks Awarded, Reasoning or Feedback cells to edit. Press Enter to save changes.")
         st.markdown("")
 
-        #st.session_state.df = review_table(prompt_rows)
-        edited_df = st.data_editor(st.session_state.df, key="key_editor_df", hide_index=True)
+        auto_publish = st.session_state.get("key_auto_publish", False)
+        if auto_publish:
+            counts = store.review_counts(st.session_state.confidence_threshold / 100)
+            st.info(
+                f"**{counts['auto_published']}** answers met the {st.session_state.confidence_threshold}% confidence "
+                f"threshold and are auto-published. **{counts['needs_review']}** answers need your review."
+                )
+        review_grid(store, "key_review", editable=True, review_only=auto_publish)
+        st.caption(f"{len(store.edit_log)} edits, {store.changed_count()} scores changed")
+        if store.edit_log:
+            with st.expander(f"Edit Log ({len(store.edit_log)} changes)"):
+                edits = pd.DataFrame(store.edit_log[::-1]).astype({"old": "string", "new": "string"})
+                st.dataframe(edits, hide_index=True)
         st.warning("Please review the AI output. Make sure the output is accurate before proceeding to publish.")
-        st.session_state.df = edited_df
 
     st.write("---")
     st.write("Updated on:", pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"))
@@ -391,17 +817,33 @@ with tab3:
     else:
         st.info("Confirm the results below before publishing.")
         st.markdown("")
-#        excel_data = excel.create_excel_report(st.session_state.df)
-#        if excel_data:
-#            st.download_button(
-#                "Download Excel Report",
-#                data = excel_data,
-#                file_name = f"grading_report.xlsx",
-#                mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-#            )
-        st.dataframe(st.session_state.df, hide_index=True)
+        review_grid(st.session_state.results_store, "key_publish")
+
+        # The report is written to disk in the background; files are only read when downloaded
+        st.button("Prepare Report", on_click=start_export_job, key="key_button_export")
+        export_job = get_job_runner().get(st.session_state.export_job_id) if st.session_state.export_job_id else None
+        if export_job is not None and export_job.is_active:
+            export_progress()
+        elif export_job is not None and export_job.finished_ok:
+            for path in map(Path, export_job.stats["export"]["files"]):
+                st.download_button(
+                    f"Download {path.suffix[1:].upper()} Report",
+                    data=path.read_bytes,
+                    file_name=path.name,
+                    mime=EXPORT_MIME[path.suffix],
+                    key=f"key_download_{path.suffix[1:]}"
+                    )
+        elif export_job is not None:
+            st.error(f"Could not write the report: {export_job.error or export_job.status}")
         if st.button("Publish"):
-            st.success("The results have been published successfully!")
+            if st.session_state.get("key_auto_publish", False):
+                counts = st.session_state.results_store.review_counts(st.session_state.confidence_threshold / 100)
+                st.success(
+                    f"The results have been published successfully! {counts['auto_published']} auto-published, "
+                    f"{counts['reviewed']} reviewed, {counts['needs_review']} awaiting review."
+                    )
+            else:
+                st.success("The results have been published successfully!")
         
 
     st.write("---")
@@ -0,0 +1,357 @@
+"""Headless batch grading.
+
+Example:
+    python -m batch --gt sample/gt.json --rubric sample/rubric.json \
+        --submissions sample/students --output results.jsonl --concurrency 16 --export report.xlsx
+"""
+
+# Import files
+from utils.helper_functions import load_json
+from utils.batch_grading import StudentBatchEngine, QuestionBatchEngine, DEFAULT_TOKEN_BUDGET
+from utils.cascade_grading import CascadeEngine
+from utils.checkpoint_journal import CheckpointJournal, assignment_hash
+from utils.confidence import SelfConsistency, DEFAULT_SAMPLE_TEMPERATURE
+from utils.excel_export import (
+    EXPORT_FORMATS,
+    export_results,
+    iter_result_file,
+    read_feedback_file,
+    feedback_path_for
+    )
+from utils.feedback_pipeline import FeedbackPipeline
+from utils.grading_engine import GradingEngine, DEFAULT_CONCURRENCY
+from utils.response_parser import try_parse_grade
+from utils.submission_stream import stream_prompt_rows
+from model_manager.circuit_breaker import get_health_registry
+from model_manager.hedging import is_valid_grade
+from model_manager.model_cascade import ModelCascade, DEFAULT_CASCADE_TIERS
+from model_manager.model_fallback import ModelFallback, DEFAULT_PROVIDERS, FALLBACK_PROVIDERS, provider_names
+from model_manager.response_cache import get_response_cache
+from model_manager.usage_tracker import track_run
+
+# Import libraries
+from functools import partial
+from pathlib import Path
+import argparse
+import asyncio
+import csv
+import json
+import time
+
+PROVIDERS = ["fallback", "gpt", "deepseek", "gemini", "custom"]
+CASCADE_TIERS = ["gpt", "deepseek", "gemini"]
+RESULT_FIELDS = [
+    "s_id", "q_id", "marks_awarded", "max_marks", "reasoning",
+    "error", "latency", "provider", "tier", "shared_from", "confidence", "samples", "response"
+    ]
+FEEDBACK_FIELDS = ["s_id", "feedback", "error"]
+
+
+def build_call(args):
+    """Return the async (system_prompt, user_prompt) model call for the chosen provider,
+    plus the ModelFallback behind it (None for single providers)."""
+    if args.provider == "fallback":
+        MF = ModelFallback(providers=args.providers, hedge=args.hedge)
+        return partial(MF.async_call_with_fallback, bypass_cache=args.bypass_cache), MF
+    if args.provider == "gpt":
+        from model_manager.gpt_model import GPTModel
+        return GPTModel().async_model_pipeline, None
+    if args.provider == "deepseek":
+        from model_manager.deepseek_model import DeepseekModel
+        return DeepseekModel().async_model_pipeline, None
+    if args.provider == "gemini":
+        from model_manager.gemini_model import GeminiModel
+        return GeminiModel().async_model_pipeline, None
+
+    from model_manager.custom_model import CustomModel
+    if not (args.model and args.api_key):
+        raise SystemExit("--provider custom requires --model and --api-key")
+    CM = CustomModel(args.api_key, args.model, endpoint_url=args.endpoint)
+    return partial(CM.async_model_pipeline, bypass_cache=args.bypass_cache), None
+
+
+def parse_grade(response) -> dict:
+    """Best-effort parse of a grading response into a grade dict ({} when it holds none)."""
+    grade, _ = try_parse_grade(response)
+    return grade or {}
+
+
+class ResultWriter():
+    """Append records to a .jsonl or .csv file, flushing after every write."""
+
+    def __init__(self, path, fields, append=False):
+        self.path = Path(path)
+        self.fields = fields
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_header = not (append and self.path.exists() and self.path.stat().st_size > 0)
+        self.file = open(self.path, "a" if append else "w", newline="", encoding="utf-8")
+        self.csv_writer = None
+        if self.path.suffix == ".csv":
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=fields, extrasaction="ignore")
+            if write_header:
+                self.csv_writer.writeheader()
+
+    def write(self, record):
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(record)
+        else:
+            self.file.write(json.dumps({k: record.get(k) for k in self.fields}) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Progress():
+    """Print progress and throughput at most once per interval."""
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.done = 0
+        self.errors = 0
+
+    def update(self, error=False):
+        self.done += 1
+        self.errors += int(bool(error))
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            print(f"Graded {self.done} rows ({self.done / (now - self.start):.1f} rows/s, {self.errors} errors)")
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.start
+        return {
+            "rows": self.done,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(self.done / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+def to_record(result) -> dict:
+    parsed = parse_grade(result["response"])
+    return {
+        "s_id": result["s_id"],
+        "q_id": result["q_id"],
+        "marks_awarded": parsed.get("marks_awarded"),
+        "max_marks": parsed.get("max_marks", result.get("max_marks")),
+        "reasoning": parsed.get("reasoning"),
+        "error": result["error"],
+        "latency": round(result["latency"], 3),
+        "provider": result.get("provider"),
+        "tier": result.get("tier"),
+        "shared_from": result.get("shared_from"),
+        "confidence": None if result.get("confidence") is None else round(result["confidence"], 3),
+        "samples": result.get("samples"),
+        "response": result["response"] if not parsed else None,
+    }
+
+
+async def run_batch(args):
+    gt = load_json(args.gt)
+    rubric = load_json(args.rubric)
+    rows = stream_prompt_rows(gt, rubric, args.submissions)
+
+    journal = None
+    if args.journal:
+        journal = CheckpointJournal(args.journal, assignment_hash(gt, rubric))
+
+    call, fallback = build_call(args)
+    # Grading calls only accept (and cache) a response that parses to a grade
+    grade_call = partial(call, validate=is_valid_grade) if args.provider in ("fallback", "custom") else call
+    confidence = None
+    if args.samples > 1:
+        confidence = SelfConsistency(max_samples=args.samples, temperature=args.sample_temperature)
+    if args.mode == "student":
+        engine = StudentBatchEngine(grade_call, concurrency=args.concurrency, journal=journal, confidence=confidence)
+    elif args.mode == "question":
+        engine = QuestionBatchEngine(
+            grade_call, concurrency=args.concurrency, journal=journal,
+            batch_size=args.batch_size, token_budget=args.token_budget, confidence=confidence
+            )
+    elif args.cascade:
+        tiers = ModelCascade(args.tiers).calls(bypass_cache=args.bypass_cache, validate=is_valid_grade)
+        engine = CascadeEngine(
+            tiers, concurrency=args.concurrency, dedupe=args.dedupe, journal=journal, confidence=confidence,
+            escalate_below=args.confidence_threshold
+            )
+    else:
+        engine = GradingEngine(
+            grade_call, concurrency=args.concurrency, dedupe=args.dedupe, journal=journal, confidence=confidence
+            )
+    # When resuming from a journal, keep the rows already written by the interrupted run
+    writer = ResultWriter(args.output, RESULT_FIELDS, append=journal is not None)
+    feedback_path = feedback_path_for(args.output)
+    feedback_writer = ResultWriter(feedback_path, FEEDBACK_FIELDS, append=journal is not None) if args.feedback else None
+    progress = Progress()
+    auto_published = 0
+
+    def on_grade(result):
+        nonlocal auto_published
+        writer.write(to_record(result))
+        progress.update(error=result["error"])
+        if result["error"] is None and (result.get("confidence") or 0) >= args.confidence_threshold:
+            auto_published += 1
+
+    try:
+        if args.feedback:
+            # Each student's feedback starts as soon as their grades are in, overlapping the rest of the grading
+            pipeline = FeedbackPipeline(
+                engine, call, question_ids=[q.get("id") for q in gt.get("questions", [])],
+                feedback_length=args.feedback_length, journal=journal
+                )
+            await pipeline.run(rows, on_grade=on_grade, on_feedback=feedback_writer.write)
+        else:
+            async for result in engine.iter_grades(rows):
+                on_grade(result)
+    finally:
+        writer.close()
+        if feedback_writer is not None:
+            feedback_writer.close()
+
+    summary = progress.summary()
+    if args.dedupe and args.mode == "row":
+        summary["dedup"] = engine.dedup_summary()
+    if args.mode in ("student", "question"):
+        summary["batching"] = engine.batch_stats
+    summary["parsing"] = engine.parse_stats
+    if args.cascade:
+        summary["cascade"] = engine.cascade_summary()
+    if confidence is not None:
+        summary["confidence"] = dict(
+            engine.confidence_summary(),
+            threshold=args.confidence_threshold,
+            auto_published=auto_published,
+            needs_review=summary["rows"] - auto_published
+            )
+    if args.feedback:
+        summary["feedback"] = pipeline.stats
+        summary["feedback_file"] = str(feedback_path)
+
+    if fallback is not None and fallback.hedge:
+        summary["hedging"] = fallback.hedge_metrics()
+
+    if journal is not None:
+        summary["journal"] = {"file": str(journal.path), "completed": len(journal.completed)}
+        journal.close()
+
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Grade student submissions without the Streamlit UI.")
+    parser.add_argument("--gt", default="sample/gt.json", help="Ground-truth JSON file")
+    parser.add_argument("--rubric", default="sample/rubric.json", help="Rubric JSON file")
+    parser.add_argument("--submissions", default="sample/students", help="Student .jsonl/.json file or directory")
+    parser.add_argument("--output", default="results.jsonl", help="Output file (.jsonl or .csv)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Max in-flight requests")
+    parser.add_argument("--provider", choices=PROVIDERS, default="fallback", help="Model provider")
+    parser.add_argument(
+        "--providers", default=",".join(DEFAULT_PROVIDERS), help="Fallback order, e.g. gpt,gemini,deepseek"
+        )
+    parser.add_argument("--hedge", action="store_true", help="Race a slow provider against the next one")
+    parser.add_argument("--model", help="Model name for --provider custom")
+    parser.add_argument("--api-key", help="API key for --provider custom")
+    parser.add_argument("--endpoint", help="Endpoint URL for --provider custom")
+    parser.add_argument(
+        "--journal", help="Checkpoint journal file; rerunning with the same journal resumes an interrupted run"
+        )
+    parser.add_argument(
+        "--mode", choices=["row", "student", "question"], default="row",
+        help="row: one request per question; student: all of a student's questions in one request; "
+             "question: one question for several students per request"
+        )
+    parser.add_argument(
+        "--batch-size", type=int, help="Answers per request in question mode (default: sized from --token-budget)"
+        )
+    parser.add_argument(
+        "--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET, help="Estimated tokens per request in question mode"
+        )
+    parser.add_argument("--dedupe", action="store_true", help="Grade identical answers once (row mode)")
+    parser.add_argument(
+        "--cascade", action="store_true",
+        help="Grade each answer with the cheapest tier first and move it to the next tier only when its grade is "
+             "invalid, below --confidence-threshold, borderline or not reproduced by a verification sample "
+             "(row mode, fallback provider)"
+        )
+    parser.add_argument(
+        "--tiers", default=",".join(DEFAULT_CASCADE_TIERS), help="Cascade tiers, cheapest first, e.g. gemini,deepseek,gpt"
+        )
+    parser.add_argument(
+        "--samples", type=int, default=1,
+        help="Score each grade's confidence with up to this many samples, stopping once two agree (1: off)"
+        )
+    parser.add_argument(
+        "--sample-temperature", type=float, default=DEFAULT_SAMPLE_TEMPERATURE,
+        help="Temperature of the extra samples (ignored by reasoning models such as gpt-5-mini)"
+        )
+    parser.add_argument(
+        "--confidence-threshold", type=float, default=0.9,
+        help="Grades at or above this confidence (0-1) are counted as auto-published, the rest as needing review"
+        )
+    parser.add_argument(
+        "--bypass-cache", action="store_true", help="Ignore cached responses (fallback and custom providers)"
+        )
+    parser.add_argument("--feedback", action="store_true", help="Also write overall feedback per student")
+    parser.add_argument(
+        "--feedback-length", choices=["Brief", "Standard", "Comprehensive"], default="Standard"
+        )
+    parser.add_argument(
+        "--export", action="append", default=[],
+        help="Also write a report once grading is done (.xlsx, .csv or .parquet); repeat for several formats"
+        )
+    args = parser.parse_args(argv)
+    args.providers = provider_names(args.providers)
+    unknown = [name for name in args.providers if name not in FALLBACK_PROVIDERS]
+    if not args.providers:
+        parser.error(f"--providers: list at least one of {', '.join(FALLBACK_PROVIDERS)}")
+    if unknown:
+        parser.error(f"--providers: unknown provider(s) {', '.join(unknown)}; use {', '.join(FALLBACK_PROVIDERS)}")
+    if args.dedupe and args.mode != "row":
+        parser.error("--dedupe only applies to --mode row")
+    if args.bypass_cache and args.provider not in ("fallback", "custom"):
+        parser.error(f"--bypass-cache only applies to --provider fallback or custom (--provider {args.provider} is never cached)")
+    if args.cascade and (args.provider != "fallback" or args.mode != "row"):
+        parser.error("--cascade needs --provider fallback and --mode row")
+    args.tiers = provider_names(args.tiers)
+    unknown = [name for name in args.tiers if name not in CASCADE_TIERS]
+    if args.cascade and not args.tiers:
+        parser.error(f"--tiers: list at least one of {', '.join(CASCADE_TIERS)}")
+    if args.cascade and unknown:
+        parser.error(f"--tiers: unknown tier(s) {', '.join(unknown)}; use {', '.join(CASCADE_TIERS)}")
+    for path in args.export:
+        if Path(path).suffix not in EXPORT_FORMATS:
+            parser.error(f"--export {path}: use one of {', '.join(EXPORT_FORMATS)}")
+    return args
+
+
+def write_usage(usage, output):
+    """Write the full usage report (including per-student totals) next to the output file."""
+    usage_path = Path(output).with_name(Path(output).stem + "_usage.json")
+    usage_path.write_text(json.dumps(usage, indent=2), encoding="utf-8")
+    return usage_path
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with track_run() as run_usage:
+        summary = asyncio.run(run_batch(args))
+    usage = run_usage.summary()
+    summary["usage_file"] = str(write_usage(usage, args.output))
+    if args.export:
+        summary["export"] = export_results(
+            iter_result_file(args.output), args.export, feedback=read_feedback_file(feedback_path_for(args.output))
+            )
+    # Per-student totals can be long, so they are only written to the usage file
+    summary["usage"] = {k: v for k, v in usage.items() if k != "by_student"}
+    if args.provider in ("fallback", "custom"):
+        summary["cache"] = get_response_cache().stats()
+    if args.provider == "fallback":
+        summary["provider_health"] = get_health_registry().snapshot()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
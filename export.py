@@ -0,0 +1,45 @@
+"""Export batch grading results to Excel, CSV or Parquet.
+
+Example:
+    python -m export results.jsonl --output report.xlsx --output report.parquet
+"""
+
+# Import files
+from utils.excel_export import (
+    EXPORT_FORMATS,
+    export_results,
+    iter_result_file,
+    read_feedback_file,
+    feedback_path_for
+    )
+
+# Import libraries
+from pathlib import Path
+import argparse
+import json
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export batch grading results without the Streamlit UI.")
+    parser.add_argument("results", help="Results file written by batch.py (.jsonl or .csv)")
+    parser.add_argument(
+        "--output", action="append", required=True,
+        help="Report file (.xlsx, .csv or .parquet); repeat for several formats"
+        )
+    parser.add_argument("--feedback", help="Feedback file (default: the results file's *_feedback file, if any)")
+    args = parser.parse_args(argv)
+    for path in args.output:
+        if Path(path).suffix not in EXPORT_FORMATS:
+            parser.error(f"--output {path}: use one of {', '.join(EXPORT_FORMATS)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    feedback = read_feedback_file(args.feedback or feedback_path_for(args.results))
+    summary = export_results(iter_result_file(args.results), args.output, feedback=feedback)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
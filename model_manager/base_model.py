@@ -0,0 +1,122 @@
+# Import from files
+from model_manager.rate_limiter import get_rate_limiter, estimate_tokens
+from model_manager.usage_tracker import get_usage_tracker
+
+# Import from libraries
+import time
+
+DEFAULT_MAX_TOKENS = 256
+
+
+class BaseModel():
+    """Request pipelines shared by the provider model classes.
+
+    A provider class sets `provider` and `model` and implements format_input,
+    format_hyperparams, create_client / create_async_client, model_response /
+    async_model_response / stream_response, parse_response and parse_stream_event.
+    Every call waits for the provider's rate limiter and has its token usage recorded.
+    """
+
+    def prepare(self, system_prompt, user_prompt, **kwargs):
+        """Return (formatted input, hyperparameters, prompt tokens, tokens to reserve) for one call."""
+        formatted_input = self.format_input(system_prompt=system_prompt, user_prompt=user_prompt)
+        hyperparams = self.format_hyperparams(**kwargs)
+        prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        get_usage_tracker().check_prompt(self.provider, prompt_tokens)
+        estimated_tokens = prompt_tokens + (kwargs.get("max_tokens") or DEFAULT_MAX_TOKENS)
+        return formatted_input, hyperparams, prompt_tokens, estimated_tokens
+
+    def record_usage(self, response, start, prompt_tokens):
+        """Record a call's token usage and latency; response may be None when usage was not reported."""
+        get_usage_tracker().record(
+            self.provider, self.model, response, time.perf_counter() - start, estimated_prompt_tokens=prompt_tokens
+            )
+
+    def model_pipeline(self, system_prompt: str, user_prompt: str, stream=False, **kwargs):
+        """Full pipeline to generate parsed model output from a prompt.
+
+        With stream=True a generator of text pieces is returned instead (see stream_model_pipeline).
+        """
+        if stream:
+            return self.stream_model_pipeline(system_prompt, user_prompt, **kwargs)
+
+        # Step 1: Format the input and hyperparameters, checking the prompt against the usage limits
+        formatted_input, hyperparams, prompt_tokens, estimated_tokens = self.prepare(system_prompt, user_prompt, **kwargs)
+        print(f"Formatted input: {formatted_input}")
+
+        # Step 2: Create the model client
+        client = self.create_client()
+
+        # Step 3: Get the model response object within the provider's rate limits, recording its token usage
+        with get_rate_limiter(self.provider).slot(estimated_tokens):
+            start = time.perf_counter()
+            response = self.model_response(
+                client=client,
+                formatted_input=formatted_input,
+                **hyperparams)
+        self.record_usage(response, start, prompt_tokens)
+        print(f"Response object: {response}")
+
+        # Step 4: Parse and return the model's output
+        parsed_output = self.parse_response(response)
+        print(f"Parse output: {parsed_output}")
+        return parsed_output
+
+    async def async_model_pipeline(self, system_prompt: str, user_prompt: str, **kwargs) -> str:
+        """Async pipeline to generate parsed model output from a prompt."""
+
+        # Step 1: Format the input and hyperparameters, checking the prompt against the usage limits
+        formatted_input, hyperparams, prompt_tokens, estimated_tokens = self.prepare(system_prompt, user_prompt, **kwargs)
+
+        # Step 2: Create the async model client
+        client = self.create_async_client()
+
+        # Step 3: Await the model response object within the provider's rate limits, recording its token usage
+        async with get_rate_limiter(self.provider).async_slot(estimated_tokens):
+            start = time.perf_counter()
+            response = await self.async_model_response(
+                client=client,
+                formatted_input=formatted_input,
+                **hyperparams)
+        self.record_usage(response, start, prompt_tokens)
+
+        # Step 4: Parse and return the model's output
+        parsed_output = self.parse_response(response)
+        print(f"Async parse output: {parsed_output}")
+        return parsed_output
+
+    def stream_model_pipeline(self, system_prompt: str, user_prompt: str, **kwargs):
+        """Streaming pipeline - yields the output text piece by piece as it is generated.
+
+        Usage is recorded however the stream ends, including when the consumer stops
+        reading early - the prompt and the text generated so far are still billed.
+        """
+
+        # Step 1: Format the input and hyperparameters, checking the prompt against the usage limits
+        formatted_input, hyperparams, prompt_tokens, estimated_tokens = self.prepare(system_prompt, user_prompt, **kwargs)
+
+        # Step 2: Create the model client
+        client = self.create_client()
+
+        # Step 3: Stream the response within the provider's rate limits, recording its token usage
+        completed = None
+        with get_rate_limiter(self.provider).slot(estimated_tokens):
+            start = time.perf_counter()
+            stream = self.stream_response(
+                client=client,
+                formatted_input=formatted_input,
+                **hyperparams)
+
+            # Step 4: Yield the text as it arrives
+            try:
+                for event in stream:
+                    delta, final = self.parse_stream_event(event)
+                    if final is not None:
+                        completed = final
+                    if delta:
+                        yield delta
+            finally:
+                if completed is None and hasattr(stream, "close"):
+                    # Stopped early - close the connection so the provider stops generating
+                    stream.close()
+                self.record_usage(completed, start, prompt_tokens)
@@ -0,0 +1,155 @@
+# Import from libraries
+from collections import deque
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """A call skipped because its provider's circuit is open (or its half-open probe is taken)."""
+
+
+class CircuitBreaker():
+    """Closed/open/half-open breaker for one provider.
+
+    The breaker opens when, over the last `window` calls (at least `min_calls`), the share
+    of failures reaches `failure_threshold`. Calls slower than `slow_call_seconds` count
+    as failures. After `open_seconds` a single probe call is let through (half-open):
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, provider, window=20, min_calls=5, failure_threshold=0.5, slow_call_seconds=30.0,
+                 open_seconds=30.0):
+        self.provider = provider
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.last_error = None
+        self.last_latency = None
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now. In half-open state this claims the single probe."""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self.probe_started = None
+
+            if self.state == HALF_OPEN:
+                # A probe that never reported back (e.g. never launched) expires
+                if self.probe_started is None or now - self.probe_started >= self.open_seconds:
+                    self.probe_started = now
+                    return True
+
+            if self.state == CLOSED:
+                return True
+
+            self.skipped += 1
+            return False
+
+    def available(self) -> bool:
+        """Whether allow() would let a call through now, without claiming the half-open probe."""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return now - self.opened_at >= self.open_seconds
+            return self.probe_started is None or now - self.probe_started >= self.open_seconds
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_started = None
+        print(f"Circuit for {self.provider} opened")
+
+    def record_success(self, latency):
+        if latency >= self.slow_call_seconds:
+            self.record_failure(f"slow call ({latency:.1f}s)", latency=latency)
+            return
+        with self._lock:
+            self.last_latency = latency
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.outcomes.clear()
+                print(f"Circuit for {self.provider} closed")
+            self.outcomes.append(True)
+
+    def record_failure(self, error=None, latency=None):
+        with self._lock:
+            self.last_error = str(error) if error is not None else None
+            self.last_latency = latency
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self.outcomes.append(False)
+            if self.state == CLOSED and len(self.outcomes) >= self.min_calls and self.failure_rate() >= self.failure_threshold:
+                self._open()
+
+    def release(self):
+        """Give back a half-open probe whose call was cancelled before it finished."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probe_started = None
+
+    def failure_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self.opened_at)) if self.state == OPEN else 0.0
+            return {
+                "provider": self.provider,
+                "state": self.state,
+                "healthy": self.state == CLOSED,
+                "failure_rate": round(self.failure_rate(), 2),
+                "calls_in_window": len(self.outcomes),
+                "last_latency": round(self.last_latency, 2) if self.last_latency is not None else None,
+                "last_error": self.last_error,
+                "skipped": self.skipped,
+                "retry_in_seconds": round(retry_in, 1),
+            }
+
+
+class HealthRegistry():
+    """Process-wide circuit breakers, one per provider."""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider) -> CircuitBreaker:
+        with self._lock:
+            breaker = self.breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker(provider, **self.breaker_options)
+                self.breakers[provider] = breaker
+            return breaker
+
+    def snapshot(self) -> list:
+        with self._lock:
+            breakers = list(self.breakers.values())
+        return [breaker.snapshot() for breaker in breakers]
+
+
+HEALTH_REGISTRY = HealthRegistry()
+
+
+def get_health_registry() -> HealthRegistry:
+    """Return the process-wide provider health registry."""
+    return HEALTH_REGISTRY
@@ -0,0 +1,97 @@
+# Import from libraries
+from openai import OpenAI, AsyncOpenAI
+import asyncio
+import hashlib
+import httpx
+import threading
+
+
+class ClientRegistry():
+    """Process-wide registry of long-lived OpenAI clients.
+
+    One keep-alive HTTP client is created per (provider, endpoint, api key) and reused
+    across calls, Streamlit sessions and threads. Async clients are additionally keyed
+    by event loop, since an httpx.AsyncClient cannot be shared between loops.
+    """
+
+    def __init__(self, max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0, timeout=60.0):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._async_clients = {}
+        self.configure(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            timeout=timeout
+            )
+
+    def configure(self, max_connections=None, max_keepalive_connections=None, keepalive_expiry=None, timeout=None):
+        """Set pool limits. Only clients created after this call pick up the new limits."""
+        current = getattr(self, "limits", None)
+        self.limits = httpx.Limits(
+            max_connections=max_connections if max_connections is not None else current.max_connections,
+            max_keepalive_connections=(
+                max_keepalive_connections if max_keepalive_connections is not None
+                else current.max_keepalive_connections
+                ),
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else current.keepalive_expiry,
+        )
+        if timeout is not None:
+            self.timeout = timeout
+
+    def _key(self, provider, api_key, base_url):
+        key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        return (provider, base_url or "", key_hash)
+
+    def get_client(self, provider, api_key, base_url=None) -> OpenAI:
+        """Return the shared sync client for a provider endpoint, creating it on first use."""
+        key = self._key(provider, api_key, base_url)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = OpenAI(
+                    base_url=base_url,
+                    api_key=api_key,
+                    timeout=self.timeout,
+                    http_client=httpx.Client(limits=self.limits, timeout=self.timeout)
+                )
+                self._clients[key] = client
+            return client
+
+    def get_async_client(self, provider, api_key, base_url=None) -> AsyncOpenAI:
+        """Return the shared async client for a provider endpoint on the running event loop."""
+        loop = asyncio.get_running_loop()
+        key = self._key(provider, api_key, base_url) + (id(loop),)
+        with self._lock:
+            # Drop clients whose event loop has finished (e.g. after asyncio.run returns)
+            for stale_key, (stale_loop, _) in list(self._async_clients.items()):
+                if stale_loop.is_closed():
+                    del self._async_clients[stale_key]
+
+            entry = self._async_clients.get(key)
+            if entry is None:
+                client = AsyncOpenAI(
+                    base_url=base_url,
+                    api_key=api_key,
+                    timeout=self.timeout,
+                    http_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+                )
+                entry = (loop, client)
+                self._async_clients[key] = entry
+            return entry[1]
+
+    def close(self):
+        """Close all sync clients and forget every cached client."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+            self._async_clients.clear()
+
+
+CLIENT_REGISTRY = ClientRegistry()
+
+
+def get_client_registry() -> ClientRegistry:
+    """Return the process-wide client registry."""
+    return CLIENT_REGISTRY
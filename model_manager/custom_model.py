@@ -1,19 +1,34 @@
+# Import from files
+from model_manager.base_model import BaseModel
+from model_manager.client_registry import get_client_registry
+from model_manager.hedging import is_non_empty
+from model_manager.response_cache import get_response_cache
+
 # Import from libraries
-from openai import OpenAI
 import json
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+REASONING_MODEL_PREFIXES = ("gpt-5", "o1", "o3", "o4")
+
 
-class CustomModel():
+class CustomModel(BaseModel):
     """Currently testing - GPT5 mini"""
 
     def __init__(self, api_key, model, endpoint_url=None):
         self.api_key = api_key
         self.model = model
         self.endpoint_url = endpoint_url
+        self.provider = "custom"
+        # JSON-schema structured output is only assumed for the OpenAI endpoint
+        self.structured_output = endpoint_url is None
+        # OpenAI reasoning models take no temperature
+        self.reasoning = model.startswith(REASONING_MODEL_PREFIXES)
+        # Token logprobs are only requested when the model is known to return them (non-reasoning models)
+        self.logprobs = os.getenv("AIGS_CUSTOM_LOGPROBS", "0") == "1"
+        self.cache_name = f"custom:{endpoint_url or 'openai'}:{model}"
         print(f"Custom model inputs: {model}, {api_key} ")
         
 
@@ -26,65 +41,138 @@ class CustomModel():
         ]
         return formatted_input
     
-    def format_hyperparams(self):
-        """Format the hyperparameters for the model."""
-        return {
-            "max_tokens": 256,
-            "temperature": 0,
-            "top_p": 0.2,
-        }
+    def format_hyperparams(self, **kwargs):
+        """Format the hyperparameters for the model.
+
+        Only values requested by the caller are sent - the responses API takes
+        max_output_tokens, and reasoning models reject sampling parameters, so their
+        temperature is dropped.
+        """
+        hyperparams = {}
+        if kwargs.get("max_tokens") is not None:
+            hyperparams["max_output_tokens"] = kwargs["max_tokens"]
+        if kwargs.get("temperature") is not None and not self.reasoning:
+            hyperparams["temperature"] = kwargs["temperature"]
+        if kwargs.get("logprobs") and self.logprobs:
+            hyperparams["include"] = ["message.output_text.logprobs"]
+        if kwargs.get("response_schema") and self.structured_output:
+            hyperparams["text"] = {
+                "format": {"type": "json_schema", "name": "grade", "schema": kwargs["response_schema"], "strict": True}
+            }
+        return hyperparams
     
     def create_client(self):
-        client = OpenAI(
-            api_key=self.api_key
-        ) 
+        """Return the shared keep-alive client for this provider endpoint."""
+        client = get_client_registry().get_client(self.provider, api_key=self.api_key, base_url=self.endpoint_url)
         return client
-    
+
+    def create_async_client(self):
+        """Return the shared async client for this provider endpoint."""
+        client = get_client_registry().get_async_client(self.provider, api_key=self.api_key, base_url=self.endpoint_url)
+        return client
+
     def model_response(self, **kwargs):
         """Call the model and return the response object."""
         completion = kwargs['client'].responses.create(
             model=self.model,
             input=kwargs['formatted_input'],
-            store=True
+            store=True,
+            **{k: v for k, v in kwargs.items() if k in ("max_output_tokens", "temperature", "text", "include")}
         )
 
         return completion
     
  
+    async def async_model_response(self, **kwargs):
+        """Call the model asynchronously and return the response object."""
+        completion = await kwargs['client'].responses.create(
+            model=self.model,
+            input=kwargs['formatted_input'],
+            store=True,
+            **{k: v for k, v in kwargs.items() if k in ("max_output_tokens", "temperature", "text", "include")}
+        )
+
+        return completion
+
+    def stream_response(self, **kwargs):
+        """Call the model with streaming on and return the event iterator."""
+        stream = kwargs['client'].responses.create(
+            model=self.model,
+            input=kwargs['formatted_input'],
+            store=True,
+            stream=True,
+            **{k: v for k, v in kwargs.items() if k in ("max_output_tokens", "temperature", "text", "include")}
+        )
+
+        return stream
+
     def parse_response(self, response) -> str:
         """Parse the model's response and return the generated text."""
         return response.output_text
     
-    def model_pipeline(self, system_prompt: str, user_prompt: str, **kwargs) -> str:
-        """Full pipeline to generate parsed model output from a prompt."""
-        
-        # Step 1: Format the input prompt
-        formatted_input = self.format_input(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
-        print(f"Formatted input: {formatted_input}")
+    def parse_stream_event(self, event):
+        """Return (text delta, completed response or None) for one streamed event."""
+        if event.type == "response.output_text.delta":
+            return event.delta, None
+        if event.type == "response.completed":
+            return "", event.response
+        return "", None
 
-        # Step 2: Format model hyperparameters
-        hyperparams = self.format_hyperparams()
-        
-        # Step 3: Create the model client
-        client = self.create_client()
-
-        # Step 4: Get the model response object
-        response = self.model_response(
-            client=client, 
-            formatted_input=formatted_input, 
-            **hyperparams)
-        print(f"Response object: {response}")
-        
-        # Step 5: Parse and return the model's output
-        parsed_output = self.parse_response(response)
-        print(f"Parse output: {parsed_output}")
-
-        #try:
-        #    parsed_output = json.loads(parsed_output)
-        #except json.JSONDecodeError as e:
-        #    print(f"JSON decoding error: {e}")
-        #    parsed_output = {"marks_awarded": 0, "max_marks": 0, "reasoning": "Failed to parse JSON response."}
-        #print(f"Parsed output: {parsed_output}")
-        
+    def model_pipeline(self, system_prompt: str, user_prompt: str, bypass_cache=False, stream=False,
+                       validate=is_non_empty, **kwargs):
+        """Shared pipeline behind the response cache; only output accepted by `validate` is cached.
+
+        With stream=True a generator of text pieces is returned instead (see stream_model_pipeline).
+        """
+        if stream:
+            return self.stream_model_pipeline(system_prompt, user_prompt, bypass_cache=bypass_cache, **kwargs)
+
+        cache = get_response_cache()
+        cache_key = cache.make_key(self.cache_name, system_prompt, user_prompt, kwargs)
+        if not bypass_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        parsed_output = super().model_pipeline(system_prompt, user_prompt, **kwargs)
+        if validate(parsed_output):
+            cache.set(cache_key, self.cache_name, parsed_output)
         return parsed_output
-    
\ No newline at end of file
+
+    async def async_model_pipeline(self, system_prompt: str, user_prompt: str, bypass_cache=False,
+                                   validate=is_non_empty, **kwargs) -> str:
+        """Shared async pipeline behind the response cache; only output accepted by `validate` is cached."""
+        cache = get_response_cache()
+        cache_key = cache.make_key(self.cache_name, system_prompt, user_prompt, kwargs)
+        if not bypass_cache:
+            cached = await cache.aget(cache_key)
+            if cached is not None:
+                return cached
+
+        parsed_output = await super().async_model_pipeline(system_prompt, user_prompt, **kwargs)
+        if validate(parsed_output):
+            await cache.aset(cache_key, self.cache_name, parsed_output)
+        return parsed_output
+
+    def stream_model_pipeline(self, system_prompt: str, user_prompt: str, bypass_cache=False, **kwargs):
+        """Shared streaming pipeline behind the response cache; only a stream read to the end is cached."""
+        cache = get_response_cache()
+        cache_key = cache.make_key(self.cache_name, system_prompt, user_prompt, kwargs)
+        if not bypass_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        parts = []
+        pieces = super().stream_model_pipeline(system_prompt, user_prompt, **kwargs)
+        try:
+            for delta in pieces:
+                parts.append(delta)
+                yield delta
+        finally:
+            # Closes the shared pipeline straight away when the consumer stops early, so its usage is recorded
+            pieces.close()
+        text = "".join(parts)
+        if is_non_empty(text):
+            cache.set(cache_key, self.cache_name, text)
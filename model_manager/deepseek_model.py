@@ -1,8 +1,9 @@
 # Import from files
+from model_manager.base_model import BaseModel
+from model_manager.client_registry import get_client_registry
 from utils.helper_functions import create_grading_prompt, create_feedback_prompt
 
 # Import from libraries
-from openai import OpenAI
 import json
 from dotenv import load_dotenv
 import os
@@ -10,13 +11,18 @@ import os
 load_dotenv()
 
 
-class DeepseekModel():
+class DeepseekModel(BaseModel):
     """Deepseek model class"""
 
     def __init__(self):
         self.base_url = os.getenv("BASE_API_URL")
         self.api_key = os.getenv("DEEPSEEK_API_KEY")
         self.model = "deepseek/deepseek-r1:free"
+        self.provider = "deepseek"
+        # The :free model does not accept json_schema response formats
+        self.structured_output = False
+        # R1 is a reasoning model and returns no token logprobs
+        self.logprobs = False
         
 
     def format_input (self, system_prompt, user_prompt):
@@ -28,21 +34,35 @@ class DeepseekModel():
         ]
         return formatted_input
     
-    def format_hyperparams(self):
-        """Format the hyperparameters for the model."""
-        return {
+    def format_hyperparams(self, **kwargs):
+        """Format the hyperparameters for the model, applying per-request overrides."""
+        hyperparams = {
             "max_tokens": 256,
             "temperature": 0,
             "top_p": 0.2,
         }
+        for name in ("max_tokens", "temperature", "top_p"):
+            if kwargs.get(name) is not None:
+                hyperparams[name] = kwargs[name]
+        if kwargs.get("logprobs") and self.logprobs:
+            hyperparams["logprobs"] = True
+        if kwargs.get("response_schema") and self.structured_output:
+            hyperparams["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "grade", "schema": kwargs["response_schema"], "strict": True}
+            }
+        return hyperparams
     
     def create_client(self):
-        client = OpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key
-        ) 
+        """Return the shared keep-alive client for this provider endpoint."""
+        client = get_client_registry().get_client(self.provider, api_key=self.api_key, base_url=self.base_url)
         return client
-    
+
+    def create_async_client(self):
+        """Return the shared async client for this provider endpoint."""
+        client = get_client_registry().get_async_client(self.provider, api_key=self.api_key, base_url=self.base_url)
+        return client
+
     def model_response(self, **kwargs):
         """Call the model and return the response object."""
         completion = kwargs['client'].chat.completions.create(
@@ -52,45 +72,48 @@ class DeepseekModel():
             max_tokens=kwargs.get('max_tokens', 256),
             temperature=kwargs.get('temperature', 0.7),
             top_p=kwargs.get('top_p', 1.0),
+            **({"response_format": kwargs["response_format"]} if "response_format" in kwargs else {}),
+            **({"logprobs": True} if kwargs.get("logprobs") else {})
         )
 
         return completion
     
  
+    async def async_model_response(self, **kwargs):
+        """Call the model asynchronously and return the response object."""
+        completion = await kwargs['client'].chat.completions.create(
+            extra_body={},
+            model=self.model,
+            messages=kwargs['formatted_input'],
+            max_tokens=kwargs.get('max_tokens', 256),
+            temperature=kwargs.get('temperature', 0.7),
+            top_p=kwargs.get('top_p', 1.0),
+            **({"response_format": kwargs["response_format"]} if "response_format" in kwargs else {}),
+            **({"logprobs": True} if kwargs.get("logprobs") else {})
+        )
+
+        return completion
+
+    def stream_response(self, **kwargs):
+        """Call the model with streaming on and return the chunk iterator."""
+        stream = kwargs['client'].chat.completions.create(
+            extra_body={},
+            model=self.model,
+            messages=kwargs['formatted_input'],
+            max_tokens=kwargs.get('max_tokens', 256),
+            temperature=kwargs.get('temperature', 0.7),
+            top_p=kwargs.get('top_p', 1.0),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        return stream
+
     def parse_response(self, response) -> str:
         """Parse the model's response and return the generated text."""
         return response.choices[0].message.content
     
-    def model_pipeline(self, system_prompt: str, user_prompt: str, **kwargs) -> str:
-        """Full pipeline to generate parsed model output from a prompt."""
-        
-        # Step 1: Format the input prompt
-        formatted_input = self.format_input(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
-        print(f"Formatted input: {formatted_input}")
-
-        # Step 2: Format model hyperparameters
-        hyperparams = self.format_hyperparams()
-        
-        # Step 3: Create the model client
-        client = self.create_client()
-
-        # Step 4: Get the model response object
-        response = self.model_response(
-            client=client, 
-            formatted_input=formatted_input, 
-            **hyperparams)
-        print(f"Response object: {response}")
-        
-        # Step 5: Parse and return the model's output
-        parsed_output = self.parse_response(response)
-
-        #try:
-        #    parsed_output = json.loads(parsed_output)
-        #except json.JSONDecodeError as e:
-        #    print(f"JSON decoding error: {e}")
-        #    parsed_output = {"marks_awarded": 0, "max_marks": 0, "reasoning": "Failed to parse JSON response."}
-        #print(f"Parsed output: {parsed_output}")
-        
-        
-        return parsed_output
-    
\ No newline at end of file
+    def parse_stream_event(self, event):
+        """Return (text delta, usage-bearing chunk or None) for one streamed chunk."""
+        delta = event.choices[0].delta.content if event.choices else None
+        return delta or "", event if getattr(event, "usage", None) is not None else None
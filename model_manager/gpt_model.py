@@ -1,8 +1,9 @@
 # Import from files
+from model_manager.base_model import BaseModel
+from model_manager.client_registry import get_client_registry
 from utils.helper_functions import create_grading_prompt, create_feedback_prompt
 
 # Import from libraries
-from openai import OpenAI
 import json
 from dotenv import load_dotenv
 import os
@@ -10,12 +11,17 @@ import os
 load_dotenv()
 
 
-class GPTModel():
+class GPTModel(BaseModel):
     """GPT model class - GPT5 mini"""
 
     def __init__(self):
         self.api_key = os.getenv("OPENAI_GPT5_API_KEY")
         self.model = "gpt-5-mini"
+        self.provider = "gpt"
+        self.structured_output = True
+        # gpt-5-mini is a reasoning model: it takes no temperature and returns no token logprobs
+        self.reasoning = True
+        self.logprobs = False
         
 
     def format_input (self, system_prompt, user_prompt):
@@ -27,65 +33,79 @@ class GPTModel():
         ]
         return formatted_input
     
-    def format_hyperparams(self):
-        """Format the hyperparameters for the model."""
-        return {
-            "max_tokens": 256,
-            "temperature": 0,
-            "top_p": 0.2,
-        }
+    def format_hyperparams(self, **kwargs):
+        """Format the hyperparameters for the model.
+
+        Only values requested by the caller are sent - the responses API takes
+        max_output_tokens, and reasoning models reject sampling parameters, so their
+        temperature is dropped.
+        """
+        hyperparams = {}
+        if kwargs.get("max_tokens") is not None:
+            hyperparams["max_output_tokens"] = kwargs["max_tokens"]
+        if kwargs.get("temperature") is not None and not self.reasoning:
+            hyperparams["temperature"] = kwargs["temperature"]
+        if kwargs.get("logprobs") and self.logprobs:
+            hyperparams["include"] = ["message.output_text.logprobs"]
+        if kwargs.get("response_schema") and self.structured_output:
+            hyperparams["text"] = {
+                "format": {"type": "json_schema", "name": "grade", "schema": kwargs["response_schema"], "strict": True}
+            }
+        return hyperparams
     
     def create_client(self):
-        client = OpenAI(
-            api_key=self.api_key
-        ) 
+        """Return the shared keep-alive client for this provider endpoint."""
+        client = get_client_registry().get_client(self.provider, api_key=self.api_key)
         return client
-    
+
+    def create_async_client(self):
+        """Return the shared async client for this provider endpoint."""
+        client = get_client_registry().get_async_client(self.provider, api_key=self.api_key)
+        return client
+
     def model_response(self, **kwargs):
         """Call the model and return the response object."""
         completion = kwargs['client'].responses.create(
             model=self.model,
             input=kwargs['formatted_input'],
-            store=True
+            store=True,
+            **{k: v for k, v in kwargs.items() if k in ("max_output_tokens", "temperature", "text", "include")}
         )
 
         return completion
     
  
+    async def async_model_response(self, **kwargs):
+        """Call the model asynchronously and return the response object."""
+        completion = await kwargs['client'].responses.create(
+            model=self.model,
+            input=kwargs['formatted_input'],
+            store=True,
+            **{k: v for k, v in kwargs.items() if k in ("max_output_tokens", "temperature", "text", "include")}
+        )
+
+        return completion
+
+    def stream_response(self, **kwargs):
+        """Call the model with streaming on and return the event iterator."""
+        stream = kwargs['client'].responses.create(
+            model=self.model,
+            input=kwargs['formatted_input'],
+            store=True,
+            stream=True,
+            **{k: v for k, v in kwargs.items() if k in ("max_output_tokens", "temperature", "text", "include")}
+        )
+
+        return stream
+
     def parse_response(self, response) -> str:
         """Parse the model's response and return the generated text."""
         return response.output_text
     
-    def model_pipeline(self, system_prompt: str, user_prompt: str, **kwargs) -> str:
-        """Full pipeline to generate parsed model output from a prompt."""
-        
-        # Step 1: Format the input prompt
-        formatted_input = self.format_input(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
-        print(f"Formatted input: {formatted_input}")
-
-        # Step 2: Format model hyperparameters
-        hyperparams = self.format_hyperparams()
-        
-        # Step 3: Create the model client
-        client = self.create_client()
-
-        # Step 4: Get the model response object
-        response = self.model_response(
-            client=client, 
-            formatted_input=formatted_input, 
-            **hyperparams)
-        print(f"Response object: {response}")
-        
-        # Step 5: Parse and return the model's output
-        parsed_output = self.parse_response(response)
-        print(f"Parse output: {parsed_output}")
-
-        #try:
-        #    parsed_output = json.loads(parsed_output)
-        #except json.JSONDecodeError as e:
-        #    print(f"JSON decoding error: {e}")
-        #    parsed_output = {"marks_awarded": 0, "max_marks": 0, "reasoning": "Failed to parse JSON response."}
-        #print(f"Parsed output: {parsed_output}")
-        
-        return parsed_output
-    
\ No newline at end of file
+    def parse_stream_event(self, event):
+        """Return (text delta, completed response or None) for one streamed event."""
+        if event.type == "response.output_text.delta":
+            return event.delta, None
+        if event.type == "response.completed":
+            return "", event.response
+        return "", None
@@ -0,0 +1,195 @@
+# Import from files
+from utils.response_parser import is_grade_response
+
+# Import from libraries
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import asyncio
+import contextvars
+import threading
+import time
+
+DEFAULT_HEDGE_DELAY = 10.0
+MIN_SAMPLES = 20
+
+
+def is_valid_grade(response) -> bool:
+    """A hedged grading call only wins with a response that parses to a valid grade (or batch of grades)."""
+    return is_grade_response(response)
+
+
+def is_non_empty(response) -> bool:
+    return response is not None and bool(str(response).strip())
+
+
+class LatencyTracker():
+    """Rolling window of successful call latencies per provider."""
+
+    def __init__(self, window=200):
+        self.window = window
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider, seconds):
+        with self._lock:
+            self.samples.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, provider, q=0.95, default=DEFAULT_HEDGE_DELAY) -> float:
+        """Latency quantile for a provider, or `default` until enough samples exist."""
+        with self._lock:
+            samples = sorted(self.samples.get(provider, ()))
+        if len(samples) < MIN_SAMPLES:
+            return default
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class HedgeMetrics():
+    """Counters for hedged calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.hedged = 0
+        self.won = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls, "hedged": self.hedged, "won": self.won, "cancelled": self.cancelled,
+            "skipped": self.skipped,
+        }
+
+
+class Hedger():
+    """Race providers: start the next one if the current one has not answered within its p95 latency.
+
+    `attempts` is an ordered list of (provider name, zero-arg callable). The first response
+    accepted by `validate` wins; the remaining calls are cancelled (async) or abandoned (sync).
+    A provider that fails outright starts the next one immediately.
+
+    An abandoned sync call keeps its pool worker until the provider answers, so at most
+    `max_hedges` hedged calls run in the pool at once; past that a slow call is waited on
+    instead of hedged (counted as skipped) until an earlier hedge finishes.
+    """
+
+    def __init__(self, quantile=0.95, min_delay=0.5, default_delay=DEFAULT_HEDGE_DELAY, max_workers=16,
+                 max_hedges=None):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.latencies = LatencyTracker()
+        self.metrics = HedgeMetrics()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        # Leave most of the pool to first attempts, which every caller needs
+        self._hedge_slots = threading.BoundedSemaphore(max_hedges or max(1, max_workers // 4))
+
+    def delay_for(self, provider) -> float:
+        return max(self.min_delay, self.latencies.quantile(provider, self.quantile, self.default_delay))
+
+    def timed(self, name, function):
+        start = time.perf_counter()
+        response = function()
+        self.latencies.record(name, time.perf_counter() - start)
+        return response
+
+    async def async_timed(self, name, function):
+        start = time.perf_counter()
+        response = await function()
+        self.latencies.record(name, time.perf_counter() - start)
+        return response
+
+    def call(self, attempts, validate=is_non_empty):
+        """Blocking hedged call."""
+        self.metrics.add(calls=1)
+        remaining = list(attempts)
+        running = {}
+        last_error = None
+        skipped = False
+
+        def launch(hedge=False):
+            name, function = remaining.pop(0)
+            # Run in a copy of the caller's context so usage labels reach the worker thread
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, self.timed, name, function)
+            if hedge:
+                # Held until the worker is free again, even if this call has long been abandoned
+                future.add_done_callback(lambda _: self._hedge_slots.release())
+            running[future] = name
+            return name
+
+        current = launch()
+        while running:
+            timeout = self.delay_for(current) if remaining else None
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if self._hedge_slots.acquire(blocking=False):
+                    current = launch(hedge=True)
+                    self.metrics.add(hedged=1)
+                elif not skipped:
+                    skipped = True
+                    self.metrics.add(skipped=1)
+                continue
+
+            for future in done:
+                name = running.pop(future)
+                error = future.exception()
+                if error is None and validate(future.result()):
+                    for other in running:
+                        other.cancel()
+                    self.metrics.add(cancelled=len(running), won=int(name != attempts[0][0]))
+                    return future.result()
+                last_error = error or ValueError(f"Invalid response from {name}")
+                print(f"Hedged call to {name} failed: {last_error}")
+
+            if remaining:
+                current = launch()
+
+        raise last_error
+
+    async def async_call(self, attempts, validate=is_non_empty):
+        """Async hedged call."""
+        self.metrics.add(calls=1)
+        remaining = list(attempts)
+        running = {}
+        last_error = None
+
+        def launch():
+            name, function = remaining.pop(0)
+            running[asyncio.create_task(self.async_timed(name, function))] = name
+            return name
+
+        try:
+            current = launch()
+            while running:
+                timeout = self.delay_for(current) if remaining else None
+                done, _ = await asyncio.wait(list(running), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    current = launch()
+                    self.metrics.add(hedged=1)
+                    continue
+
+                for task in done:
+                    name = running.pop(task)
+                    error = task.exception()
+                    if error is None and validate(task.result()):
+                        for other in running:
+                            other.cancel()
+                        self.metrics.add(cancelled=len(running), won=int(name != attempts[0][0]))
+                        return task.result()
+                    last_error = error or ValueError(f"Invalid response from {name}")
+                    print(f"Hedged call to {name} failed: {last_error}")
+
+                if remaining:
+                    current = launch()
+
+            raise last_error
+        finally:
+            # Also covers the caller being cancelled mid-race
+            for task in running:
+                task.cancel()
@@ -0,0 +1,45 @@
+# Import from files
+from model_manager.model_fallback import ModelFallback, provider_names
+
+# Import from library
+from functools import partial
+import os
+import threading
+
+# Tiers of the grading cascade, cheapest and fastest first, e.g. AIGS_CASCADE_TIERS=gemini,deepseek,gpt
+DEFAULT_CASCADE_TIERS = provider_names(os.getenv("AIGS_CASCADE_TIERS", "gemini,deepseek,gpt"))
+
+
+class ModelCascade():
+    """Model tiers for difficulty-based routing, from the cheapest and fastest model to the strongest.
+
+    Each tier is a single-provider ModelFallback, so it keeps that provider's response
+    cache, retries and circuit breaker. Deciding when a row moves up a tier is left to
+    the grading engine (see CascadeEngine); a tier whose provider is down simply returns
+    no response, which the engine treats like an invalid grade.
+    """
+
+    def __init__(self, tiers=DEFAULT_CASCADE_TIERS, hedge=False):
+        self.tiers = tuple(tiers)
+        self.fallbacks = {name: ModelFallback(providers=(name,), hedge=hedge) for name in self.tiers}
+
+    def calls(self, **kwargs) -> list:
+        """Ordered (tier name, async call) pairs; kwargs (e.g. bypass_cache, validate) are bound to every call."""
+        return [(name, partial(self.fallbacks[name].async_call_with_fallback, **kwargs)) for name in self.tiers]
+
+    def models(self) -> dict:
+        """Model name of each tier."""
+        return {name: self.fallbacks[name].models[name].model for name in self.tiers}
+
+
+_shared_cascade = None
+_shared_cascade_lock = threading.Lock()
+
+
+def get_model_cascade() -> ModelCascade:
+    """Return a process-wide ModelCascade over DEFAULT_CASCADE_TIERS."""
+    global _shared_cascade
+    with _shared_cascade_lock:
+        if _shared_cascade is None:
+            _shared_cascade = ModelCascade()
+        return _shared_cascade
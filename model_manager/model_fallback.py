@@ -1,46 +1,294 @@
 # Import from files
+from model_manager.circuit_breaker import CircuitOpenError, get_health_registry
 from model_manager.deepseek_model import DeepseekModel
 from model_manager.gemini_model import GeminiModel
 from model_manager.gpt_model import GPTModel
+from model_manager.hedging import Hedger, is_non_empty
+from model_manager.rate_limiter import get_rate_limiter, backoff_delay
+from model_manager.response_cache import get_response_cache
 
 # Import from library
+import asyncio
+import os
+import threading
 import time
 
+FALLBACK_PROVIDERS = ("gpt", "gemini", "deepseek")
+
+
+def provider_names(value) -> tuple:
+    """Provider names from a comma-separated list such as "gpt, gemini", spaces and empty entries dropped."""
+    return tuple(name.strip() for name in value.split(",") if name.strip())
+
+
+# Order in which providers are tried - "gemini" and "deepseek" can be appended to enable them,
+# e.g. AIGS_FALLBACK_PROVIDERS=gpt,gemini,deepseek
+DEFAULT_PROVIDERS = provider_names(os.getenv("AIGS_FALLBACK_PROVIDERS", "gpt"))
+
+
 class ModelFallback():
-    def __init__(self):
+    def __init__(self, cache=None, providers=DEFAULT_PROVIDERS, hedge=False, hedge_quantile=0.95):
+        unknown = [name for name in providers if name not in FALLBACK_PROVIDERS]
+        if unknown:
+            raise ValueError(f"Unknown provider(s) {', '.join(unknown)}; use {', '.join(FALLBACK_PROVIDERS)}")
         self.GM = GeminiModel()
         self.DS = DeepseekModel()
         self.GPT = GPTModel()
+        self.models = {"gpt": self.GPT, "gemini": self.GM, "deepseek": self.DS}
+        self.providers = tuple(providers)
+        self.cache = cache if cache is not None else get_response_cache()
+        self.cache_name = "fallback:" + "+".join(self.models[name].model for name in self.providers)
+        self.hedge = hedge
+        self.hedger = Hedger(quantile=hedge_quantile)
+        self.health = get_health_registry()
 
-    def try_gemini(self, system_prompt, user_prompt):
-        response = self.GM.model_pipeline(system_prompt=system_prompt, user_prompt=user_prompt)
+    def try_gemini(self, system_prompt, user_prompt, **kwargs):
+        response = self.GM.model_pipeline(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
         return response
-    
-    def try_deepseek(self, system_prompt, user_prompt):
-        response = self.DS.model_pipeline(system_prompt=system_prompt, user_prompt=user_prompt)
+
+    def try_deepseek(self, system_prompt, user_prompt, **kwargs):
+        response = self.DS.model_pipeline(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
         return response
-    
-    def try_gpt(self, system_prompt, user_prompt):
-        response = self.GPT.model_pipeline(system_prompt=system_prompt, user_prompt=user_prompt)
+
+    def try_gpt(self, system_prompt, user_prompt, **kwargs):
+        response = self.GPT.model_pipeline(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
         print(f"Response from MF: {response}")
         return response
-    
-    def call_with_fallback(self, system_prompt, user_prompt, max_retries=1, backoffs=(1.5, 3)):
-        """Try gemini first then Deepseek"""
-        attempts = [
-                ("gpt", lambda: self.try_gpt(system_prompt, user_prompt))
-                ]            
-    #        ("gemini", self.try_gemini), 
-    #        ("deepseek", self.try_deepseek)
+
+    def build_attempts(self, system_prompt, user_prompt, is_async=False, **kwargs):
+        """Ordered (provider, zero-arg callable) pairs for the configured providers."""
+        functions = {
+            "gpt": self.async_try_gpt if is_async else self.try_gpt,
+            "gemini": self.async_try_gemini if is_async else self.try_gemini,
+            "deepseek": self.async_try_deepseek if is_async else self.try_deepseek,
+        }
+        return [
+            (name, self.guard(name, lambda function=functions[name]: function(system_prompt, user_prompt, **kwargs), is_async))
+            for name in self.providers
+        ]
+
+    def guard(self, name, function, is_async=False):
+        """Wrap a provider call so its outcome and latency feed the provider's circuit breaker.
+
+        The breaker is asked just before the call is sent, so a half-open probe is only
+        claimed by a call that actually goes out; CircuitOpenError is raised otherwise.
+        """
+        breaker = self.health.get(name)
+
+        if is_async:
+            async def guarded():
+                if not breaker.allow():
+                    raise CircuitOpenError(f"circuit for {name} is open")
+                start = time.perf_counter()
+                try:
+                    response = await function()
+                except asyncio.CancelledError:
+                    breaker.release()
+                    raise
+                except Exception as e:
+                    breaker.record_failure(e, latency=time.perf_counter() - start)
+                    raise
+                breaker.record_success(time.perf_counter() - start)
+                return response
+            return guarded
+
+        def guarded():
+            if not breaker.allow():
+                raise CircuitOpenError(f"circuit for {name} is open")
+            start = time.perf_counter()
+            try:
+                response = function()
+            except Exception as e:
+                breaker.record_failure(e, latency=time.perf_counter() - start)
+                raise
+            breaker.record_success(time.perf_counter() - start)
+            return response
+        return guarded
+
+    def healthy_attempts(self, attempts):
+        """Drop providers whose circuit is open so they are skipped without paying for a timeout.
+
+        This only peeks at the breakers; each call claims its breaker (and a half-open probe) when it is sent.
+        """
+        allowed = [(name, function) for name, function in attempts if self.health.get(name).available()]
+        if not allowed:
+            print("No provider available - all circuits are open")
+        return allowed
+
+    def call_with_fallback(self, system_prompt, user_prompt, max_retries=1, backoffs=(1.5, 3), bypass_cache=False,
+                           hedge=None, validate=is_non_empty, stream=False, **kwargs):
+        """Try the providers in order. Extra kwargs (max_tokens, temperature) are passed to the model.
+
+        Responses are served from the response cache unless bypass_cache is set;
+        a bypassed call still refreshes the cached entry. Only responses accepted by
+        `validate` are cached; an invalid one moves on to the next provider, and is
+        returned uncached when no provider gives a valid response. With hedging on, a slow
+        provider is raced against the next one instead of waiting for it to fail.
+        With stream=True a generator of text pieces is returned (see stream_with_fallback).
+        """
+        if stream:
+            return self.stream_with_fallback(system_prompt, user_prompt, bypass_cache=bypass_cache, **kwargs)
+
+        cache_key = self.cache.make_key(self.cache_name, system_prompt, user_prompt, kwargs)
+        if not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        attempts = self.build_attempts(system_prompt, user_prompt, **kwargs)
+        hedge = self.hedge if hedge is None else hedge
 
         for attempt in range(max_retries+1):
-            for name, function in attempts:
+            allowed = self.healthy_attempts(attempts)
+            if hedge and len(allowed) > 1:
                 try:
-                    return function()
+                    response = self.hedger.call(allowed, validate=validate)
+                    self.cache.set(cache_key, self.cache_name, response)
+                    return response
                 except Exception as e:
-                    print(f"Error with {name} model: {e}")
+                    print(f"Error with hedged call: {e}")
+            else:
+                invalid = None
+                for name, function in allowed:
+                    try:
+                        response = self.hedger.timed(name, function)
+                    except Exception as e:
+                        print(f"Error with {name} model: {e}")
+                        continue
+                    if validate(response):
+                        self.cache.set(cache_key, self.cache_name, response)
+                        return response
+                    print(f"Invalid response from {name} model, trying the next provider")
+                    invalid = response if response is not None else invalid
+                if invalid is not None:
+                    # Every provider answered but none validly; the caller may still repair it, but it is not cached
+                    return invalid
             if attempt < max_retries:
-                time.sleep(backoffs[min(attempt, len(backoffs) - 1)])
-        
+                time.sleep(self.retry_delay(attempts, attempt, backoffs))
+
+    def stream_with_fallback(self, system_prompt, user_prompt, bypass_cache=False, **kwargs):
+        """Stream the output of the first healthy provider, yielding text as it arrives.
+
+        A provider that fails before producing any text is skipped for the next one;
+        once text has been yielded a failure is raised, as it cannot be taken back.
+        The full text is cached when the stream completes.
+        """
+        cache_key = self.cache.make_key(self.cache_name, system_prompt, user_prompt, kwargs)
+        if not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        for name in self.providers:
+            breaker = self.health.get(name)
+            if not breaker.allow():
+                continue
+            parts = []
+            start = time.perf_counter()
+            first_chunk = None
+            pieces = self.models[name].stream_model_pipeline(system_prompt, user_prompt, **kwargs)
+            try:
+                for delta in pieces:
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+                    parts.append(delta)
+                    yield delta
+            except GeneratorExit:
+                # Close the provider's stream now so its usage is recorded before the breaker is released
+                pieces.close()
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure(e, latency=time.perf_counter() - start)
+                print(f"Error streaming from {name} model: {e}")
+                if parts:
+                    raise
+                continue
+
+            # Time to first chunk is what a long stream should be judged on, not its full length
+            breaker.record_success(first_chunk if first_chunk is not None else time.perf_counter() - start)
+            self.cache.set(cache_key, self.cache_name, "".join(parts))
+            return
+
+        print("No provider could stream a response")
+
+    def retry_delay(self, attempts, attempt, backoffs):
+        """Jittered backoff before the next round, stretched to the shortest provider cooldown (Retry-After)."""
+        delay = backoff_delay(0, base=backoffs[min(attempt, len(backoffs) - 1)])
+        cooldown = min(get_rate_limiter(name).cooldown_remaining() for name, _ in attempts)
+        return max(delay, cooldown)
+
+    async def async_try_gemini(self, system_prompt, user_prompt, **kwargs):
+        response = await self.GM.async_model_pipeline(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
+        return response
+
+    async def async_try_deepseek(self, system_prompt, user_prompt, **kwargs):
+        response = await self.DS.async_model_pipeline(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
+        return response
+
+    async def async_try_gpt(self, system_prompt, user_prompt, **kwargs):
+        response = await self.GPT.async_model_pipeline(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
+        return response
+
+    async def async_call_with_fallback(self, system_prompt, user_prompt, max_retries=1, backoffs=(1.5, 3),
+                                       bypass_cache=False, hedge=None, validate=is_non_empty, **kwargs):
+        """Async version of call_with_fallback - backoff sleeps and cache I/O do not block other requests"""
+        cache_key = self.cache.make_key(self.cache_name, system_prompt, user_prompt, kwargs)
+        if not bypass_cache:
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                return cached
+
+        attempts = self.build_attempts(system_prompt, user_prompt, is_async=True, **kwargs)
+        hedge = self.hedge if hedge is None else hedge
+
+        for attempt in range(max_retries+1):
+            allowed = self.healthy_attempts(attempts)
+            if hedge and len(allowed) > 1:
+                try:
+                    response = await self.hedger.async_call(allowed, validate=validate)
+                    await self.cache.aset(cache_key, self.cache_name, response)
+                    return response
+                except Exception as e:
+                    print(f"Error with hedged call: {e}")
+            else:
+                invalid = None
+                for name, function in allowed:
+                    try:
+                        response = await self.hedger.async_timed(name, function)
+                    except Exception as e:
+                        print(f"Error with {name} model: {e}")
+                        continue
+                    if validate(response):
+                        await self.cache.aset(cache_key, self.cache_name, response)
+                        return response
+                    print(f"Invalid response from {name} model, trying the next provider")
+                    invalid = response if response is not None else invalid
+                if invalid is not None:
+                    return invalid
+            if attempt < max_retries:
+                await asyncio.sleep(self.retry_delay(attempts, attempt, backoffs))
+
+    def hedge_metrics(self) -> dict:
+        """Hedged / won / cancelled / skipped call counters plus the current hedge delay per provider."""
+        metrics = self.hedger.metrics.snapshot()
+        metrics["hedge_delay"] = {name: round(self.hedger.delay_for(name), 2) for name in self.providers}
+        return metrics
+
+    def provider_health(self) -> list:
+        """Circuit breaker state of each configured provider."""
+        return [self.health.get(name).snapshot() for name in self.providers]
+
+
+_shared_fallback = None
+_shared_fallback_lock = threading.Lock()
+
 
-     
\ No newline at end of file
+def get_model_fallback() -> ModelFallback:
+    """Return a process-wide ModelFallback so models and clients are built once."""
+    global _shared_fallback
+    with _shared_fallback_lock:
+        if _shared_fallback is None:
+            _shared_fallback = ModelFallback(hedge=os.getenv("AIGS_HEDGE", "0") == "1")
+        return _shared_fallback
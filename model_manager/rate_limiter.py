@@ -0,0 +1,232 @@
+# Import from libraries
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+import asyncio
+import os
+import random
+import threading
+import time
+
+# Requests/min, tokens/min and max concurrency per provider; None disables a budget.
+# The :free DeepSeek and Gemini models are heavily throttled, so start them low.
+DEFAULT_PROVIDER_LIMITS = {
+    "gpt": {"requests_per_minute": 500, "tokens_per_minute": 200_000, "max_concurrency": 16},
+    "deepseek": {"requests_per_minute": 20, "tokens_per_minute": None, "max_concurrency": 4},
+    "gemini": {"requests_per_minute": 20, "tokens_per_minute": None, "max_concurrency": 4},
+    "custom": {"requests_per_minute": 500, "tokens_per_minute": None, "max_concurrency": 16},
+}
+DEFAULT_COOLDOWN_SECONDS = 5.0
+POLL_SECONDS = 0.05
+
+
+def estimate_tokens(text) -> int:
+    """Rough token estimate (~4 characters per token) used for budgeting."""
+    return max(1, len(str(text or "")) // 4)
+
+
+def is_rate_limit_error(error) -> bool:
+    """True for HTTP 429 errors raised by the OpenAI client."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(error):
+    """Read Retry-After / retry-after-ms from an error's response headers, if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=1.5, cap=30.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket():
+    """Thread-safe token bucket. `reserve` deducts immediately and returns how long to wait."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1) -> float:
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class AdaptiveConcurrency():
+    """AIMD concurrency limit - halves on 429s, grows back by one slot per `limit` successes."""
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait(timeout=1.0)
+            self.in_flight += 1
+
+    async def async_acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep(POLL_SECONDS)
+
+    def release(self):
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify()
+
+    def on_rate_limited(self):
+        with self._cond:
+            self.limit = max(1.0, self.limit / 2)
+
+
+class ProviderRateLimiter():
+    """Request and token budgets plus adaptive concurrency for one provider.
+
+    Use `slot` (sync) or `async_slot` (async) around a provider call. Waiting only
+    sleeps the calling thread or task, so other in-flight requests keep going.
+    """
+
+    def __init__(self, provider, requests_per_minute=None, tokens_per_minute=None, max_concurrency=8):
+        self.provider = provider
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.blocked_until = 0.0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def cooldown_remaining(self) -> float:
+        return max(0.0, self.blocked_until - time.monotonic())
+
+    def _budget_delay(self, estimated_tokens) -> float:
+        delay = self.cooldown_remaining()
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(estimated_tokens))
+        return delay
+
+    def record_success(self):
+        self.concurrency.on_success()
+
+    def record_error(self, error):
+        """Shrink concurrency and honour Retry-After when the provider returns a 429."""
+        if not is_rate_limit_error(error):
+            return
+        wait = retry_after_seconds(error)
+        wait = DEFAULT_COOLDOWN_SECONDS if wait is None else wait
+        with self._lock:
+            self.rate_limited += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + wait)
+        self.concurrency.on_rate_limited()
+        print(f"Rate limited by {self.provider}; cooling down {wait:.1f}s, concurrency -> {int(self.concurrency.limit)}")
+
+    @contextmanager
+    def slot(self, estimated_tokens=1):
+        self.concurrency.acquire()
+        try:
+            delay = self._budget_delay(estimated_tokens)
+            if delay > 0:
+                time.sleep(delay)
+            yield
+        except Exception as e:
+            self.record_error(e)
+            raise
+        else:
+            self.record_success()
+        finally:
+            self.concurrency.release()
+
+    @asynccontextmanager
+    async def async_slot(self, estimated_tokens=1):
+        await self.concurrency.async_acquire()
+        try:
+            delay = self._budget_delay(estimated_tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+        except Exception as e:
+            self.record_error(e)
+            raise
+        else:
+            self.record_success()
+        finally:
+            self.concurrency.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "provider": self.provider,
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+            "rate_limited": self.rate_limited,
+            "cooldown_seconds": round(self.cooldown_remaining(), 2),
+        }
+
+
+def _limits_from_env(provider) -> dict:
+    limits = dict(DEFAULT_PROVIDER_LIMITS.get(provider, DEFAULT_PROVIDER_LIMITS["custom"]))
+    for name, env in (("requests_per_minute", "RPM"), ("tokens_per_minute", "TPM"), ("max_concurrency", "CONCURRENCY")):
+        value = os.getenv(f"AIGS_{provider.upper()}_{env}")
+        if value:
+            limits[name] = int(value)
+    return limits
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider) -> ProviderRateLimiter:
+    """Return the process-wide limiter for a provider, configured from defaults or AIGS_<PROVIDER>_RPM/TPM/CONCURRENCY."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = ProviderRateLimiter(provider, **_limits_from_env(provider))
+            _limiters[provider] = limiter
+        return limiter
+
+
+def configure_rate_limiter(provider, **limits) -> ProviderRateLimiter:
+    """Replace a provider's limiter with explicit budgets."""
+    with _limiters_lock:
+        merged = {**_limits_from_env(provider), **limits}
+        _limiters[provider] = ProviderRateLimiter(provider, **merged)
+        return _limiters[provider]
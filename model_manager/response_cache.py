@@ -0,0 +1,181 @@
+# Import from libraries
+from pathlib import Path
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.getenv("AIGS_CACHE_PATH", ".cache/responses.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 50_000
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+# Hits are written back as one batch of access times, and limits are enforced every EVICT_EVERY writes
+TOUCH_BATCH = 100
+EVICT_EVERY = 100
+
+
+class ResponseCache():
+    """Content-addressed, SQLite-backed cache of model responses.
+
+    Entries are keyed by a hash of model name, system prompt, user prompt and
+    hyperparameters, expire after `ttl_seconds` and are evicted least-recently-used
+    once the cache grows beyond `max_entries` or `max_bytes`. A hit only notes its access
+    time in memory; the notes are written in batches of TOUCH_BATCH, and expiry and size
+    limits are enforced every EVICT_EVERY writes, so the limits may be briefly exceeded.
+    Async callers use aget / aset, which run the SQLite I/O in a worker thread.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT,
+                    size INTEGER,
+                    created_at REAL,
+                    accessed_at REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+            self._evict(time.time())
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(model, system_prompt, user_prompt, hyperparams=None) -> str:
+        """Hash the inputs that determine a response into a cache key."""
+        payload = json.dumps(
+            {
+                "model": model,
+                "system_prompt": system_prompt,
+                "user_prompt": user_prompt,
+                "hyperparams": hyperparams or {},
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for a key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touches()
+                self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, model, response):
+        """Store a response, evicting expired or excess entries every EVICT_EVERY writes."""
+        if response is None:
+            return
+        if not isinstance(response, str):
+            response = json.dumps(response)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now)
+            )
+            self._touched.pop(key, None)
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._flush_touches()
+                self._evict(now)
+            self._conn.commit()
+
+    async def aget(self, key):
+        """get() without blocking the event loop."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key, model, response):
+        """set() without blocking the event loop."""
+        await asyncio.to_thread(self.set, key, model, response)
+
+    def _flush_touches(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched = {}
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Drop least recently used entries until both limits hold, reading the accessed_at index in order
+        excess = max(count - self.max_entries, 0)
+        freed = 0
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC"):
+            if excess <= 0 and total - freed <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            freed += size
+            excess -= 1
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current cache size."""
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+        }
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._touched = {}
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
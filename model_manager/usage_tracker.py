@@ -0,0 +1,255 @@
+# Import from libraries
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import threading
+
+# Largest prompt (estimated tokens) sent to each provider before it is flagged as oversized.
+# Override with AIGS_<PROVIDER>_MAX_PROMPT_TOKENS, e.g. AIGS_GPT_MAX_PROMPT_TOKENS=50000
+DEFAULT_MAX_PROMPT_TOKENS = {
+    "gpt": 272_000,
+    "deepseek": 64_000,
+    "gemini": 1_000_000,
+    "custom": 128_000,
+}
+# USD per million tokens; models not listed are reported without a cost
+MODEL_PRICES = {
+    "gpt-5-mini": {"input": 0.25, "cached_input": 0.025, "output": 2.00},
+    "deepseek/deepseek-r1:free": {"input": 0.0, "cached_input": 0.0, "output": 0.0},
+    "google/gemini-2.0-flash-exp:free": {"input": 0.0, "cached_input": 0.0, "output": 0.0},
+}
+
+# (s_ids, q_ids) the current call is made for, the open usage_scopes (outermost first) and the run it is counted in
+_labels = ContextVar("usage_labels", default=((), ()))
+_scopes = ContextVar("usage_scopes", default=())
+_run = ContextVar("usage_run", default=None)
+
+
+def _as_ids(value) -> tuple:
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple, set)):
+        return tuple(dict.fromkeys(str(v) for v in value if v is not None))
+    return (str(value),)
+
+
+@contextmanager
+def usage_scope(s_id=None, q_id=None):
+    """Attribute the provider calls made inside this block to the given student(s) and question(s).
+
+    Async tasks and hedged threads started inside the block inherit the labels. Yields a
+    dict whose provider, model and token logprobs are those of the last call made in the
+    block (None when no provider was called, e.g. on a cache hit, or no logprobs were returned),
+    and whose calls and cost_usd count every call made in it. A call made inside nested
+    scopes is counted in all of them.
+    """
+    scope = {"provider": None, "model": None, "calls": 0, "cost_usd": 0.0, "logprobs": None}
+    token = _labels.set((_as_ids(s_id), _as_ids(q_id)))
+    scope_token = _scopes.set(_scopes.get() + (scope,))
+    try:
+        yield scope
+    finally:
+        _scopes.reset(scope_token)
+        _labels.reset(token)
+
+
+@contextmanager
+def track_run():
+    """Collect the provider calls made inside this block in a fresh UsageStats, which is yielded."""
+    stats = UsageStats(detailed=True)
+    token = _run.set(stats)
+    try:
+        yield stats
+    finally:
+        _run.reset(token)
+
+
+def _field(obj, name, default=0):
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        value = obj.get(name, default)
+    else:
+        value = getattr(obj, name, default)
+    return default if value is None else value
+
+
+def extract_usage(response) -> dict:
+    """Prompt / completion / cached token counts from a responses-API or chat-completions response."""
+    usage = _field(response, "usage", None)
+    if usage is None:
+        return None
+    if _field(usage, "input_tokens", None) is not None:
+        prompt = _field(usage, "input_tokens")
+        completion = _field(usage, "output_tokens")
+        cached = _field(_field(usage, "input_tokens_details", None), "cached_tokens")
+    else:
+        prompt = _field(usage, "prompt_tokens")
+        completion = _field(usage, "completion_tokens")
+        cached = _field(_field(usage, "prompt_tokens_details", None), "cached_tokens")
+    return {"prompt_tokens": int(prompt), "completion_tokens": int(completion), "cached_tokens": int(cached)}
+
+
+def extract_logprobs(response):
+    """[(token, logprob), ...] of the output text, from a chat-completions or responses-API
+    response requested with logprobs; None when the response has none."""
+    choices = _field(response, "choices", None)
+    if choices:
+        content = _field(_field(choices[0], "logprobs", None), "content", None)
+    else:
+        content = [
+            entry
+            for item in _field(response, "output", None) or []
+            for part in _field(item, "content", None) or []
+            for entry in _field(part, "logprobs", None) or []
+            ]
+    if not content:
+        return None
+    return [(_field(entry, "token", ""), float(_field(entry, "logprob"))) for entry in content]
+
+
+def estimate_cost(model, usage):
+    """Estimated USD cost of one call, or None when the model's prices are unknown."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    uncached = usage["prompt_tokens"] - usage["cached_tokens"]
+    return (
+        uncached * prices["input"]
+        + usage["cached_tokens"] * prices["cached_input"]
+        + usage["completion_tokens"] * prices["output"]
+    ) / 1_000_000
+
+
+class UsageStats():
+    """Token, latency and cost totals, overall and per provider (plus per student/question when detailed).
+
+    The tokens and cost of a call made for several students or questions (a batched request)
+    are split evenly across them.
+    """
+
+    FIELDS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "estimated_prompt_tokens",
+              "latency", "cost_usd")
+
+    def __init__(self, detailed=False):
+        self.detailed = detailed
+        self.totals = self._empty()
+        self.providers = {}
+        self.students = {}
+        self.questions = {}
+        self.oversized = deque(maxlen=50)
+        self.unpriced_calls = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _empty(cls) -> dict:
+        return {name: 0 for name in cls.FIELDS}
+
+    # Counted in full for every student/question a shared call covers; the rest is split
+    UNSPLIT = ("calls", "latency")
+
+    @classmethod
+    def _add(cls, target, values, share=1.0):
+        for name, value in values.items():
+            target[name] += value if share == 1.0 or name in cls.UNSPLIT else value * share
+
+    def add(self, provider, values, s_ids=(), q_ids=(), priced=True):
+        with self._lock:
+            self._add(self.totals, values)
+            self._add(self.providers.setdefault(provider, self._empty()), values)
+            self.unpriced_calls += int(not priced)
+            if not self.detailed:
+                return
+            for ids, groups in ((s_ids, self.students), (q_ids, self.questions)):
+                for key in ids:
+                    self._add(groups.setdefault(key, self._empty()), values, share=1.0 / len(ids))
+
+    def flag(self, entry):
+        with self._lock:
+            self.oversized.append(entry)
+
+    @staticmethod
+    def _rounded(values) -> dict:
+        summary = {name: round(value, 6 if name == "cost_usd" else 2) for name, value in values.items()}
+        summary["calls"] = int(round(values["calls"]))
+        return summary
+
+    def summary(self) -> dict:
+        with self._lock:
+            summary = self._rounded(self.totals)
+            summary["by_provider"] = {name: self._rounded(values) for name, values in self.providers.items()}
+            if self.detailed:
+                summary["by_student"] = {name: self._rounded(values) for name, values in self.students.items()}
+                summary["by_question"] = {name: self._rounded(values) for name, values in self.questions.items()}
+            summary["oversized_prompts"] = list(self.oversized)
+            summary["unpriced_calls"] = self.unpriced_calls
+            return summary
+
+
+class UsageTracker():
+    """Process-wide usage accounting for every provider call made by the model classes.
+
+    `check_prompt` runs before dispatch and flags prompts larger than the provider's limit;
+    `record` runs after each response and adds its usage to the process totals and to the
+    run opened with track_run(), if any.
+    """
+
+    def __init__(self):
+        self.totals = UsageStats()
+
+    def max_prompt_tokens(self, provider) -> int:
+        value = os.getenv(f"AIGS_{provider.upper()}_MAX_PROMPT_TOKENS")
+        return int(value) if value else DEFAULT_MAX_PROMPT_TOKENS.get(provider, DEFAULT_MAX_PROMPT_TOKENS["custom"])
+
+    def check_prompt(self, provider, estimated_prompt_tokens) -> bool:
+        """Return False (and flag the prompt) when the estimate exceeds the provider's prompt limit."""
+        limit = self.max_prompt_tokens(provider)
+        if estimated_prompt_tokens <= limit:
+            return True
+        s_ids, q_ids = _labels.get()
+        entry = {
+            "provider": provider,
+            "estimated_prompt_tokens": estimated_prompt_tokens,
+            "limit": limit,
+            "s_ids": list(s_ids),
+            "q_ids": list(q_ids),
+        }
+        print(f"Oversized prompt for {provider}: ~{estimated_prompt_tokens} tokens (limit {limit}) {entry}")
+        self.totals.flag(entry)
+        run = _run.get()
+        if run is not None:
+            run.flag(entry)
+        return False
+
+    def record(self, provider, model, response, latency, estimated_prompt_tokens=0):
+        """Add one completed call. Responses without a usage field fall back to the prompt estimate."""
+        usage = extract_usage(response)
+        if usage is None:
+            usage = {"prompt_tokens": estimated_prompt_tokens, "completion_tokens": 0, "cached_tokens": 0}
+        values = dict(usage, calls=1, estimated_prompt_tokens=estimated_prompt_tokens, latency=latency)
+        cost = estimate_cost(model, usage)
+        values["cost_usd"] = cost or 0.0
+
+        logprobs = extract_logprobs(response)
+        for scope in _scopes.get():
+            scope.update(
+                provider=provider, model=model, calls=scope["calls"] + 1,
+                cost_usd=scope["cost_usd"] + values["cost_usd"], logprobs=logprobs
+                )
+        s_ids, q_ids = _labels.get()
+        for stats in (self.totals, _run.get()):
+            if stats is not None:
+                stats.add(provider, values, s_ids, q_ids, priced=cost is not None)
+        return usage
+
+    def summary(self) -> dict:
+        return self.totals.summary()
+
+
+USAGE_TRACKER = UsageTracker()
+
+
+def get_usage_tracker() -> UsageTracker:
+    """Return the process-wide usage tracker."""
+    return USAGE_TRACKER
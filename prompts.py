@@ -13,20 +13,27 @@ You will grade a single question using ONLY the provided rubric and ground-truth
 Do NOT invent new criteria. Award marks up to the max. Be fair and brief.
 """
 
-GRADING_USER_PROMPT_TEMPLATE = """
+# The static part of a grading prompt comes first and the student's answer last,
+# so the prefix is identical for every student and can be reused by provider-side prompt caching.
+GRADING_USER_PROMPT_PREFIX_TEMPLATE = """
 Assignment context:
 - Question: {question_text}
-- Student's answer: {student_answer}
 
 Retrieved context (for your reference):
 - Ground-truth: {ground_truth}
 - Rubric criteria: {rubric_criteria}
 - Max marks for this part: {max_marks}
 
-Now grade the student's answer strictly per rubric and ground-truth.
+Grade the student's answer below strictly per rubric and ground-truth.
 {format_instructions}
 """
 
+GRADING_USER_PROMPT_ANSWER_TEMPLATE = """
+Student's answer: {student_answer}
+"""
+
+GRADING_USER_PROMPT_TEMPLATE = GRADING_USER_PROMPT_PREFIX_TEMPLATE + GRADING_USER_PROMPT_ANSWER_TEMPLATE
+
 FEEDBACK_SYSTEM_PROMPT = """
 You are a helpful teaching assistant. Using the grading results of the assignment, write overall feedback that is personalised to the student and helps them to improve.
 """
@@ -35,3 +42,93 @@ Grading results: {grading_output}
 
 Keep the feedback length {feedback_length}.
 """
+
+BATCH_GRADE_JSON_INSTRUCTIONS = """
+Return ONLY a JSON object whose "grades" list has one entry per question, in this exact format:
+{
+  "grades": [
+    {
+      "q_id": "<question id>",
+      "marks_awarded": <integer>,
+      "max_marks": <integer>,
+      "reasoning": "<brief explanation tied to the rubric criteria>"
+    }
+  ]
+}
+"""
+
+BATCH_GRADING_SYSTEM_PROMPT = """
+You are an impartial AI teaching assistant for a Year-1 Business School Statistics course.
+You will grade every question of one student's assignment using ONLY the provided rubric and ground-truth.
+Grade each question independently. Do NOT invent new criteria. Award marks up to the max. Be fair and brief.
+"""
+
+BATCH_QUESTION_TEMPLATE = """
+Question {q_id}:
+- Question: {question_text}
+- Student's answer: {student_answer}
+- Ground-truth: {ground_truth}
+- Rubric criteria: {rubric_criteria}
+- Max marks for this part: {max_marks}
+"""
+
+BATCH_GRADING_USER_PROMPT_TEMPLATE = """
+Assignment context (with retrieved ground-truth and rubric for your reference):
+{questions}
+
+Now grade each of the student's answers strictly per rubric and ground-truth.
+{format_instructions}
+"""
+
+COHORT_GRADE_JSON_INSTRUCTIONS = """
+Return ONLY a JSON object whose "grades" list has one entry per student, in this exact format:
+{
+  "grades": [
+    {
+      "s_id": "<student id>",
+      "marks_awarded": <integer>,
+      "max_marks": <integer>,
+      "reasoning": "<brief explanation tied to the rubric criteria>"
+    }
+  ]
+}
+"""
+
+COHORT_GRADING_SYSTEM_PROMPT = """
+You are an impartial AI teaching assistant for a Year-1 Business School Statistics course.
+You will grade several students' answers to the same question using ONLY the provided rubric and ground-truth.
+Grade each student independently. Do NOT invent new criteria. Award marks up to the max. Be fair and brief.
+"""
+
+COHORT_ANSWER_TEMPLATE = """
+Student {s_id}: {student_answer}
+"""
+
+COHORT_GRADING_USER_PROMPT_TEMPLATE = """
+Assignment context:
+- Question: {question_text}
+
+Retrieved context (for your reference):
+- Ground-truth: {ground_truth}
+- Rubric criteria: {rubric_criteria}
+- Max marks for this part: {max_marks}
+
+Students' answers:
+{answers}
+
+Now grade every student's answer strictly per rubric and ground-truth.
+{format_instructions}
+"""
+
+# Sent only when a grading response fails validation - cheaper than regrading the answer
+REPAIR_SYSTEM_PROMPT = """
+You correct malformed grading output. Keep the original judgement; only fix the format and the listed problem.
+"""
+
+REPAIR_USER_PROMPT_TEMPLATE = """
+This grading output is invalid ({error}):
+{response}
+
+Max marks for this part: {max_marks}. marks_awarded must be an integer between 0 and the max marks.
+{format_instructions}
+"""
@@ -0,0 +1,7 @@
+# Import libraries
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+# The app's modules are imported from the repository root, as app.py and batch.py do
+sys.path.insert(0, str(ROOT))
@@ -0,0 +1,62 @@
+# Import files
+import batch
+from prompts import BATCH_GRADE_JSON_INSTRUCTIONS, COHORT_GRADE_JSON_INSTRUCTIONS
+from utils.response_parser import batch_grade_schema
+
+# Import libraries
+import json
+import re
+import pytest
+
+
+def example_of(instructions):
+    """The JSON example in a format instruction, with its <placeholders> filled in."""
+    text = instructions[instructions.index("{"):instructions.rindex("}") + 1]
+    text = re.sub(r"<integer>", "1", text)
+    return json.loads(re.sub(r'"<[^>]*>"', '"x"', text))
+
+
+@pytest.mark.parametrize("instructions, key", [
+    (BATCH_GRADE_JSON_INSTRUCTIONS, "q_id"),
+    (COHORT_GRADE_JSON_INSTRUCTIONS, "s_id"),
+])
+def test_batch_prompts_describe_the_enforced_schema(instructions, key):
+    schema = batch_grade_schema(key)
+    example = example_of(instructions)
+    assert sorted(example) == sorted(schema["required"])
+    assert sorted(example["grades"][0]) == sorted(schema["properties"]["grades"]["items"]["required"])
+
+
+@pytest.mark.parametrize("argv", [
+    ["--mode", "student", "--dedupe"],
+    ["--mode", "question", "--dedupe"],
+    ["--provider", "gpt", "--bypass-cache"],
+    ["--provider", "gemini", "--bypass-cache"],
+])
+def test_flags_that_do_not_apply_are_rejected(argv):
+    with pytest.raises(SystemExit):
+        batch.parse_args(argv)
+
+
+def test_flags_are_accepted_where_they_apply():
+    assert batch.parse_args(["--dedupe", "--bypass-cache"]).dedupe
+    assert batch.parse_args(["--provider", "custom", "--bypass-cache"]).bypass_cache
+
+
+@pytest.mark.parametrize("argv", [
+    ["--providers", "gpt,bogus"],
+    ["--providers", " , "],
+])
+def test_unknown_providers_are_rejected(argv):
+    with pytest.raises(SystemExit):
+        batch.parse_args(argv)
+
+
+def test_provider_names_are_stripped():
+    assert batch.parse_args(["--providers", "gpt, gemini ,deepseek"]).providers == ("gpt", "gemini", "deepseek")
+
+
+def test_cascade_tiers_are_stripped_and_checked():
+    assert batch.parse_args(["--cascade", "--tiers", "gemini, gpt"]).tiers == ("gemini", "gpt")
+    with pytest.raises(SystemExit):
+        batch.parse_args(["--cascade", "--tiers", "gemini,bogus"])
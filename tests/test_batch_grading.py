@@ -0,0 +1,21 @@
+# Import files
+from utils.batch_grading import BatchEngine, QuestionBatchEngine, StudentBatchEngine
+
+# Import libraries
+import pytest
+
+
+async def call(system_prompt, user_prompt, **kwargs):
+    return None
+
+
+def test_batch_engine_without_a_prompt_builder_fails_when_built():
+    class NoPromptEngine(BatchEngine):
+        pass
+
+    with pytest.raises(TypeError):
+        NoPromptEngine(call)
+    with pytest.raises(TypeError):
+        BatchEngine(call)
+    assert StudentBatchEngine(call).batch_key == "q_id"
+    assert QuestionBatchEngine(call).batch_key == "s_id"
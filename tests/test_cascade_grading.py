@@ -0,0 +1,78 @@
+# Import files
+from utils.cascade_grading import CascadeEngine
+from model_manager.usage_tracker import get_usage_tracker
+
+# Import libraries
+from types import SimpleNamespace
+import asyncio
+import json
+import math
+
+# Per answer: (marks, probability of the marks) from the cheap tier, which returns logprobs
+CHEAP = {"easy": (9, 0.99), "unsure": (9, 0.5), "flaky": (9, 0.3), "border": (5, 0.99)}
+# Per answer: (first sample, verification sample) from the middle tier, which returns no logprobs
+MIDDLE = {"unsure": (9, 9), "flaky": (9, 3), "border": (5, 5), "broken": (8, 8)}
+
+
+def grade(marks):
+    return json.dumps({"marks_awarded": marks, "max_marks": 10, "reasoning": "ok"})
+
+
+def answer_of(user_prompt):
+    return next((answer for answer in ("easy", "unsure", "flaky", "border", "broken") if answer in user_prompt), None)
+
+
+def record(text, logprobs=None):
+    """Record the call in the usage scopes, as a provider pipeline does."""
+    content = None
+    if logprobs is not None:
+        content = [SimpleNamespace(token=token, logprob=logprob) for token, logprob in logprobs]
+    response = SimpleNamespace(choices=[SimpleNamespace(logprobs=SimpleNamespace(content=content))])
+    get_usage_tracker().record("fake", "fake-model", response, 0.01)
+    return text
+
+
+async def cheap(system_prompt, user_prompt, response_schema=None, **kwargs):
+    answer = answer_of(user_prompt)
+    if answer not in CHEAP:
+        return record("I cannot grade this.")
+    marks, probability = CHEAP[answer]
+    text = grade(marks)
+    start = text.index(str(marks))
+    tokens = [(text[:start], 0.0), (str(marks), math.log(probability)), (text[start + 1:], 0.0)]
+    return record(text, tokens if kwargs.get("logprobs") else None)
+
+
+async def middle(system_prompt, user_prompt, response_schema=None, **kwargs):
+    first, verification = MIDDLE[answer_of(user_prompt)]
+    return record(grade(verification if kwargs.get("sample") else first))
+
+
+async def strong(system_prompt, user_prompt, response_schema=None, **kwargs):
+    return record(grade(7))
+
+
+def test_cascade_hit_rates_and_escalation_reasons():
+    rows = [
+        {"s_id": answer, "q_id": "1", "q_text": "Q", "ground_truth": "A", "rubric_criteria": "R",
+         "max_marks": 10, "s_answer": answer}
+        for answer in ("easy", "unsure", "flaky", "border", "broken")
+    ]
+    engine = CascadeEngine([("cheap", cheap), ("middle", middle), ("strong", strong)], concurrency=2)
+    results = asyncio.run(engine.grade_all(rows))
+
+    assert {result["s_id"]: result["tier"] for result in results} == {
+        "easy": "cheap", "unsure": "middle", "broken": "middle", "flaky": "strong", "border": "strong"
+        }
+    summary = engine.cascade_summary()
+    tiers = summary["tiers"]
+    assert summary["rows"] == 5
+    assert [tiers[name]["attempts"] for name in ("cheap", "middle", "strong")] == [5, 4, 2]
+    assert [tiers[name]["hit_rate"] for name in ("cheap", "middle", "strong")] == [0.2, 0.5, 1.0]
+    assert [tiers[name]["share_of_rows"] for name in ("cheap", "middle", "strong")] == [0.2, 0.4, 0.4]
+    assert tiers["cheap"]["escalated"] == {"invalid": 1, "low_confidence": 2, "disagreement": 0, "borderline": 1}
+    assert tiers["middle"]["escalated"] == {"invalid": 0, "low_confidence": 0, "disagreement": 1, "borderline": 1}
+    # The cheap tier's logprobs give every grade a confidence; the middle tier needs a verification sample
+    assert tiers["cheap"]["verified"] == 0
+    assert tiers["middle"]["verified"] == 3
+    assert tiers["strong"]["calls"] == 2
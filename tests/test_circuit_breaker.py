@@ -0,0 +1,50 @@
+# Import files
+from model_manager.circuit_breaker import CLOSED, HALF_OPEN, OPEN, HealthRegistry
+from model_manager.model_fallback import ModelFallback
+from model_manager.response_cache import ResponseCache
+
+# Import libraries
+import asyncio
+import time
+
+
+def half_open_fallback(hedge=False):
+    """A gpt -> gemini ModelFallback whose breakers are both waiting for a probe; gpt answers."""
+    fallback = ModelFallback(cache=ResponseCache(":memory:"), providers=("gpt", "gemini"), hedge=hedge)
+    fallback.health = HealthRegistry()
+    for name in ("gpt", "gemini"):
+        fallback.health.get(name).state = HALF_OPEN
+    calls = []
+
+    async def gpt(system_prompt, user_prompt, **kwargs):
+        calls.append("gpt")
+        return "answer"
+
+    async def gemini(system_prompt, user_prompt, **kwargs):
+        calls.append("gemini")
+        return "answer"
+    fallback.async_try_gpt = gpt
+    fallback.async_try_gemini = gemini
+    return fallback, calls
+
+
+def test_probe_is_only_claimed_by_the_provider_that_is_called():
+    fallback, calls = half_open_fallback()
+    assert asyncio.run(fallback.async_call_with_fallback("s", "u", hedge=False)) == "answer"
+
+    assert calls == ["gpt"]
+    assert fallback.health.get("gpt").state == CLOSED
+    gemini = fallback.health.get("gemini")
+    assert gemini.probe_started is None
+    assert gemini.allow()
+
+
+def test_available_does_not_claim_the_probe():
+    breaker = HealthRegistry(open_seconds=30.0).get("gpt")
+    breaker.state = OPEN
+    breaker.opened_at = time.monotonic() - 60
+    assert breaker.available()
+    assert breaker.available()
+    assert breaker.allow()
+    assert not breaker.available()
+    assert not breaker.allow()
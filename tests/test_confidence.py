@@ -0,0 +1,36 @@
+# Import files
+from utils.confidence import DEFAULT_SAMPLE_TEMPERATURE, GradeVotes, SelfConsistency
+from model_manager.gemini_model import GeminiModel
+from model_manager.gpt_model import GPTModel
+
+
+def grade(marks):
+    return {"marks_awarded": marks, "max_marks": 10, "reasoning": ""}
+
+
+def test_extra_samples_are_drawn_with_a_non_zero_temperature():
+    confidence = SelfConsistency()
+    assert "temperature" not in confidence.call_kwargs(0)
+    kwargs = confidence.call_kwargs(1)
+    assert kwargs["sample"] == 1
+    assert kwargs["temperature"] == DEFAULT_SAMPLE_TEMPERATURE > 0
+
+
+def test_sampling_overrides_reach_non_reasoning_models_only():
+    kwargs = SelfConsistency().call_kwargs(2)
+    gemini = GeminiModel().format_hyperparams(**kwargs)
+    assert gemini["temperature"] == DEFAULT_SAMPLE_TEMPERATURE
+    assert gemini["top_p"] > 0.2
+    assert "temperature" not in GPTModel().format_hyperparams(**kwargs)
+
+
+def test_votes_settle_once_two_samples_agree():
+    votes = GradeVotes(agree=2, max_samples=5)
+    votes.add(grade(6))
+    votes.add(grade(7))
+    assert not votes.settled()
+    votes.add(grade(7))
+    assert votes.settled()
+    winner, confidence = votes.result()
+    assert winner["marks_awarded"] == 7
+    assert confidence == 2 / 3
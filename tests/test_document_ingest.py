@@ -0,0 +1,33 @@
+# Import files
+from utils.document_ingest import parse_rubric, section_max_marks
+
+# Import libraries
+import pytest
+
+
+@pytest.mark.parametrize("section, max_marks", [
+    ("2 marks for method, 8 marks for answer. [10]", 10),
+    ("Correct mean with working. (10 marks)", 10),
+    ("Correct mean with working [10 marks]", 10),
+    ("Award 2 marks for the method and 8 marks for the final answer.", 10),
+    ("Method (2 marks); final answer (8 marks).", 10),
+    ("[2] for the method, [8] for the answer [10]", 10),
+    ("Maximum marks: 6. Award 2 marks per correct step.", 6),
+    ("Total: 12. Method 4 marks, answer 8 marks.", 12),
+    ("Marked out of 5; 1 mark for units.", 5),
+    ("(1) State the formula. (2) Apply it. 3 marks", 3),
+    ("Explain the result clearly.", None),
+])
+def test_section_max_marks(section, max_marks):
+    assert section_max_marks(section) == max_marks
+
+
+def test_parse_rubric_reads_each_question_total():
+    text = (
+        "Q1. 2 marks for method, 8 marks for answer. [10]\n"
+        "Q2. Interpret the confidence interval (4 marks)\n"
+        "Q3. Award 1 mark for the hypothesis and 2 marks for the conclusion.\n"
+        )
+    rubric = parse_rubric([text])
+    assert {part["qid"]: part["max_marks"] for part in rubric["parts"]} == {"1": 10, "2": 4, "3": 3}
+    assert rubric["total_marks"] == 17
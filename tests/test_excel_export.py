@@ -0,0 +1,95 @@
+# Import files
+from conftest import ROOT
+import batch
+from utils.excel_export import export_results, iter_result_file, iter_store_records
+from utils.results_store import ResultsStore
+
+# Import libraries
+import asyncio
+import csv
+import json
+
+GRADE = json.dumps({"marks_awarded": 4, "max_marks": 10, "reasoning": "Mostly correct."})
+
+
+def failing_call(failures):
+    """A fake model call that returns no response for its first `failures` calls, then a grade."""
+    calls = 0
+
+    async def call(system_prompt, user_prompt, response_schema=None, **kwargs):
+        nonlocal calls
+        calls += 1
+        return None if calls <= failures else GRADE
+    return call
+
+
+def run_batch(monkeypatch, tmp_path, call, output):
+    monkeypatch.setattr(batch, "build_call", lambda args: (call, None))
+    args = batch.parse_args([
+        "--gt", str(ROOT / "sample/gt.json"), "--rubric", str(ROOT / "sample/rubric.json"),
+        "--submissions", str(ROOT / "sample/students"), "--provider", "gpt", "--concurrency", "1",
+        "--output", str(output), "--journal", str(tmp_path / "journal.jsonl"),
+        ])
+    return asyncio.run(batch.run_batch(args))
+
+
+def test_resume_after_partial_failure_exports_each_answer_once(monkeypatch, tmp_path):
+    output = tmp_path / "results.jsonl"
+    first = run_batch(monkeypatch, tmp_path, failing_call(1), output)
+    assert (first["rows"], first["errors"]) == (4, 1)
+
+    # Only the failed answer is retried, and its new row is appended to the same file
+    resumed = run_batch(monkeypatch, tmp_path, failing_call(0), output)
+    assert (resumed["rows"], resumed["errors"]) == (1, 0)
+    assert len(output.read_text().splitlines()) == 5
+
+    records = list(iter_result_file(output))
+    assert len(records) == 4
+    assert {record["status"] for record in records} == {"Graded"}
+
+    summary = export_results(records, [tmp_path / "report.csv", tmp_path / "report.xlsx"])
+    assert (summary["rows"], summary["students"], summary["questions"]) == (4, 2, 2)
+    with open(tmp_path / "report.csv", newline="", encoding="utf-8") as f:
+        assert sorted((row["s_id"], row["q_id"]) for row in csv.DictReader(f)) == [
+            ("1", "1"), ("1", "2"), ("2", "1"), ("2", "2")
+            ]
+
+
+def test_csv_results_keep_the_last_record_per_answer(tmp_path):
+    output = tmp_path / "results.csv"
+    writer = batch.ResultWriter(output, batch.RESULT_FIELDS)
+    writer.write({"s_id": "a", "q_id": "1", "error": "no response"})
+    writer.write({"s_id": "a", "q_id": "2", "marks_awarded": 3, "max_marks": 5})
+    writer.write({"s_id": "a", "q_id": "1", "marks_awarded": 5, "max_marks": 5})
+    writer.close()
+
+    records = list(iter_result_file(output))
+    assert [(record["q_id"], record["status"]) for record in records] == [("2", "Graded"), ("1", "Graded")]
+
+
+def test_store_export_reads_chunks_with_reviewer_edits(tmp_path):
+    gt = json.loads((ROOT / "sample/gt.json").read_text())
+    rubric = json.loads((ROOT / "sample/rubric.json").read_text())
+    students = [{"id": s_id, "answers": {}} for s_id in ("a", "b", "c")]
+    store = ResultsStore(gt, students, rubric)
+    q_ids = [str(q_id) for q_id in store.q_ids]
+    store.add_result({"s_id": "a", "q_id": q_ids[0], "response": GRADE, "confidence": 0.8, "provider": "gpt"})
+    store.add_result({"s_id": "b", "q_id": q_ids[0], "response": "not json", "provider": "gpt"})
+    store.apply_edit(store.position("b", q_ids[0]), "Marks Awarded", 1)
+    store.apply_edit(store.position("c", q_ids[0]), "Feedback", "See me")
+
+    records = list(iter_store_records(store, chunk_rows=4))
+    assert len(records) == len(store)
+    by_answer = {(record["s_id"], record["q_id"]): record for record in records}
+    first = by_answer[("a", q_ids[0])]
+    assert (first["marks_awarded"], first["status"], first["provider"]) == (4.0, "Graded", "gpt")
+    # The reviewer's mark grades the failed answer
+    assert (by_answer[("b", q_ids[0])]["marks_awarded"], by_answer[("b", q_ids[0])]["status"]) == (1.0, "Graded")
+    pending = by_answer[("c", q_ids[-1])]
+    assert (pending["marks_awarded"], pending["status"], pending["provider"], pending["confidence"]) == (
+        None, "Pending", None, None
+        )
+
+    summary = export_results(records, [tmp_path / "report.csv"], feedback=store.feedback())
+    assert summary["rows"] == len(store)
+    assert store.feedback()["c"] == "See me"
@@ -0,0 +1,53 @@
+# Import files
+from utils.checkpoint_journal import CheckpointJournal
+from utils.feedback_pipeline import FeedbackPipeline
+from utils.grading_engine import GradingEngine
+
+# Import libraries
+import asyncio
+import json
+
+ROWS = [
+    {"s_id": s_id, "q_id": q_id, "q_text": "Q", "ground_truth": "A", "rubric_criteria": "R",
+     "max_marks": 5, "s_answer": f"answer {s_id}{q_id}"}
+    for s_id in ("a", "b") for q_id in ("1", "2")
+]
+
+
+async def grading_call(system_prompt, user_prompt, response_schema=None, **kwargs):
+    return json.dumps({"marks_awarded": 3, "max_marks": 5, "reasoning": "ok"})
+
+
+def run_pipeline(journal, feedback):
+    """Grade ROWS and write feedback, the model replying `feedback` to every feedback request."""
+    async def feedback_call(system_prompt, user_prompt, **kwargs):
+        return feedback
+    pipeline = FeedbackPipeline(
+        GradingEngine(grading_call, journal=journal), feedback_call, question_ids=["1", "2"], journal=journal
+        )
+    written = []
+    asyncio.run(pipeline.run(ROWS, on_feedback=written.append))
+    return pipeline.stats, written
+
+
+def test_empty_feedback_is_an_error_and_is_retried_on_resume(tmp_path):
+    journal = CheckpointJournal(tmp_path / "journal.jsonl", "assignment")
+    stats, written = run_pipeline(journal, "   ")
+    assert (stats["written"], stats["errors"]) == (0, 2)
+    assert all(entry["error"] for entry in written)
+    assert journal.feedback_done == set()
+    journal.close()
+
+    # The resumed run grades nothing again, but writes both students' feedback
+    journal = CheckpointJournal(tmp_path / "journal.jsonl", "assignment")
+    assert len(journal.completed) == 4
+    stats, written = run_pipeline(journal, "Well done.")
+    assert (stats["written"], stats["errors"]) == (2, 0)
+    assert sorted(entry["s_id"] for entry in written) == ["a", "b"]
+    assert journal.feedback_done == {"a", "b"}
+    journal.close()
+
+
+def test_none_feedback_is_an_error(tmp_path):
+    stats, written = run_pipeline(None, None)
+    assert (stats["written"], stats["errors"]) == (0, 2)
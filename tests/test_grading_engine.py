@@ -0,0 +1,30 @@
+# Import files
+from utils.grading_engine import GradingEngine
+
+# Import libraries
+import asyncio
+import json
+
+
+def test_dedupe_grades_identical_answers_once_and_keeps_only_counts():
+    calls = []
+
+    async def call(system_prompt, user_prompt, **kwargs):
+        calls.append(user_prompt)
+        await asyncio.sleep(0)
+        return json.dumps({"marks_awarded": 2, "max_marks": 2, "reasoning": "ok"})
+
+    answers = ["4", " 4.0 ", "5", "4", "5"]
+    rows = [
+        {"s_id": f"S{i}", "q_id": "1", "q_text": "2 + 2?", "ground_truth": "4", "rubric_criteria": "Correct",
+         "max_marks": 2, "s_answer": answer}
+        for i, answer in enumerate(answers)
+    ]
+    engine = GradingEngine(call, concurrency=1, dedupe=True)
+    results = engine.run(rows)
+
+    assert len(calls) == 2
+    assert [result["s_id"] for result in results] == ["S0", "S1", "S2", "S3", "S4"]
+    assert [result["shared_from"] for result in results] == [None, "S0", None, "S0", "S2"]
+    assert all(result["error"] is None for result in results)
+    assert engine.dedup_summary() == {"rows": 5, "unique_answers": 2, "calls_saved": 3}
@@ -0,0 +1,44 @@
+# Import files
+from model_manager.hedging import Hedger
+
+# Import libraries
+import threading
+import time
+
+
+def test_sync_hedges_are_bounded_while_abandoned_calls_hold_workers():
+    hedger = Hedger(min_delay=0.02, default_delay=0.02, max_workers=4, max_hedges=1)
+    release = threading.Event()
+    called = []
+
+    def primary():
+        time.sleep(0.1)
+        return "primary"
+
+    def stuck():
+        called.append("stuck")
+        release.wait(5)
+        return "late"
+
+    def spare():
+        called.append("spare")
+        return "spare"
+
+    # The hedge loses and is abandoned, still holding its worker
+    assert hedger.call([("gpt", primary), ("gemini", stuck)]) == "primary"
+    assert hedger.metrics.snapshot()["hedged"] == 1
+
+    # With the only hedge slot taken, the slow call is waited on rather than hedged
+    assert hedger.call([("gpt", primary), ("deepseek", spare)]) == "primary"
+    assert hedger.metrics.snapshot()["skipped"] == 1
+    assert called == ["stuck"]
+
+    # Once the abandoned call returns its worker, hedging resumes
+    release.set()
+    deadline = time.monotonic() + 5
+    while not hedger._hedge_slots.acquire(blocking=False):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    hedger._hedge_slots.release()
+    assert hedger.call([("gpt", primary), ("deepseek", spare)]) == "spare"
+    assert hedger.metrics.snapshot()["hedged"] == 2
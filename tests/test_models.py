@@ -0,0 +1,83 @@
+# Import files
+from model_manager import base_model
+from model_manager.custom_model import CustomModel
+from model_manager.gpt_model import GPTModel
+from model_manager.response_cache import ResponseCache
+from model_manager.usage_tracker import UsageTracker
+
+# Import libraries
+from types import SimpleNamespace
+
+import pytest
+
+
+class FakeStream():
+    """A responses-API event stream that records whether it was closed."""
+
+    def __init__(self, deltas):
+        self.events = [SimpleNamespace(type="response.output_text.delta", delta=delta) for delta in deltas]
+        self.events.append(SimpleNamespace(type="response.completed", response=SimpleNamespace(
+            usage={"input_tokens": 40, "output_tokens": 12, "input_tokens_details": {"cached_tokens": 0}}
+            )))
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = UsageTracker()
+    monkeypatch.setattr(base_model, "get_usage_tracker", lambda: tracker)
+    return tracker
+
+
+def fake_stream(model, monkeypatch, deltas=("The ", "answer ", "is 4")):
+    stream = FakeStream(deltas)
+    monkeypatch.setattr(model, "create_client", lambda: None)
+    monkeypatch.setattr(model, "stream_response", lambda **kwargs: stream)
+    return stream
+
+
+def test_stream_closed_early_still_records_usage(tracker, monkeypatch):
+    model = GPTModel()
+    stream = fake_stream(model, monkeypatch)
+
+    pieces = model.model_pipeline("system", "user", stream=True)
+    assert next(pieces) == "The "
+    pieces.close()
+
+    summary = tracker.summary()
+    assert summary["calls"] == 1
+    assert summary["prompt_tokens"] > 0
+    assert stream.closed
+
+
+def test_finished_stream_records_reported_usage(tracker, monkeypatch):
+    model = GPTModel()
+    stream = fake_stream(model, monkeypatch)
+
+    assert "".join(model.model_pipeline("system", "user", stream=True)) == "The answer is 4"
+
+    summary = tracker.summary()
+    assert (summary["calls"], summary["prompt_tokens"], summary["completion_tokens"]) == (1, 40, 12)
+    assert not stream.closed
+
+
+def test_custom_stream_closed_early_records_usage_and_is_not_cached(tracker, monkeypatch):
+    cache = ResponseCache(":memory:")
+    monkeypatch.setattr("model_manager.custom_model.get_response_cache", lambda: cache)
+    model = CustomModel(api_key="key", model="gpt-5-mini")
+    fake_stream(model, monkeypatch)
+
+    pieces = model.model_pipeline("system", "user", stream=True)
+    next(pieces)
+    pieces.close()
+    assert tracker.summary()["calls"] == 1
+    assert cache.get(cache.make_key(model.cache_name, "system", "user", {})) is None
+
+    assert "".join(model.model_pipeline("system", "user", stream=True)) == "The answer is 4"
+    assert cache.get(cache.make_key(model.cache_name, "system", "user", {})) == "The answer is 4"
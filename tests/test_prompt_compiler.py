@@ -0,0 +1,26 @@
+# Import files
+from utils import prompt_compiler
+
+# Import libraries
+from collections import OrderedDict
+
+
+def assignment(number):
+    gt = {"questions": [{"id": "1", "text": f"Question {number}", "ground_truth": "4"}]}
+    rubric = {"parts": [{"qid": "1", "criteria": "Correct answer", "max_marks": 2}]}
+    return gt, rubric
+
+
+def test_compiled_assignments_are_bounded_lru(monkeypatch):
+    monkeypatch.setattr(prompt_compiler, "_compiled", OrderedDict())
+    monkeypatch.setattr(prompt_compiler, "MAX_COMPILED", 2)
+
+    first = prompt_compiler.compile_assignment(*assignment(1))
+    prompt_compiler.compile_assignment(*assignment(2))
+    # Using the first again makes the second the least recently used
+    assert prompt_compiler.compile_assignment(*assignment(1)) is first
+    prompt_compiler.compile_assignment(*assignment(3))
+
+    assert len(prompt_compiler._compiled) == 2
+    assert prompt_compiler.compile_assignment(*assignment(1)) is first
+    assert [c.questions[0]["q_text"] for c in prompt_compiler._compiled.values()] == ["Question 3", "Question 1"]
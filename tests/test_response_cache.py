@@ -0,0 +1,87 @@
+# Import files
+from model_manager import response_cache
+from model_manager.hedging import is_valid_grade
+from model_manager.model_fallback import ModelFallback
+from model_manager.response_cache import ResponseCache
+
+# Import libraries
+import asyncio
+import json
+
+GRADE = json.dumps({"marks_awarded": 3, "max_marks": 5, "reasoning": "ok"})
+
+
+def accessed_at(cache, key):
+    return cache._conn.execute("SELECT accessed_at FROM responses WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_are_written_back_in_batches(monkeypatch):
+    monkeypatch.setattr(response_cache, "TOUCH_BATCH", 3)
+    cache = ResponseCache(":memory:")
+    cache.set("a", "m", "A")
+    written = accessed_at(cache, "a")
+
+    assert cache.get("a") == "A"
+    assert accessed_at(cache, "a") == written
+    cache.get("a")
+    cache.get("a")
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 3
+    assert accessed_at(cache, "a") > written
+
+
+def test_limits_are_enforced_every_few_writes_least_recently_used_first(monkeypatch):
+    monkeypatch.setattr(response_cache, "EVICT_EVERY", 5)
+    cache = ResponseCache(":memory:", max_entries=3)
+    for key in "abcd":
+        cache.set(key, "m", key)
+    assert cache.stats()["entries"] == 4
+
+    cache.get("a")
+    cache.set("e", "m", "e")
+    assert cache.stats()["entries"] == 3
+    assert [cache.get(key) for key in "abcde"] == ["a", None, None, "d", "e"]
+
+
+def test_async_helpers_round_trip():
+    cache = ResponseCache(":memory:")
+
+    async def run():
+        await cache.aset("k", "m", {"x": 1})
+        return await cache.aget("k")
+    assert json.loads(asyncio.run(run())) == {"x": 1}
+
+
+def fallback_with(responses):
+    """A gpt -> gemini ModelFallback whose providers return `responses[name]`."""
+    fallback = ModelFallback(cache=ResponseCache(":memory:"), providers=("gpt", "gemini"))
+    calls = []
+
+    def provider(name):
+        async def call(system_prompt, user_prompt, **kwargs):
+            calls.append(name)
+            return responses[name]
+        return call
+    fallback.async_try_gpt = provider("gpt")
+    fallback.async_try_gemini = provider("gemini")
+    return fallback, calls
+
+
+def test_invalid_grade_moves_on_and_only_the_valid_one_is_cached():
+    fallback, calls = fallback_with({"gpt": "I cannot grade this.", "gemini": GRADE})
+    call = lambda: asyncio.run(fallback.async_call_with_fallback("s", "u", validate=is_valid_grade))
+
+    assert call() == GRADE
+    assert calls == ["gpt", "gemini"]
+    assert call() == GRADE
+    assert calls == ["gpt", "gemini"]
+
+
+def test_invalid_grade_from_every_provider_is_returned_but_not_cached():
+    fallback, calls = fallback_with({"gpt": '{"marks_awarded": 1', "gemini": "no grade"})
+    call = lambda: asyncio.run(fallback.async_call_with_fallback("s", "u", validate=is_valid_grade))
+
+    assert call() == "no grade"
+    assert call() == "no grade"
+    assert calls == ["gpt", "gemini"] * 2
+    assert fallback.cache.stats()["entries"] == 0
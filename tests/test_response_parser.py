@@ -0,0 +1,74 @@
+# Import files
+from utils.grading_engine import GradingEngine, REGRADE_MAX_TOKENS
+from utils.response_parser import TRUNCATED, is_grade_response, parse_batch_grades, try_parse_grade
+
+# Import libraries
+import asyncio
+import json
+import pytest
+
+GRADE = {"marks_awarded": 7, "max_marks": 10, "reasoning": "Correct method, arithmetic slip."}
+
+
+@pytest.mark.parametrize("response", [
+    json.dumps(GRADE),
+    "```json\n" + json.dumps(GRADE) + "\n```",
+    "Here is the grade:\n```\n" + json.dumps(GRADE, indent=2) + "\n```\nLet me know if you need more.",
+    "[Note] " + json.dumps(GRADE) + " (end)",
+    json.dumps([GRADE]),
+])
+def test_fenced_and_wrapped_json_is_parsed(response):
+    assert try_parse_grade(response, 10) == (GRADE, None)
+
+
+@pytest.mark.parametrize("response", [
+    '{"marks_awarded": 1',
+    '{"marks_awarded": 7, "max_marks": 1',
+    '{"marks_awarded": 7, "max_marks": 10, "reasoning": "Correct meth',
+    '```json\n{"marks_awarded": 7, "max_marks": 10,',
+])
+def test_truncated_json_is_never_graded(response):
+    grade, problem = try_parse_grade(response, 10)
+    assert grade is None
+    assert problem.startswith(TRUNCATED)
+
+
+@pytest.mark.parametrize("item, missing", [
+    ({"marks_awarded": 7}, "max_marks, reasoning"),
+    ({"marks_awarded": 7, "max_marks": 10}, "reasoning"),
+    ({"marks_awarded": 7, "reasoning": "ok"}, "max_marks"),
+])
+def test_grade_missing_fields_is_a_schema_failure(item, missing):
+    assert try_parse_grade(json.dumps(item), 10) == (None, f"missing {missing}")
+
+
+def test_rubric_max_marks_takes_precedence():
+    grade, _ = try_parse_grade(json.dumps(dict(GRADE, max_marks=20)), 10)
+    assert grade["max_marks"] == 10
+    assert try_parse_grade(json.dumps(dict(GRADE, marks_awarded=12)), 10)[0] is None
+
+
+def test_truncated_batch_keeps_only_finished_grades():
+    rows = [{"q_id": "1", "max_marks": 5}, {"q_id": "2", "max_marks": 5}]
+    response = (
+        '{"grades": [{"q_id": "1", "marks_awarded": 4, "max_marks": 5, "reasoning": "a"}, '
+        '{"q_id": "2", "marks_awarded": 1'
+        )
+    assert parse_batch_grades(response, rows) == {"1": {"marks_awarded": 4, "max_marks": 5, "reasoning": "a"}}
+    assert not is_grade_response(response)
+
+
+def test_engine_regrades_a_truncated_reply_with_more_room():
+    calls = []
+
+    async def call(system_prompt, user_prompt, response_schema=None, **kwargs):
+        calls.append(kwargs)
+        return '{"marks_awarded": 1' if len(calls) == 1 else json.dumps(GRADE)
+
+    row = {"s_id": "s1", "q_id": "1", "q_text": "Q", "ground_truth": "A", "rubric_criteria": "R",
+           "max_marks": 10, "s_answer": "answer"}
+    engine = GradingEngine(call)
+    results = asyncio.run(engine.grade_all([row]))
+    assert json.loads(results[0]["response"]) == GRADE
+    assert calls[1].get("max_tokens") == REGRADE_MAX_TOKENS
+    assert engine.parse_stats["repaired"] == 1
@@ -0,0 +1,72 @@
+# Import files
+from utils.results_store import ResultsStore
+
+# Import libraries
+import json
+
+import numpy as np
+import pytest
+
+
+def grade(marks, max_marks, reasoning="ok"):
+    return json.dumps({"marks_awarded": marks, "max_marks": max_marks, "reasoning": reasoning})
+
+
+@pytest.fixture
+def store():
+    gt = {"questions": [{"id": "1", "text": "2 + 2?", "ground_truth": "4"}, {"id": "2", "text": "Explain", "ground_truth": "x"}]}
+    rubric = {"parts": [{"qid": "1", "criteria": "Correct", "max_marks": 5}, {"qid": "2", "criteria": "Clear", "max_marks": 10}]}
+    students = [{"id": sid, "answers": {"1": "4", "2": "because"}} for sid in ("S001", "S002", "T003")]
+    store = ResultsStore(gt, students, rubric)
+    store.add_result({"s_id": "S001", "q_id": "1", "response": grade(5, 5), "confidence": 0.95, "provider": "gpt"})
+    store.add_result({"s_id": "S001", "q_id": "2", "response": grade(4, 10), "confidence": 0.5, "provider": "gemini"})
+    store.add_result({"s_id": "S002", "q_id": "1", "response": "not json", "provider": "gpt"})
+    store.add_result({"s_id": "T003", "q_id": "2", "response": grade(9, 10), "confidence": 0.99, "provider": "gpt"})
+    return store
+
+
+def test_review_table_pages_are_slices_of_the_full_table(store):
+    full = store.review_table()
+    assert len(full) == 6
+    page = store.review_table(np.arange(2, 4))
+    assert page.reset_index(drop=True).equals(full.iloc[2:4].reset_index(drop=True))
+    assert list(page["id"]) == ["S002", "S002"]
+    assert list(page["Reasoning"])[1] == "Pending"
+
+
+def test_filter_positions(store):
+    assert list(store.filter_positions(student="s00")) == [0, 1, 2, 3]
+    assert list(store.filter_positions(questions=["2"])) == [1, 3, 5]
+    # Graded at or above the threshold is auto-published; low, failed and pending answers are kept
+    assert list(store.filter_positions(below_confidence=0.9)) == [1, 2, 3, 4]
+    assert list(store.filter_positions(student="T", questions=["2"], below_confidence=0.9)) == []
+    assert list(store.filter_positions(changed_only=True)) == []
+
+
+def test_apply_edit_logs_changes_and_keeps_model_output(store):
+    assert store.apply_edit(1, "Marks Awarded", 7)
+    assert not store.apply_edit(1, "Marks Awarded", 7)
+    assert store.apply_edit(1, "Marks Awarded", 8)
+    assert [(e["old"], e["new"]) for e in store.edit_log] == [(4.0, 7.0), (7.0, 8.0)]
+    assert store.changed_count() == 1
+    assert list(store.filter_positions(changed_only=True)) == [1]
+    assert store.marks[1] == 4
+    assert store.review_table([1])["Marks Awarded"].iloc[0] == 8
+
+    # Feedback is per student, so it shows on every row of that student
+    assert store.apply_edit(0, "Feedback", "Well done")
+    assert store.edit_log[-1]["q_id"] is None
+    assert list(store.review_table([0, 1])["Feedback"]) == ["Well done", "Well done"]
+
+    # Clearing the mark restores the model's value
+    assert store.apply_edit(1, "Marks Awarded", None)
+    assert store.changed_count() == 0
+    assert store.review_table([1])["Marks Awarded"].iloc[0] == 4
+
+
+def test_apply_edit_rejects_out_of_range_marks_and_other_columns(store):
+    with pytest.raises(ValueError):
+        store.apply_edit(0, "Marks Awarded", 6)
+    with pytest.raises(ValueError):
+        store.apply_edit(0, "Score", "1 / 5")
+    assert store.edit_log == []
@@ -0,0 +1,34 @@
+# Import libraries
+from decimal import Decimal, InvalidOperation
+import re
+
+NUMBER_RE = re.compile(r"(?<![\w.])-?(?:\d+(?:\.\d+)?|\.\d+)")
+THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+OPERATOR_SPACING_RE = re.compile(r"\s*([=+\-*/×^(),:;<>])\s*")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _format_number(match) -> str:
+    """Render a number in canonical form, e.g. '0.8570' -> '0.857', '15.0' -> '15', '.5' -> '0.5'."""
+    try:
+        value = Decimal(match.group())
+    except InvalidOperation:
+        return match.group()
+    text = format(value.normalize(), "f")
+    return "0" if text == "-0" else text
+
+
+def normalize_answer(answer) -> str:
+    """Normalise an answer for duplicate detection - case, whitespace and number formatting."""
+    text = str(answer or "").lower()
+    text = THOUSANDS_RE.sub("", text)
+    text = NUMBER_RE.sub(_format_number, text)
+    text = OPERATOR_SPACING_RE.sub(r"\1", text)
+    text = WHITESPACE_RE.sub(" ", text).strip()
+    return text.rstrip(".")
+
+
+def answer_key(row) -> tuple:
+    """Dedup key for a prompt row: question id plus the normalised answer."""
+    return (row.get("q_id"), normalize_answer(row.get("s_answer", "")))
+
@@ -0,0 +1,88 @@
+# Import files
+from utils.helper_functions import load_json
+from utils.prompt_compiler import compile_assignment
+from utils.results_store import ResultsStore
+from model_manager.custom_model import CustomModel
+from model_manager.model_fallback import get_model_fallback
+from model_manager.model_cascade import get_model_cascade
+
+# Import libraries
+from pathlib import Path
+import streamlit as st
+import hashlib
+import json
+
+DEFAULT_GT = "sample/gt.json"
+DEFAULT_RUBRIC = "sample/rubric.json"
+DEFAULT_STUDENTS = ("sample/students/student_a.json", "sample/students/student_b.json")
+
+
+def content_hash(*parts) -> str:
+    """Stable hash of JSON-serialisable inputs, used as the cache key for everything derived from them."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@st.cache_data(show_spinner=False)
+def _load_json_file(path, modified):
+    return load_json(path)
+
+
+def load_json_cached(path):
+    """load_json, re-read only when the file changes on disk."""
+    return _load_json_file(str(path), Path(path).stat().st_mtime_ns)
+
+
+def load_defaults_cached():
+    """Cached version of helper_functions.load_defaults (sample gt, students and rubric)."""
+    gt = load_json_cached(DEFAULT_GT)
+    students = [load_json_cached(path) for path in DEFAULT_STUDENTS]
+    rubric = load_json_cached(DEFAULT_RUBRIC)
+    return gt, students, rubric
+
+
+@st.cache_resource(show_spinner=False)
+def cached_custom_model(api_key, model, endpoint_url=None) -> CustomModel:
+    """One CustomModel per (key, model, endpoint) for the whole server, not one per rerun."""
+    return CustomModel(api_key, model, endpoint_url=endpoint_url)
+
+
+@st.cache_resource(show_spinner=False)
+def cached_model_fallback():
+    return get_model_fallback()
+
+
+@st.cache_resource(show_spinner=False)
+def cached_model_cascade():
+    return get_model_cascade()
+
+
+def set_assignment(gt, students, rubric):
+    """Store a new assignment in the session and key everything derived from it on its content hash.
+
+    Results derived from the previous assignment are dropped.
+    """
+    key = content_hash(gt, students, rubric)
+    if key != st.session_state.get("assignment_key"):
+        invalidate_assignment()
+    st.session_state.gt, st.session_state.students, st.session_state.rubric = gt, students, rubric
+    st.session_state.assignment_key = key
+
+
+def invalidate_assignment():
+    """Forget the results of the current assignment, e.g. when uploads change."""
+    st.session_state.assignment_key = None
+    st.session_state.results_store = None
+    st.session_state.apply_config = False
+    st.session_state.graded_job = None
+
+
+def new_results_store() -> ResultsStore:
+    """An empty results store for the session's assignment."""
+    return ResultsStore(st.session_state.gt, st.session_state.students, st.session_state.rubric)
+
+
+def student_prompt_rows(s_id) -> list:
+    """Prompt rows of one student of the session's assignment - all the preview needs."""
+    students = [student for student in st.session_state.students if student.get("id") == s_id]
+    return list(compile_assignment(st.session_state.gt, st.session_state.rubric).iter_prompt_rows(students))
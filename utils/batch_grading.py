@@ -0,0 +1,208 @@
+# Import files
+from utils.grading_engine import GradingEngine, DEFAULT_CONCURRENCY, CACHED_PROVIDER
+from utils.helper_functions import create_batch_grading_prompt, create_cohort_grading_prompt, create_grading_prompt
+from utils.response_parser import parse_batch_grades, batch_grade_schema
+from model_manager.rate_limiter import estimate_tokens
+from model_manager.usage_tracker import usage_scope
+
+# Import libraries
+from itertools import groupby
+import abc
+import asyncio
+import json
+import time
+
+# Completion budget per graded answer in a batched request
+TOKENS_PER_QUESTION = 512
+# Default token budget (prompt + expected completion) for one cross-student request
+DEFAULT_TOKEN_BUDGET = 8000
+MAX_COHORT_BATCH = 25
+
+
+class BatchEngine(GradingEngine, metaclass=abc.ABCMeta):
+    """Base for engines that grade several prompt rows in one model call.
+
+    Subclasses decide how rows are grouped (`schedule`), how a group is rendered
+    (`build_prompt`) and which row field labels each grade in the response
+    (`batch_key`). Rows missing from, or invalid in, the batched response are
+    retried individually with the per-question prompt.
+
+    With confidence scoring on, the batched request is sampled a second time and only
+    the rows whose two grades disagree are sampled further, one question at a time.
+    """
+
+    batch_key = "q_id"
+
+    def __init__(self, call, concurrency: int = DEFAULT_CONCURRENCY, journal=None, confidence=None):
+        super().__init__(call, concurrency=concurrency, journal=journal, confidence=confidence)
+        self.batch_stats = {"requests": 0, "rows": 0, "retried": 0}
+
+    @abc.abstractmethod
+    def build_prompt(self, rows):
+        """(system prompt, user prompt) grading a group of rows in one request."""
+
+    async def grade_batch(self, indexed_rows, semaphore):
+        """Grade a batch of (index, row) pairs in one call; returns one result record per row."""
+        rows = [row for _, row in indexed_rows]
+        system_prompt, user_prompt = self.build_prompt(rows)
+        grades, provider = {}, None
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                # Usage of the shared request is split across the students and questions it covers
+                with usage_scope(s_id=[row.get("s_id") for row in rows], q_id=[row.get("q_id") for row in rows]) as scope:
+                    response = await self.call(
+                        system_prompt, user_prompt, max_tokens=TOKENS_PER_QUESTION * len(rows),
+                        response_schema=batch_grade_schema(self.batch_key)
+                        )
+                provider = scope["provider"] or CACHED_PROVIDER
+                grades = parse_batch_grades(response, rows, key=self.batch_key)
+            except Exception as e:
+                print(f"Error grading batch of {len(rows)} rows: {e}")
+            latency = time.perf_counter() - start
+
+        settled = {}
+        if self.confidence is not None and grades:
+            settled = await self.batch_confidence(rows, grades, system_prompt, user_prompt, semaphore)
+            latency = time.perf_counter() - start
+
+        results, retry = [], []
+        for index, row in indexed_rows:
+            key = str(row.get(self.batch_key))
+            grade = grades.get(key)
+            if grade is None:
+                retry.append((index, row))
+                continue
+            response, confidence, samples = settled.get(key, (json.dumps(grade), None, 1))
+            results.append({
+                "index": index,
+                "s_id": row.get("s_id"),
+                "q_id": row.get("q_id"),
+                "max_marks": row.get("max_marks"),
+                "response": response,
+                "error": None,
+                "latency": latency,
+                "provider": provider,
+                "shared_from": None,
+                "confidence": confidence,
+                "samples": samples,
+            })
+
+        self.batch_stats["requests"] += 1
+        self.batch_stats["rows"] += len(rows)
+        if retry:
+            self.batch_stats["retried"] += len(retry)
+            labels = [row.get(self.batch_key) for _, row in retry]
+            print(f"Batched response incomplete, retrying {self.batch_key}s {labels} individually")
+            results += await asyncio.gather(*(self.grade_row(i, row, semaphore) for i, row in retry))
+
+        return results
+
+    async def batch_confidence(self, rows, grades, system_prompt, user_prompt, semaphore):
+        """Settle the votes of a batch's grades: one more batched sample, then single-question
+        samples for the rows that still disagree. Returns {batch key: (response, confidence, samples)}."""
+        votes = {}
+        for key, grade in grades.items():
+            votes[key] = self.confidence.votes()
+            votes[key].add(grade)
+
+        second = {}
+        async with semaphore:
+            try:
+                with usage_scope(s_id=[row.get("s_id") for row in rows], q_id=[row.get("q_id") for row in rows]):
+                    response = await self.call(
+                        system_prompt, user_prompt, max_tokens=TOKENS_PER_QUESTION * len(rows),
+                        response_schema=batch_grade_schema(self.batch_key), **self.sample_kwargs(1)
+                        )
+                second = parse_batch_grades(response, rows, key=self.batch_key)
+            except Exception as e:
+                print(f"Error sampling batch of {len(rows)} rows: {e}")
+        for key, row_votes in votes.items():
+            row_votes.add(second.get(key))
+
+        by_key = {str(row.get(self.batch_key)): row for row in rows}
+        await asyncio.gather(*(
+            self.resample_row(by_key[key], row_votes, semaphore)
+            for key, row_votes in votes.items() if not row_votes.settled()
+            ))
+        return {key: self.settle(row_votes) for key, row_votes in votes.items()}
+
+    async def resample_row(self, row, votes, semaphore):
+        """Sample one row of a batch with the per-question prompt until its votes are settled."""
+        system_prompt, user_prompt = create_grading_prompt(row)
+        async with semaphore:
+            with usage_scope(s_id=row.get("s_id"), q_id=row.get("q_id")) as scope:
+                await self.sample_grades(row, system_prompt, user_prompt, votes, scope)
+
+
+class StudentBatchEngine(BatchEngine):
+    """Grade every question of one student in a single model call.
+
+    Rows must arrive grouped by student, as built_prompt_rows / iter_prompt_rows produce them.
+    """
+
+    batch_key = "q_id"
+
+    def build_prompt(self, rows):
+        return create_batch_grading_prompt(rows)
+
+    def schedule(self, rows, semaphore):
+        indexed = enumerate(rows)
+        for _, group in groupby(indexed, key=lambda pair: pair[1].get("s_id")):
+            yield asyncio.create_task(self.grade_batch(list(group), semaphore))
+
+
+class QuestionBatchEngine(BatchEngine):
+    """Grade one question for several students per request.
+
+    The question, ground truth and rubric are sent once and the answers are
+    labelled by s_id. Rows are buffered per question and a batch is dispatched
+    once `batch_size` answers are collected or, when batch_size is None, once the
+    next answer would push the estimated request past `token_budget`.
+    """
+
+    batch_key = "s_id"
+
+    def __init__(self, call, concurrency: int = DEFAULT_CONCURRENCY, journal=None, batch_size=None,
+                 token_budget=DEFAULT_TOKEN_BUDGET, confidence=None):
+        super().__init__(call, concurrency=concurrency, journal=journal, confidence=confidence)
+        self.batch_size = batch_size
+        self.token_budget = token_budget
+
+    def build_prompt(self, rows):
+        return create_cohort_grading_prompt(rows)
+
+    def row_cost(self, row) -> int:
+        """Estimated tokens one more answer adds to a request, including its share of the completion."""
+        return estimate_tokens(row.get("s_answer", "")) + estimate_tokens(str(row.get("s_id", ""))) + TOKENS_PER_QUESTION
+
+    def base_cost(self, row) -> int:
+        """Estimated tokens of the shared part of a request for this row's question."""
+        system_prompt, user_prompt = create_cohort_grading_prompt([dict(row, s_answer="", s_id="")])
+        return estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+
+    def is_full(self, batch, cost) -> bool:
+        if self.batch_size is not None:
+            return len(batch["rows"]) >= self.batch_size
+        return len(batch["rows"]) >= MAX_COHORT_BATCH or batch["tokens"] + cost > self.token_budget
+
+    def schedule(self, rows, semaphore):
+        batches = {}
+        for index, row in enumerate(rows):
+            q_id = row.get("q_id")
+            batch = batches.get(q_id)
+            if batch is None:
+                batch = batches[q_id] = {"rows": [], "tokens": self.base_cost(row)}
+
+            cost = self.row_cost(row)
+            if batch["rows"] and self.is_full(batch, cost):
+                yield asyncio.create_task(self.grade_batch(batch["rows"], semaphore))
+                batch = batches[q_id] = {"rows": [], "tokens": self.base_cost(row)}
+
+            batch["rows"].append((index, row))
+            batch["tokens"] += cost
+
+        for batch in batches.values():
+            if batch["rows"]:
+                yield asyncio.create_task(self.grade_batch(batch["rows"], semaphore))
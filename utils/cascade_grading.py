@@ -0,0 +1,146 @@
+# Import files
+from utils.confidence import SelfConsistency
+from utils.grading_engine import GradingEngine, DEFAULT_CONCURRENCY
+from utils.helper_functions import create_grading_prompt
+from utils.response_parser import GRADE_SCHEMA, try_parse_grade
+from model_manager.usage_tracker import usage_scope
+
+# Import libraries
+import time
+
+DEFAULT_ESCALATE_BELOW = 0.9
+# Marks awarded between these fractions of max_marks are borderline and checked by a stronger tier
+DEFAULT_BORDERLINE = (0.4, 0.6)
+ESCALATION_REASONS = ("invalid", "low_confidence", "disagreement", "borderline")
+
+
+class CascadeEngine(GradingEngine):
+    """Grade each row with the cheapest model tier first, moving it up a tier only when needed.
+
+    `tiers` is an ordered list of (name, async call), cheapest first, e.g.
+    get_model_cascade().calls(). A tier's grade is accepted unless:
+      - invalid: no response, or a grade that still fails validation after the repair request;
+      - low_confidence: its confidence is below `escalate_below`. Confidence comes from
+        self-consistency sampling when a SelfConsistency is given as `confidence`, and
+        otherwise from the token probability of the marks on tiers that return logprobs;
+      - disagreement: a tier with neither gets one verification sample at the sampling
+        temperature, which awarded different marks;
+      - borderline: its marks fall in the `borderline` band of max_marks.
+    The last tier's grade is always accepted. Result records carry the tier that graded them,
+    and `tier_stats` counts the attempts, accepted grades, escalations, latency and cost of
+    every tier.
+    """
+
+    def __init__(self, tiers, concurrency: int = DEFAULT_CONCURRENCY, dedupe: bool = False, journal=None,
+                 confidence=None, escalate_below=DEFAULT_ESCALATE_BELOW, borderline=DEFAULT_BORDERLINE):
+        if not tiers:
+            raise ValueError("CascadeEngine needs at least one tier")
+        super().__init__(tiers[-1][1], concurrency=concurrency, dedupe=dedupe, journal=journal, confidence=confidence)
+        self.tier_names = [name for name, _ in tiers]
+        # Without sampling, every grade still asks for logprobs so a single call carries a confidence
+        self.verify = SelfConsistency(agree=1, max_samples=1)
+        # One engine per tier, so each tier's repair requests and samples use that tier's model
+        self.tier_engines = [
+            GradingEngine(call, concurrency=concurrency, confidence=confidence or self.verify) for _, call in tiers
+            ]
+        for engine in self.tier_engines:
+            # Repairs and invalid grades of every tier are counted together
+            engine.parse_stats = self.parse_stats
+        self.escalate_below = escalate_below
+        self.borderline = borderline
+        self.tier_stats = {
+            name: {"attempts": 0, "accepted": 0, "escalated": dict.fromkeys(ESCALATION_REASONS, 0),
+                   "verified": 0, "latency": 0.0, "calls": 0, "cost_usd": 0.0}
+            for name in self.tier_names
+        }
+
+    async def disagrees(self, engine, row, grade, semaphore) -> bool:
+        """Draw one more sample of a row's grade from a tier and check it awards the same marks."""
+        system_prompt, user_prompt = create_grading_prompt(row)
+        async with semaphore:
+            try:
+                response = await engine.call(
+                    system_prompt, user_prompt, response_schema=GRADE_SCHEMA, **self.verify.call_kwargs(1)
+                    )
+            except Exception as e:
+                print(f"Error verifying s_id={row.get('s_id')} q_id={row.get('q_id')}: {e}")
+                return True
+        sample, _ = try_parse_grade(response, row.get("max_marks"))
+        return sample is None or sample["marks_awarded"] != grade["marks_awarded"]
+
+    async def escalation_reason(self, engine, row, result, semaphore):
+        """Why a tier's grade should go to the next tier, or None to accept it."""
+        if result["error"] is not None:
+            return "invalid"
+        grade, _ = try_parse_grade(result["response"], row.get("max_marks"))
+        if grade is None:
+            return "invalid"
+        if result.get("confidence") is not None and result["confidence"] < self.escalate_below:
+            return "low_confidence"
+        if self.borderline is not None:
+            max_marks = row.get("max_marks") or grade["max_marks"]
+            if max_marks:
+                low, high = self.borderline
+                if low <= grade["marks_awarded"] / max_marks <= high:
+                    return "borderline"
+        if result.get("confidence") is None:
+            self.tier_stats[result["tier"]]["verified"] += 1
+            if await self.disagrees(engine, row, grade, semaphore):
+                return "disagreement"
+        return None
+
+    async def grade_row(self, index, row, semaphore):
+        """Grade a row tier by tier until a tier's grade is accepted."""
+        start = time.perf_counter()
+        last = len(self.tier_engines) - 1
+        for tier, (name, engine) in enumerate(zip(self.tier_names, self.tier_engines)):
+            with usage_scope(s_id=row.get("s_id"), q_id=row.get("q_id")) as scope:
+                result = await engine.grade_row(index, row, semaphore)
+                result["tier"] = name
+                reason = None if tier == last else await self.escalation_reason(engine, row, result, semaphore)
+
+            stats = self.tier_stats[name]
+            stats["attempts"] += 1
+            stats["latency"] += result["latency"]
+            stats["calls"] += scope["calls"]
+            stats["cost_usd"] += scope["cost_usd"]
+            if reason is None:
+                stats["accepted"] += 1
+                result["latency"] = time.perf_counter() - start
+                return result
+            stats["escalated"][reason] += 1
+
+    def cascade_summary(self) -> dict:
+        """Per-tier hit rates, latency and cost, and what the same rows would have cost on the last tier alone."""
+        rows = sum(stats["accepted"] for stats in self.tier_stats.values())
+        tiers = {}
+        for name, stats in self.tier_stats.items():
+            attempts = stats["attempts"]
+            tiers[name] = {
+                "attempts": attempts,
+                "accepted": stats["accepted"],
+                # Share of the rows that reached this tier and were settled here
+                "hit_rate": round(stats["accepted"] / attempts, 3) if attempts else 0.0,
+                "share_of_rows": round(stats["accepted"] / rows, 3) if rows else 0.0,
+                "escalated": dict(stats["escalated"]),
+                # Grades without a confidence that needed a verification sample
+                "verified": stats["verified"],
+                "mean_latency": round(stats["latency"] / attempts, 3) if attempts else 0.0,
+                "calls": stats["calls"],
+                "cost_usd": round(stats["cost_usd"], 6),
+            }
+
+        summary = {
+            "rows": rows,
+            "tiers": tiers,
+            "cost_usd": round(sum(stats["cost_usd"] for stats in self.tier_stats.values()), 6),
+            "latency": round(sum(stats["latency"] for stats in self.tier_stats.values()), 2),
+        }
+        # Estimate from the rows the last tier did grade; unknown until it has graded some
+        top = self.tier_stats[self.tier_names[-1]]
+        if top["attempts"]:
+            summary["last_tier_only_estimate"] = {
+                "cost_usd": round(top["cost_usd"] / top["attempts"] * rows, 6),
+                "latency": round(top["latency"] / top["attempts"] * rows, 2),
+            }
+        return summary
@@ -0,0 +1,94 @@
+# Import libraries
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def assignment_hash(gt, rubric) -> str:
+    """Stable hash of the ground truth and rubric that identifies an assignment."""
+    payload = json.dumps({"gt": gt, "rubric": rubric}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class CheckpointJournal():
+    """Append-only JSONL journal of completed grades and feedback.
+
+    Every successful grade is appended and fsync'd as soon as it arrives, keyed by
+    (assignment hash, s_id, q_id). A restarted run opens the same journal and only
+    dispatches rows that are not in it yet. Records from other assignments and a
+    torn final line from a crash are ignored.
+    """
+
+    def __init__(self, path, assignment):
+        self.path = Path(path)
+        self.assignment = assignment
+        self._lock = threading.Lock()
+        self.completed = set()
+        self.feedback_done = set()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        for record in self.iter_records():
+            if record["kind"] == "grade":
+                self.completed.add((record["s_id"], record["q_id"]))
+            elif record["kind"] == "feedback":
+                self.feedback_done.add(record["s_id"])
+        self._file = open(self.path, "a", encoding="utf-8")
+        print(f"Checkpoint journal {self.path}: {len(self.completed)} grades already completed.")
+
+    def iter_records(self, kind=None):
+        """Yield this assignment's records from disk, skipping corrupt lines."""
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("assignment") != self.assignment:
+                    continue
+                if kind is None or record.get("kind") == kind:
+                    yield record
+
+    def is_done(self, s_id, q_id) -> bool:
+        return (s_id, q_id) in self.completed
+
+    def pending(self, rows):
+        """Yield only the prompt rows that have no journaled grade."""
+        for row in rows:
+            if not self.is_done(row.get("s_id"), row.get("q_id")):
+                yield row
+
+    def _append(self, record):
+        record.update({"assignment": self.assignment, "ts": time.time()})
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def record_grade(self, result):
+        """Journal a grading result. Failed results are skipped so they are retried on resume."""
+        if result.get("error") is not None or result.get("response") is None:
+            return
+        self._append({
+            "kind": "grade",
+            "s_id": result["s_id"],
+            "q_id": result["q_id"],
+            "result": {k: v for k, v in result.items() if k != "index"},
+        })
+        self.completed.add((result["s_id"], result["q_id"]))
+
+    def record_feedback(self, s_id, feedback):
+        """Journal a student's overall feedback."""
+        if feedback is None:
+            return
+        self._append({"kind": "feedback", "s_id": s_id, "feedback": feedback})
+        self.feedback_done.add(s_id)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
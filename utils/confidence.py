@@ -0,0 +1,146 @@
+# Import libraries
+import math
+import os
+import re
+
+DEFAULT_AGREE = 2
+DEFAULT_MAX_SAMPLES = int(os.getenv("AIGS_MAX_SAMPLES", "5"))
+# Sampling settings of the extra samples. Gemini and DeepSeek grade at temperature 0 / top_p 0.2,
+# so without these their samples would almost always agree. Reasoning models such as gpt-5-mini
+# reject sampling parameters and drop them; their samples already vary.
+DEFAULT_SAMPLE_TEMPERATURE = float(os.getenv("AIGS_SAMPLE_TEMPERATURE", "0.7"))
+DEFAULT_SAMPLE_TOP_P = 0.95
+MARKS_VALUE_RE = re.compile(r'"marks_awarded"\s*:\s*(-?\d+(?:\.\d+)?)')
+
+
+def mark_probability(logprobs):
+    """Probability the model gave to the marks_awarded value of a single-grade response.
+
+    `logprobs` is the [(token, logprob), ...] list recorded for the call (see usage_scope).
+    The tokens overlapping the number after "marks_awarded" are summed; None when the call
+    returned no logprobs or the value cannot be found.
+    """
+    if not logprobs:
+        return None
+    text = "".join(token for token, _ in logprobs)
+    match = MARKS_VALUE_RE.search(text)
+    if match is None:
+        return None
+    start, end = match.span(1)
+    total, offset = 0.0, 0
+    for token, logprob in logprobs:
+        if offset < end and offset + len(token) > start:
+            total += logprob
+        offset += len(token)
+    return math.exp(total)
+
+
+class GradeVotes():
+    """The grades sampled for one answer, and how far they agree on marks_awarded."""
+
+    def __init__(self, agree=DEFAULT_AGREE, max_samples=DEFAULT_MAX_SAMPLES, tolerance=0.0):
+        self.agree = agree
+        self.max_samples = max_samples
+        self.tolerance = tolerance
+        # (grade or None for an invalid sample, mark probability or None)
+        self.samples = []
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, grade, probability=None):
+        self.samples.append((grade, probability))
+
+    def support(self, marks) -> int:
+        """Samples whose marks are within the tolerance of `marks`."""
+        return sum(
+            1 for grade, _ in self.samples
+            if grade is not None and abs(grade["marks_awarded"] - marks) <= self.tolerance
+            )
+
+    def winner(self):
+        """The earliest grade with the most agreeing samples, and that number of samples."""
+        best, best_support = None, 0
+        for grade, _ in self.samples:
+            if grade is None:
+                continue
+            support = self.support(grade["marks_awarded"])
+            if support > best_support:
+                best, best_support = grade, support
+        return best, best_support
+
+    def settled(self) -> bool:
+        """Enough samples agree, or no more may be drawn."""
+        return len(self.samples) >= self.max_samples or self.winner()[1] >= self.agree
+
+    def result(self):
+        """(grade, confidence) - the majority grade and a 0-1 confidence in its marks.
+
+        Confidence is the share of samples that agree with the grade, scaled by the mean
+        probability the model gave to those marks when logprobs were returned. A single
+        sample only has a confidence when it has logprobs.
+        """
+        grade, support = self.winner()
+        if grade is None:
+            return None, None
+        probabilities = [
+            probability for sample, probability in self.samples
+            if sample is not None and probability is not None
+            and abs(sample["marks_awarded"] - grade["marks_awarded"]) <= self.tolerance
+            ]
+        probability = sum(probabilities) / len(probabilities) if probabilities else None
+        if len(self.samples) == 1:
+            return grade, probability
+        agreement = support / len(self.samples)
+        return grade, agreement if probability is None else agreement * probability
+
+
+class SelfConsistency():
+    """Adaptive self-consistency settings for a grading engine.
+
+    Every answer gets a second sample; sampling stops as soon as `agree` samples award the
+    same marks, so further samples (up to `max_samples`) are only drawn for answers the
+    model is unsure about. Extra samples are requested with a `sample` number, which keeps
+    them apart in the response cache, at `temperature` / `top_p` so that a model which grades
+    deterministically can still disagree with itself. With `logprobs`, providers that support
+    them return token logprobs, which scale the agreement score.
+    """
+
+    def __init__(self, agree=DEFAULT_AGREE, max_samples=DEFAULT_MAX_SAMPLES, tolerance=0.0,
+                 temperature=DEFAULT_SAMPLE_TEMPERATURE, top_p=DEFAULT_SAMPLE_TOP_P, logprobs=True):
+        self.agree = max(1, int(agree))
+        self.max_samples = max(self.agree, int(max_samples))
+        self.tolerance = tolerance
+        self.temperature = temperature
+        self.top_p = top_p
+        self.logprobs = logprobs
+        self.stats = {"answers": 0, "samples": 0, "settled_early": 0}
+
+    def votes(self) -> GradeVotes:
+        return GradeVotes(agree=self.agree, max_samples=self.max_samples, tolerance=self.tolerance)
+
+    def call_kwargs(self, sample) -> dict:
+        """Extra model call kwargs for the nth sample of an answer (0 is the ordinary grading call)."""
+        kwargs = {"logprobs": True} if self.logprobs else {}
+        if sample > 0:
+            kwargs["sample"] = sample
+            if self.temperature is not None:
+                kwargs["temperature"] = self.temperature
+            if self.top_p is not None:
+                kwargs["top_p"] = self.top_p
+        return kwargs
+
+    def record(self, votes):
+        """Count an answer's samples once it is settled."""
+        self.stats["answers"] += 1
+        self.stats["samples"] += len(votes)
+        self.stats["settled_early"] += int(len(votes) < self.max_samples)
+
+    def summary(self) -> dict:
+        """Samples drawn per answer, and the share of answers settled before max_samples."""
+        answers = self.stats["answers"]
+        return dict(
+            self.stats,
+            samples_per_answer=round(self.stats["samples"] / answers, 2) if answers else 0.0,
+            settled_early_rate=round(self.stats["settled_early"] / answers, 3) if answers else 0.0
+            )
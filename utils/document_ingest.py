@@ -0,0 +1,362 @@
+# Import libraries
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import threading
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    import docx
+except ImportError:
+    docx = None
+
+DOCUMENT_SUFFIXES = (".txt", ".pdf", ".docx")
+DEFAULT_EXTRACT_CACHE_DIR = os.getenv("AIGS_EXTRACT_CACHE_DIR", ".cache/extracted")
+DEFAULT_EXTRACT_WORKERS = int(os.getenv("AIGS_EXTRACT_WORKERS", "0")) or None
+
+# "Q1", "Question 2:", "Answer 3)", "Q 1a." - a prefixed marker starts a question section anywhere
+PREFIXED_MARKER = r"(?:q|question|ans|answer)\s*\.?\s*\(?(?P<prefixed>{ids})\)?(?!\w)\s*[).:\-]?"
+# "1.", "2)", "(3):" - a bare number only starts the next expected question (see split_sections)
+BARE_MARKER = r"\(?(?P<bare>{ids})\s*(?P<separator>[).:])(?=\s|$)"
+# Ids are discovered only from "Q1" / "Question 1" - "Answer 0.857" is not a question
+DISCOVER_MARKER = r"(?:q|question)\s*\.?\s*\(?(?P<prefixed>\d+[a-z]?)\)?(?!\w)\s*[).:\-]?"
+STUDENT_ID_RE = re.compile(r"^\s*(?:student\s*)?(?:id|number|no\.?)\s*[:#]\s*(\S+)", re.I | re.M)
+# A question's marks, most explicit first: "Max marks: 10" / "Total: 10" / "out of 10", a bracketed
+# "[10]" / "[10 marks]" / "(10 marks)", and the per-part "2 marks for method, 8 marks for answer"
+TOTAL_MARKS_RE = re.compile(r"\b(?:max(?:imum)?|total)\s*(?:marks?)?\s*[:=]?\s*(\d+)|\bout\s+of\s+(\d+)", re.I)
+BRACKET_MARKS_RE = re.compile(r"\[\s*(\d+)\s*(?:marks?)?\s*\]|\(\s*(\d+)\s*marks?\s*\)", re.I)
+PART_MARKS_RE = re.compile(r"(\d+)\s*marks?\b", re.I)
+GT_LABEL_RE = re.compile(r"^\s*(method|working|solution|answer)\s*[:\-]\s*", re.I | re.M)
+
+
+class DocumentError(ValueError):
+    """An uploaded document that cannot be read."""
+
+
+def file_hash(data) -> str:
+    """Content hash of an uploaded file - the extraction cache key."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _decode_text(data) -> str:
+    for encoding in ("utf-8-sig", "cp1252"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return data.decode("latin-1")
+
+
+def extract_text(name, data) -> str:
+    """Plain text of a txt, pdf or docx file. Runs in the extraction worker processes."""
+    suffix = Path(name).suffix.lower()
+    if suffix == ".pdf":
+        if PdfReader is None:
+            raise DocumentError("reading PDF files needs pypdf (pip install pypdf)")
+        reader = PdfReader(io.BytesIO(data))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    if suffix == ".docx":
+        if docx is None:
+            raise DocumentError("reading Word files needs python-docx (pip install python-docx)")
+        document = docx.Document(io.BytesIO(data))
+        lines = [paragraph.text for paragraph in document.paragraphs]
+        for table in document.tables:
+            for table_row in table.rows:
+                lines.append(" | ".join(cell.text for cell in table_row.cells))
+        return "\n".join(lines)
+    if suffix in (".txt", ".json", ".md", ""):
+        return _decode_text(data)
+    raise DocumentError(f"unsupported file type {suffix!r}")
+
+
+class ExtractionCache():
+    """Extracted text on disk, one file per document hash, so a document is only ever extracted once."""
+
+    def __init__(self, directory=DEFAULT_EXTRACT_CACHE_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key) -> Path:
+        return self.directory / f"{key}.txt"
+
+    def get(self, key):
+        try:
+            return self._path(key).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, text):
+        # Write then rename, so a concurrent reader never sees a partial file
+        tmp = self._path(key).with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, self._path(key))
+
+
+class DocumentExtractor():
+    """Extract uploaded documents in a pool of worker processes.
+
+    PDF parsing is CPU-bound, so it runs outside the Streamlit process's threads. Files
+    are deduplicated by content hash: cached files are not extracted again, and a file
+    already being extracted (e.g. by another session's upload) is awaited, not resubmitted.
+    """
+
+    def __init__(self, max_workers=DEFAULT_EXTRACT_WORKERS, cache=None):
+        self.max_workers = max_workers
+        self.cache = cache if cache is not None else ExtractionCache()
+        self._pool = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            try:
+                # spawn, not fork: the app process is multi-threaded
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+            except (OSError, NotImplementedError) as e:
+                print(f"Process pool unavailable ({e}), extracting documents in threads")
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="extract")
+        return self._pool
+
+    def _submit(self, key, name, data):
+        """Future for a file's text, shared by every caller asking for the same content."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            try:
+                future = self._executor().submit(extract_text, name, data)
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory on a huge PDF); start a fresh pool
+                self._pool = None
+                future = self._executor().submit(extract_text, name, data)
+            self._inflight[key] = future
+        # Outside the lock: the callback runs immediately if the future is already done
+        future.add_done_callback(lambda done, key=key: self._done(key, done))
+        return future
+
+    def _done(self, key, future):
+        # Cache before leaving the in-flight map, so no caller can miss both and resubmit
+        if not future.cancelled() and future.exception() is None:
+            self.cache.set(key, future.result())
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    async def extract_many(self, files, on_file=None) -> list:
+        """Extract (name, bytes) files concurrently; returns one record per file, in input order.
+
+        Each record holds name, hash, text, error and whether it came from the cache.
+        on_file is called with each record as soon as it is ready.
+        """
+        records = [{"name": name, "hash": file_hash(data), "text": None, "error": None, "cached": False}
+                   for name, data in files]
+
+        async def extract(record, data):
+            text = self.cache.get(record["hash"])
+            if text is not None:
+                record.update(text=text, cached=True)
+            else:
+                try:
+                    record["text"] = await asyncio.wrap_future(self._submit(record["hash"], record["name"], data))
+                except Exception as e:
+                    print(f"Could not extract {record['name']}: {e}")
+                    record["error"] = str(e) or type(e).__name__
+            if on_file is not None:
+                on_file(record)
+
+        await asyncio.gather(*(extract(record, data) for record, (_, data) in zip(records, files)))
+        return records
+
+
+def _id_pattern(ids) -> str:
+    # Longest first, so "10" is not read as "1"
+    return "|".join(re.escape(str(i)) for i in sorted(ids, key=lambda i: -len(str(i))))
+
+
+def split_sections(text, question_ids=None):
+    """Split a document into {question id: text} on question markers at the start of a line.
+
+    Documents that use "Q1" / "Question 1" / "Answer 1" markers are split on those only.
+    Otherwise, with known `question_ids`, a bare "2." or "2)" starts a section when 2 is
+    the next question and the separator matches the one used for the first question -
+    so numbered working inside an answer is not read as a new question. Without ids (discovery, e.g. a ground truth document) only "Q1" /
+    "Question 1" markers count. Text before the first marker is returned under None.
+    """
+    if question_ids:
+        ids = [str(q_id) for q_id in question_ids]
+        marker_re = re.compile(r"^[ \t]*" + PREFIXED_MARKER.format(ids=_id_pattern(ids)), re.I | re.M)
+        if marker_re.search(text) is None:
+            marker_re = re.compile(r"^[ \t]*" + BARE_MARKER.format(ids=_id_pattern(ids)), re.I | re.M)
+    else:
+        ids = None
+        marker_re = re.compile(r"^[ \t]*" + DISCOVER_MARKER, re.I | re.M)
+
+    bare = "bare" in marker_re.groupindex
+    sections, current, start, separator = {}, None, 0, None
+    for match in marker_re.finditer(text):
+        q_id = match.group("bare" if bare else "prefixed")
+        if bare:
+            position = ids.index(current) if current in ids else -1
+            if position + 1 >= len(ids) or ids[position + 1].lower() != q_id.lower():
+                continue
+            if separator not in (None, match.group("separator")):
+                continue
+            separator = match.group("separator")
+        q_id = next((i for i in ids if i.lower() == q_id.lower()), q_id) if ids else q_id
+        sections[current] = (sections.get(current, "") + "\n" + text[start:match.start()]).strip()
+        current, start = q_id, match.end()
+    sections[current] = (sections.get(current, "") + "\n" + text[start:]).strip()
+    return sections
+
+
+def _as_json(text):
+    """The document as JSON when it already is (e.g. a .txt export of the sample files), else None."""
+    try:
+        return json.loads(text)
+    except (TypeError, json.JSONDecodeError):
+        return None
+
+
+def parse_script(name, text, question_ids) -> list:
+    """Student records ({"id", "answers"}) from one script; a JSON script may hold several."""
+    data = _as_json(text)
+    if isinstance(data, dict) and "answers" in data:
+        return [data]
+    if isinstance(data, list) and all(isinstance(item, dict) and "answers" in item for item in data):
+        return data
+
+    sections = split_sections(text, question_ids)
+    preamble = sections.pop(None, "")
+    match = STUDENT_ID_RE.search(preamble)
+    s_id = match.group(1) if match else Path(name).stem
+    by_str = {str(q_id): q_id for q_id in question_ids}
+    answers = {by_str[q_id]: answer for q_id, answer in sections.items() if q_id in by_str and answer}
+    if not answers:
+        print(f"No question markers found in {name}")
+    return [{"id": s_id, "answers": answers}]
+
+
+def _marks(regex, text) -> list:
+    return [int(next(group for group in match.groups() if group)) for match in regex.finditer(text)]
+
+
+def section_max_marks(section):
+    """A question's max marks from its rubric text, or None when it gives none.
+
+    A stated total wins. Otherwise one bracketed figure is the total; with several, the
+    largest is the total when it equals the sum of the others (e.g. "[2] ... [8] ... [10]"),
+    else they are per-part marks and are summed. Without brackets, every "N marks" is
+    summed, so "2 marks for method, 8 marks for answer" gives 10.
+    """
+    total = _marks(TOTAL_MARKS_RE, section)
+    if total:
+        return total[0]
+    bracketed = _marks(BRACKET_MARKS_RE, section)
+    if len(bracketed) == 1:
+        return bracketed[0]
+    if bracketed:
+        largest = max(bracketed)
+        return largest if 2 * largest == sum(bracketed) else sum(bracketed)
+    parts = _marks(PART_MARKS_RE, section)
+    return sum(parts) if parts else None
+
+
+def parse_rubric(texts, question_ids=None) -> dict:
+    """A rubric ({"total_marks", "parts": [{"qid", "max_marks", "criteria"}]}) from one or more documents."""
+    parts = {}
+    for text in texts:
+        data = _as_json(text)
+        if isinstance(data, dict) and "parts" in data:
+            for part in data["parts"]:
+                parts[str(part.get("qid"))] = part
+            continue
+        for q_id, section in split_sections(text, question_ids).items():
+            if q_id is None or not section:
+                continue
+            max_marks = section_max_marks(section)
+            if max_marks is None:
+                print(f"No marks found for question {q_id} in the rubric")
+                max_marks = 0
+            parts[q_id] = {"qid": q_id, "max_marks": max_marks, "criteria": section}
+    parts = list(parts.values())
+    return {"total_marks": sum(part.get("max_marks") or 0 for part in parts), "parts": parts}
+
+
+def parse_ground_truth(texts) -> dict:
+    """Ground truth ({"questions": [{"id", "text", "ground_truth": {"method", "answer"}}]}) from documents.
+
+    Questions are found by "Q1" / "Question 1" markers; within a question, lines starting
+    "Method:", "Working:" or "Solution:" give the method and "Answer:" the final answer.
+    """
+    questions = {}
+    for text in texts:
+        data = _as_json(text)
+        if isinstance(data, dict) and "questions" in data:
+            for question in data["questions"]:
+                questions[str(question.get("id"))] = question
+            continue
+        for q_id, section in split_sections(text).items():
+            if q_id is None or not section:
+                continue
+            labels = list(GT_LABEL_RE.finditer(section))
+            question_text = section[:labels[0].start()].strip() if labels else section
+            fields = {"method": [], "answer": []}
+            for label, next_label in zip(labels, labels[1:] + [None]):
+                value = section[label.end():next_label.start() if next_label else None].strip()
+                fields["answer" if label.group(1).lower() == "answer" else "method"].append(value)
+            questions[q_id] = {
+                "id": q_id,
+                "text": question_text,
+                "ground_truth": {"method": "\n".join(fields["method"]), "answer": "\n".join(fields["answer"])},
+            }
+    return {"questions": list(questions.values())}
+
+
+def build_assignment(gt_texts, rubric_texts, scripts, defaults):
+    """(gt, students, rubric) in the shapes load_defaults returns, from extracted documents.
+
+    `scripts` is a list of (file name, text) and `defaults` a (gt, students, rubric) used
+    for the kinds with no documents. Scripts are split on the ground truth's question ids.
+    """
+    default_gt, default_students, default_rubric = defaults
+    gt = parse_ground_truth(gt_texts) if gt_texts else default_gt
+    question_ids = [q.get("id") for q in gt.get("questions", [])]
+    rubric = parse_rubric(rubric_texts, question_ids) if rubric_texts else default_rubric
+    if not scripts:
+        return gt, default_students, rubric
+
+    students, seen = [], {}
+    for name, text in scripts:
+        for student in parse_script(name, text, question_ids):
+            s_id = str(student.get("id"))
+            seen[s_id] = seen.get(s_id, 0) + 1
+            if seen[s_id] > 1:
+                print(f"Duplicate student id {s_id} in {name}")
+                student = dict(student, id=f"{s_id}-{seen[s_id]}")
+            students.append(student)
+    return gt, students, rubric
+
+
+DOCUMENT_EXTRACTOR = None
+_extractor_lock = threading.Lock()
+
+
+def get_document_extractor() -> DocumentExtractor:
+    """Return the process-wide extractor (and its worker pool), created on first use."""
+    global DOCUMENT_EXTRACTOR
+    with _extractor_lock:
+        if DOCUMENT_EXTRACTOR is None:
+            DOCUMENT_EXTRACTOR = DocumentExtractor()
+        return DOCUMENT_EXTRACTOR
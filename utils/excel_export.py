@@ -1,39 +1,356 @@
+# Import files
+from utils.results_store import STATUS_LABELS, GRADED
+from utils.submission_stream import iter_jsonl
+
 # Import libraries
-import pandas as pd
-from typing import List, Dict, Any
-from io import BytesIO
-import streamlit as st
-
-
-class ExcelExporter:
-    "Export grading results and feedback in Excel format."
-
-    def __init__(self):
-        pass
-
-    def create_excel_report(self, results: List[Dict[str, Any]]) -> BytesIO:
-        try:
-            output = BytesIO()
-
-            with pd.ExcelWriter(output, engine="xlsxwriter")as writer:
-                self.create_summary_sheet(results, writer)
-            
-            output.seek(0)
-            
-            return output.getvalue()
-        
-        except Exception as e:
-            st.error(f"Error creating Excel report: {str(e)}")
-            return None
-        
-    
-    def create_summary_sheet(self, results: List[Dict[str, Any]], writer):
-        summary_data = []
-        results = results.loc[results["Q"] == "Total"]
-        summary_data.append({
-            "Score": results["Score"],
-            "Feedback": results["Feedback"]
-        })
-        
-        df_summary = pd.DataFrame(summary_data)
-        df_summary.to_excel(writer, sheet_name="Summary", index=False)
+from pathlib import Path
+import csv
+import math
+import os
+import tempfile
+import time
+import numpy as np
+import xlsxwriter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+DEFAULT_EXPORT_DIR = os.getenv("AIGS_EXPORT_DIR", ".cache/exports")
+EXPORT_FORMATS = (".xlsx", ".csv", ".parquet")
+# One record per graded answer, in this column order in every format
+EXPORT_FIELDS = [
+    "s_id", "q_id", "marks_awarded", "max_marks", "status", "reasoning",
+    "confidence", "provider", "latency", "answer"
+    ]
+SUMMARY_FIELDS = ["s_id", "marks_awarded", "max_marks", "percentage", "graded", "failed", "pending", "feedback"]
+STATS_FIELDS = [
+    "q_id", "answers", "graded", "failed", "mean_marks", "mean_percentage", "std_marks",
+    "min_marks", "max_marks_awarded", "full_marks", "zero_marks", "max_marks"
+    ]
+PARQUET_BATCH_ROWS = 10_000
+# Entries read from the results store per chunk when exporting it
+EXPORT_CHUNK_ROWS = 5_000
+# Excel's limit on the characters in one cell
+EXCEL_CELL_LIMIT = 32_767
+
+
+def _number(value):
+    """A float, or None for missing / NA / non-numeric values."""
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+class QuestionStats():
+    """Running per-question statistics (Welford mean / variance), O(1) memory per question."""
+
+    def __init__(self, q_id):
+        self.q_id = q_id
+        self.answers = 0
+        self.failed = 0
+        self.graded = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.mean_ratio = 0.0
+        self.min = None
+        self.max = None
+        self.full_marks = 0
+        self.zero_marks = 0
+        self.max_marks = None
+
+    def add(self, marks, max_marks, status):
+        self.answers += 1
+        self.failed += int(status == "Failed")
+        if max_marks is not None:
+            self.max_marks = max_marks
+        if marks is None:
+            return
+        self.graded += 1
+        delta = marks - self.mean
+        self.mean += delta / self.graded
+        self.m2 += delta * (marks - self.mean)
+        if max_marks:
+            self.mean_ratio += (marks / max_marks - self.mean_ratio) / self.graded
+        self.min = marks if self.min is None else min(self.min, marks)
+        self.max = marks if self.max is None else max(self.max, marks)
+        self.full_marks += int(bool(max_marks) and marks >= max_marks)
+        self.zero_marks += int(marks == 0)
+
+    def row(self) -> dict:
+        graded = self.graded
+        return {
+            "q_id": self.q_id,
+            "answers": self.answers,
+            "graded": graded,
+            "failed": self.failed,
+            "mean_marks": round(self.mean, 2) if graded else None,
+            "mean_percentage": round(100 * self.mean_ratio, 1) if graded and self.max_marks else None,
+            "std_marks": round(math.sqrt(self.m2 / graded), 2) if graded else None,
+            "min_marks": self.min,
+            "max_marks_awarded": self.max,
+            "full_marks": self.full_marks,
+            "zero_marks": self.zero_marks,
+            "max_marks": self.max_marks,
+        }
+
+
+class ResultExporter():
+    """Stream graded answers to .xlsx, .csv and .parquet files in one pass.
+
+    Records are written as they arrive: the workbook uses xlsxwriter's constant_memory
+    mode (one row buffered per sheet), CSV rows go straight to disk and Parquet is
+    written in row groups of PARQUET_BATCH_ROWS. Only per-student totals and
+    per-question statistics are kept, and the "Summary" (one row per student) and
+    "Question Stats" sheets are written from them on close, after "Details".
+    """
+
+    def __init__(self, paths, feedback=None):
+        self.paths = [Path(path) for path in paths]
+        self.feedback = feedback or {}
+        self.students = {}
+        self.questions = {}
+        self.rows = 0
+        self.workbook = None
+        self.csv_file = None
+        self.csv_writer = None
+        self.parquet_path = None
+        self.parquet_writer = None
+        self.parquet_batch = []
+
+        for path in self.paths:
+            if path.suffix not in EXPORT_FORMATS:
+                raise ValueError(f"Unsupported export format {path.suffix!r} (use {', '.join(EXPORT_FORMATS)})")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.suffix == ".xlsx":
+                self.open_workbook(path)
+            elif path.suffix == ".csv":
+                self.csv_file = open(path, "w", newline="", encoding="utf-8")
+                self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+                self.csv_writer.writeheader()
+            else:
+                if pa is None:
+                    raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+                self.parquet_path = path
+
+    def open_workbook(self, path):
+        self.workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True, "nan_inf_to_errors": True})
+        self.header_format = self.workbook.add_format({"bold": True, "bg_color": "#DDEBF7", "border": 1})
+        # Sheets are created in display order; Details is filled first, the others on close
+        self.summary_sheet = self.workbook.add_worksheet("Summary")
+        self.detail_sheet = self.workbook.add_worksheet("Details")
+        self.stats_sheet = self.workbook.add_worksheet("Question Stats")
+        self.write_header(self.detail_sheet, EXPORT_FIELDS, widths={"reasoning": 60, "answer": 60})
+
+    def write_header(self, sheet, fields, widths=None):
+        for column, field in enumerate(fields):
+            sheet.set_column(column, column, (widths or {}).get(field, 14))
+            sheet.write_string(0, column, field, self.header_format)
+        sheet.freeze_panes(1, 0)
+
+    def write_row(self, sheet, row_number, fields, record):
+        for column, field in enumerate(fields):
+            value = record.get(field)
+            if value is None:
+                continue
+            if isinstance(value, str):
+                sheet.write_string(row_number, column, value[:EXCEL_CELL_LIMIT])
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                if not math.isnan(value):
+                    sheet.write_number(row_number, column, value)
+            else:
+                sheet.write(row_number, column, str(value)[:EXCEL_CELL_LIMIT])
+
+    def write(self, record):
+        """Write one answer record (keys from EXPORT_FIELDS; missing keys are left blank)."""
+        marks, max_marks = _number(record.get("marks_awarded")), _number(record.get("max_marks"))
+        status = record.get("status") or ("Graded" if marks is not None else "Pending")
+        record = dict(record, marks_awarded=marks, max_marks=max_marks, status=status)
+        self.rows += 1
+
+        if self.workbook is not None:
+            self.write_row(self.detail_sheet, self.rows, EXPORT_FIELDS, record)
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(record)
+        if self.parquet_path is not None:
+            self.parquet_batch.append({field: record.get(field) for field in EXPORT_FIELDS})
+            if len(self.parquet_batch) >= PARQUET_BATCH_ROWS:
+                self.flush_parquet()
+
+        s_id, q_id = str(record.get("s_id")), str(record.get("q_id"))
+        student = self.students.setdefault(
+            s_id, {"s_id": s_id, "marks_awarded": 0.0, "max_marks": 0.0, "graded": 0, "failed": 0, "pending": 0}
+            )
+        student["max_marks"] += max_marks or 0.0
+        student["marks_awarded"] += marks or 0.0
+        student[status.lower()] = student.get(status.lower(), 0) + 1
+        self.questions.setdefault(q_id, QuestionStats(q_id)).add(marks, max_marks, status)
+
+    def flush_parquet(self):
+        if not self.parquet_batch:
+            return
+        table = pa.Table.from_pydict(
+            {field: [row[field] for row in self.parquet_batch] for field in EXPORT_FIELDS},
+            schema=self.parquet_schema()
+            )
+        if self.parquet_writer is None:
+            self.parquet_writer = pq.ParquetWriter(str(self.parquet_path), table.schema)
+        self.parquet_writer.write_table(table)
+        self.parquet_batch = []
+
+    @staticmethod
+    def parquet_schema():
+        numbers = ("marks_awarded", "max_marks", "confidence", "latency")
+        return pa.schema([(field, pa.float64() if field in numbers else pa.string()) for field in EXPORT_FIELDS])
+
+    def summary_rows(self):
+        for s_id, student in self.students.items():
+            feedback = self.feedback.get(s_id)
+            yield dict(
+                student,
+                percentage=round(100 * student["marks_awarded"] / student["max_marks"], 1) if student["max_marks"] else None,
+                feedback=feedback if feedback not in (None, "-") else None
+                )
+
+    def close(self) -> dict:
+        """Write the summary and statistics, close every file and return what was written."""
+        if self.workbook is not None:
+            self.write_header(self.summary_sheet, SUMMARY_FIELDS, widths={"feedback": 80})
+            for row_number, row in enumerate(self.summary_rows(), start=1):
+                self.write_row(self.summary_sheet, row_number, SUMMARY_FIELDS, row)
+            self.write_header(self.stats_sheet, STATS_FIELDS)
+            for row_number, stats in enumerate(self.questions.values(), start=1):
+                self.write_row(self.stats_sheet, row_number, STATS_FIELDS, stats.row())
+            self.workbook.close()
+        if self.csv_file is not None:
+            self.csv_file.close()
+        if self.parquet_path is not None:
+            self.flush_parquet()
+            if self.parquet_writer is None:
+                pq.write_table(pa.Table.from_pylist([], schema=self.parquet_schema()), str(self.parquet_path))
+            else:
+                self.parquet_writer.close()
+        return {
+            "rows": self.rows,
+            "students": len(self.students),
+            "questions": len(self.questions),
+            "files": [str(path) for path in self.paths],
+        }
+
+
+def export_results(records, paths, feedback=None, on_progress=None, progress_every=1000) -> dict:
+    """Stream `records` into every file in `paths` (.xlsx / .csv / .parquet) and return a summary.
+
+    on_progress, if given, is called with the number of rows written every `progress_every` rows.
+    """
+    exporter = ResultExporter(paths, feedback=feedback)
+    try:
+        for record in records:
+            exporter.write(record)
+            if on_progress is not None and exporter.rows % progress_every == 0:
+                on_progress(exporter.rows)
+    finally:
+        summary = exporter.close()
+    if on_progress is not None:
+        on_progress(exporter.rows)
+    return summary
+
+
+def iter_store_records(store, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Answer records from a ResultsStore with the reviewer's edits applied, read
+    column-wise from store.frame() one chunk of entries at a time."""
+    for start in range(0, len(store), chunk_rows):
+        frame = store.frame(np.arange(start, min(start + chunk_rows, len(store))))
+        marks = frame["marks_awarded"].to_numpy(dtype=np.float64)
+        # A mark entered by the reviewer grades a pending or failed answer
+        status = np.where(np.isnan(marks), frame["status"].astype(object).to_numpy(), STATUS_LABELS[GRADED])
+        columns = {
+            "s_id": frame["s_id"].to_numpy(),
+            "q_id": frame["q_id"].to_numpy(),
+            "marks_awarded": np.where(np.isnan(marks), None, marks),
+            "max_marks": frame["max_marks"].to_numpy(dtype=np.float64),
+            "status": status,
+            "reasoning": frame["reasoning"].to_numpy(),
+            "confidence": _optional(frame["confidence"]),
+            "provider": frame["provider"].astype(object).where(frame["provider"].notna(), None).to_numpy(),
+            "latency": _optional(frame["latency"]),
+            "answer": frame["answer"].to_numpy(),
+        }
+        for values in zip(*columns.values()):
+            yield dict(zip(columns, values))
+
+
+def _optional(column):
+    """A float column as objects, with None for NaN."""
+    values = column.to_numpy(dtype=np.float64)
+    return np.where(np.isnan(values), None, values)
+
+
+def _iter_result_rows(path):
+    path = Path(path)
+    if path.suffix == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+        return
+    yield from iter_jsonl(path)
+
+
+def iter_result_file(path):
+    """Answer records from a batch output file (.jsonl or .csv), read line by line.
+
+    A run resumed from a journal appends to the file of the interrupted run, so a row
+    that failed there appears again once it is retried. Only the last record of each
+    (s_id, q_id) is yielded: a first pass notes where each one ends, a second pass
+    streams the records.
+    """
+    last = {}
+    for line, row in enumerate(_iter_result_rows(path)):
+        last[(str(row.get("s_id")), str(row.get("q_id")))] = line
+    for line, row in enumerate(_iter_result_rows(path)):
+        if last.get((str(row.get("s_id")), str(row.get("q_id")))) == line:
+            yield _batch_record(row)
+
+
+def _batch_record(row) -> dict:
+    failed = bool(row.get("error")) or _number(row.get("marks_awarded")) is None
+    return {
+        "s_id": row.get("s_id"),
+        "q_id": row.get("q_id"),
+        "marks_awarded": row.get("marks_awarded"),
+        "max_marks": row.get("max_marks"),
+        "status": "Failed" if failed else "Graded",
+        "reasoning": row.get("reasoning") or row.get("error") or None,
+        "confidence": _number(row.get("confidence")),
+        "latency": _number(row.get("latency")),
+        "provider": row.get("provider") or None,
+    }
+
+
+def feedback_path_for(output) -> Path:
+    """The *_feedback file batch grading writes next to its output file."""
+    output = Path(output)
+    return output.with_name(output.stem + "_feedback" + output.suffix)
+
+
+def new_export_paths(name="grading_report", directory=DEFAULT_EXPORT_DIR) -> list:
+    """One path per export format in a fresh directory under `directory`."""
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    folder = Path(tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-"), dir=directory))
+    return [folder / f"{name}{suffix}" for suffix in EXPORT_FORMATS]
+
+
+def read_feedback_file(path) -> dict:
+    """{s_id: feedback} from a batch *_feedback.jsonl / .csv file, or {} when it does not exist."""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    if path.suffix == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            return {row["s_id"]: row.get("feedback") for row in csv.DictReader(f)}
+    return {str(row.get("s_id")): row.get("feedback") for row in iter_jsonl(path)}
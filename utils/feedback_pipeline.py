@@ -0,0 +1,113 @@
+# Import files
+from utils.helper_functions import create_feedback_prompt
+from utils.response_parser import try_parse_grade
+from model_manager.usage_tracker import usage_scope
+
+# Import libraries
+import asyncio
+
+
+def feedback_entry(result) -> dict:
+    """The part of a grade result that goes into a student's feedback prompt."""
+    grade, _ = try_parse_grade(result.get("response"), result.get("max_marks"))
+    grade = grade or {}
+    return {
+        "q_id": result.get("q_id"),
+        "marks_awarded": grade.get("marks_awarded"),
+        "max_marks": grade.get("max_marks", result.get("max_marks")),
+        "reasoning": grade.get("reasoning"),
+    }
+
+
+class FeedbackPipeline():
+    """Grade rows and write each student's overall feedback as soon as that student's grades are in.
+
+    A student's feedback call depends on their grading rows (one per question in
+    `question_ids`). It is started the moment the last of those rows finishes,
+    while other students are still being graded. Grading and feedback calls share
+    one semaphore, so `engine.concurrency` bounds the total number of in-flight
+    requests; the per-provider rate limiters are process-wide and shared as well.
+
+    With a CheckpointJournal, grades from earlier runs count towards a student's
+    rows, students whose feedback is journaled are skipped, and feedback is only
+    written for students whose grades all succeeded (the rest are left for the resume).
+    """
+
+    def __init__(self, engine, feedback_call, question_ids, feedback_length="Standard", journal=None):
+        self.engine = engine
+        self.feedback_call = feedback_call
+        self.question_order = {str(q_id): position for position, q_id in enumerate(question_ids)}
+        self.feedback_length = feedback_length
+        self.journal = journal
+        self.grades = {}
+        self.failed = set()
+        self.stats = {"students": 0, "written": 0, "errors": 0, "skipped": 0, "started_during_grading": 0}
+
+    def add_grade(self, result) -> bool:
+        """Record a finished row; returns True once the student's last row is in."""
+        s_id = result.get("s_id")
+        if result.get("error") is not None:
+            self.failed.add(s_id)
+        grades = self.grades.setdefault(s_id, {})
+        grades[str(result.get("q_id"))] = feedback_entry(result)
+        return len(grades) >= len(self.question_order)
+
+    async def write_feedback(self, s_id, grades, semaphore, on_feedback=None):
+        """Generate one student's feedback under the shared semaphore."""
+        if self.journal is not None and s_id in self.failed:
+            # Failed rows are regraded on resume; writing feedback now would journal a partial result
+            self.stats["skipped"] += 1
+            return
+
+        grading_set = sorted(grades.values(), key=lambda grade: self.question_order.get(str(grade["q_id"]), 0))
+        system_prompt, user_prompt = create_feedback_prompt(grading_set, self.feedback_length)
+        feedback, error = None, None
+        async with semaphore:
+            try:
+                with usage_scope(s_id=s_id):
+                    feedback = await self.feedback_call(system_prompt, user_prompt)
+                if feedback is None or not str(feedback).strip():
+                    raise ValueError("empty feedback from model")
+            except Exception as e:
+                print(f"Error writing feedback for s_id={s_id}: {e}")
+                error = str(e)
+
+        self.stats["written" if error is None else "errors"] += 1
+        if self.journal is not None and error is None:
+            # Failed feedback is left out of the journal so a resumed run writes it again
+            self.journal.record_feedback(s_id, feedback)
+        if on_feedback is not None:
+            on_feedback({"s_id": s_id, "feedback": feedback, "error": error})
+
+    async def run(self, rows, on_grade=None, on_feedback=None):
+        """Grade `rows`, calling on_grade per result and on_feedback per student as each completes."""
+        semaphore = asyncio.Semaphore(self.engine.concurrency)
+        feedback_tasks = set()
+
+        def start_feedback(s_id, during_grading):
+            self.stats["students"] += 1
+            self.stats["started_during_grading"] += int(during_grading)
+            grades = self.grades.pop(s_id)
+            feedback_tasks.add(asyncio.create_task(self.write_feedback(s_id, grades, semaphore, on_feedback)))
+
+        if self.journal is not None:
+            # Grades from interrupted runs; students already complete get their feedback straight away
+            for entry in self.journal.iter_records(kind="grade"):
+                result = entry["result"]
+                if result.get("s_id") not in self.journal.feedback_done and self.add_grade(result):
+                    start_feedback(result.get("s_id"), during_grading=True)
+
+        async for result in self.engine.iter_grades(rows, semaphore=semaphore):
+            if on_grade is not None:
+                on_grade(result)
+            if self.journal is not None and result.get("s_id") in self.journal.feedback_done:
+                continue
+            if self.add_grade(result):
+                start_feedback(result.get("s_id"), during_grading=True)
+
+        # Students with fewer rows than questions (e.g. rows missing from the input)
+        for s_id in list(self.grades):
+            start_feedback(s_id, during_grading=False)
+
+        await asyncio.gather(*feedback_tasks)
+        return self.stats
@@ -0,0 +1,247 @@
+# Import files
+from utils.answer_dedup import answer_key
+from utils.confidence import mark_probability
+from utils.helper_functions import create_grading_prompt, create_repair_prompt
+from utils.response_parser import GRADE_SCHEMA, TRUNCATED, try_parse_grade
+from model_manager.usage_tracker import usage_scope
+
+# Import libraries
+from functools import partial
+import asyncio
+import json
+import time
+
+DEFAULT_CONCURRENCY = 8
+# Provider recorded for a grade served from the response cache
+CACHED_PROVIDER = "cache"
+# Output budget when a grade was cut off by the provider's default limit
+REGRADE_MAX_TOKENS = 2048
+
+
+class GradingEngine():
+    """Grade prompt rows concurrently through an async model call.
+
+    `call` is any coroutine function taking (system_prompt, user_prompt), e.g.
+    get_model_fallback().async_call_with_fallback or CustomModel(...).async_model_pipeline.
+
+    With `dedupe=True`, rows that share a question and a normalised answer are graded
+    once and the grade is copied to every row in the group. Only counts are kept for
+    dedup_summary; memory still grows with the number of unique answers, as each one's
+    finished grade is kept (as a small dict) for the duplicates that may follow.
+
+    With a CheckpointJournal, rows already in the journal are skipped and every
+    successful grade is journaled as soon as it completes.
+
+    Grades are requested with a JSON schema and validated against the row's max_marks;
+    an invalid grade gets one short repair request rather than a full regrade.
+
+    With a SelfConsistency as `confidence`, each grade is resampled until enough samples
+    agree on its marks, and result records carry the grade's confidence and sample count.
+    """
+
+    def __init__(self, call, concurrency: int = DEFAULT_CONCURRENCY, dedupe: bool = False, journal=None,
+                 confidence=None):
+        self.call = call
+        self.concurrency = max(1, int(concurrency))
+        self.dedupe = dedupe
+        self.journal = journal
+        self.confidence = confidence
+        self.dedup_counts = {"rows": 0, "unique_answers": 0}
+        self.parse_stats = {"repairs": 0, "repaired": 0, "invalid": 0}
+
+    async def grade_row(self, index, row, semaphore):
+        """Grade a single prompt row and return a result record."""
+        system_prompt, user_prompt = create_grading_prompt(row)
+        response, error, provider, confidence, samples = None, None, None, None, 1
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                with usage_scope(s_id=row.get("s_id"), q_id=row.get("q_id")) as scope:
+                    response = await self.call(
+                        system_prompt, user_prompt, response_schema=GRADE_SCHEMA, **self.sample_kwargs(0)
+                        )
+                    provider = scope["provider"] or CACHED_PROVIDER
+                    probability = mark_probability(scope["logprobs"])
+                    response, error = await self.check_grade(row, response)
+                    if error is None and self.confidence is not None:
+                        votes = self.confidence.votes()
+                        votes.add(json.loads(response), probability)
+                        await self.sample_grades(row, system_prompt, user_prompt, votes, scope)
+                        response, confidence, samples = self.settle(votes)
+            except Exception as e:
+                print(f"Error grading s_id={row.get('s_id')} q_id={row.get('q_id')}: {e}")
+                error = str(e)
+            latency = time.perf_counter() - start
+
+        return {
+            "index": index,
+            "s_id": row.get("s_id"),
+            "q_id": row.get("q_id"),
+            "max_marks": row.get("max_marks"),
+            "response": response,
+            "error": error,
+            "latency": latency,
+            "provider": provider,
+            "shared_from": None,
+            "confidence": confidence,
+            "samples": samples,
+        }
+
+    def sample_kwargs(self, sample) -> dict:
+        return {} if self.confidence is None else self.confidence.call_kwargs(sample)
+
+    async def sample_grades(self, row, system_prompt, user_prompt, votes, scope):
+        """Draw further samples of a row's grade until its votes are settled.
+
+        An invalid sample counts as a draw without a vote; a failed call stops sampling
+        and the grade is settled on the samples drawn so far.
+        """
+        while not votes.settled():
+            scope["logprobs"] = None
+            try:
+                response = await self.call(
+                    system_prompt, user_prompt, response_schema=GRADE_SCHEMA, **self.sample_kwargs(len(votes))
+                    )
+            except Exception as e:
+                print(f"Error sampling s_id={row.get('s_id')} q_id={row.get('q_id')}: {e}")
+                return
+            grade, _ = try_parse_grade(response, row.get("max_marks"))
+            votes.add(grade, mark_probability(scope["logprobs"]))
+
+    def settle(self, votes):
+        """(response, confidence, samples) for a row's settled votes."""
+        self.confidence.record(votes)
+        grade, confidence = votes.result()
+        return json.dumps(grade), confidence, len(votes)
+
+    async def check_grade(self, row, response):
+        """Validate a grading response, repairing it once on a schema failure (regrading it when it was cut off).
+
+        Returns (response, error); a valid grade is returned as normalised JSON.
+        """
+        if response is None:
+            return None, "No response from model"
+
+        grade, problem = try_parse_grade(response, row.get("max_marks"))
+        if grade is None:
+            self.parse_stats["repairs"] += 1
+            print(f"Invalid grade for s_id={row.get('s_id')} q_id={row.get('q_id')} ({problem}), requesting a repair")
+            if problem.startswith(TRUNCATED):
+                # Output cut off mid-grade holds no judgement to keep, so the answer is graded again with more room
+                system_prompt, user_prompt = create_grading_prompt(row)
+                repaired = await self.call(
+                    system_prompt, user_prompt, response_schema=GRADE_SCHEMA, max_tokens=REGRADE_MAX_TOKENS
+                    )
+            else:
+                system_prompt, user_prompt = create_repair_prompt(response, problem, row.get("max_marks"))
+                repaired = await self.call(system_prompt, user_prompt, response_schema=GRADE_SCHEMA)
+            grade, problem = try_parse_grade(repaired, row.get("max_marks"))
+            if grade is None:
+                self.parse_stats["invalid"] += 1
+                return response, f"Invalid grade: {problem}"
+            self.parse_stats["repaired"] += 1
+
+        return json.dumps(grade), None
+
+    async def share_grade(self, index, row, source):
+        """Copy the grade of an identical answer - a task still grading it, or its finished grade."""
+        result = dict(await source) if isinstance(source, asyncio.Task) else dict(source)
+        result.update({
+            "index": index,
+            "s_id": row.get("s_id"),
+            "shared_from": result["s_id"],
+            "latency": 0.0,
+        })
+        return result
+
+    def schedule(self, rows, semaphore):
+        """Yield one grading task per row, sharing tasks between duplicate answers when dedupe is on."""
+        sources = {}
+
+        def keep_grade(key, task):
+            # Hold on to the grade only, not the finished task
+            if task.cancelled():
+                sources.pop(key, None)
+            else:
+                sources[key] = {name: value for name, value in task.result().items() if name not in ("index", "latency")}
+
+        for index, row in enumerate(rows):
+            if not self.dedupe:
+                yield asyncio.create_task(self.grade_row(index, row, semaphore))
+                continue
+
+            key = answer_key(row)
+            source = sources.get(key)
+            self.dedup_counts["rows"] += 1
+            if source is None:
+                task = asyncio.create_task(self.grade_row(index, row, semaphore))
+                task.add_done_callback(partial(keep_grade, key))
+                sources[key] = task
+                self.dedup_counts["unique_answers"] += 1
+            else:
+                task = asyncio.create_task(self.share_grade(index, row, source))
+            yield task
+
+    async def iter_grades(self, rows, semaphore=None):
+        """Yield result records as they complete (not in row order).
+
+        Rows are pulled from the iterable lazily, so at most a small window of
+        rows is held in memory at once. Pass a `semaphore` to share the
+        concurrency budget with other calls (e.g. FeedbackPipeline).
+        """
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.concurrency)
+        window = self.concurrency * 2
+        pending = set()
+
+        if self.journal is not None:
+            rows = self.journal.pending(rows)
+
+        for task in self.schedule(rows, semaphore):
+            pending.add(task)
+            if len(pending) >= window:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for result in self.finish(task):
+                        yield result
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for result in self.finish(task):
+                    yield result
+
+    def finish(self, task):
+        """Collect a finished task's result record(s) and journal them."""
+        results = task.result()
+        if isinstance(results, dict):
+            results = [results]
+        if self.journal is not None:
+            for result in results:
+                self.journal.record_grade(result)
+        return results
+
+    async def grade_all(self, rows, on_result=None):
+        """Grade every row and return the result records in row order."""
+        results = []
+        async for result in self.iter_grades(rows):
+            if on_result is not None:
+                on_result(result)
+            results.append(result)
+
+        results.sort(key=lambda result: result["index"])
+        return results
+
+    def run(self, rows, on_result=None):
+        """Blocking entry point for sync callers such as the Streamlit script."""
+        return asyncio.run(self.grade_all(rows, on_result=on_result))
+
+    def dedup_summary(self) -> dict:
+        """Return how many rows were seen and how many model calls dedup saved."""
+        rows, unique_answers = self.dedup_counts["rows"], self.dedup_counts["unique_answers"]
+        return {"rows": rows, "unique_answers": unique_answers, "calls_saved": rows - unique_answers}
+
+    def confidence_summary(self) -> dict:
+        """Self-consistency sampling counts, or None when confidence scoring is off."""
+        return None if self.confidence is None else self.confidence.summary()
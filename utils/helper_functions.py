@@ -1,11 +1,22 @@
 # Import files
 from prompts import (
-    GRADE_JSON_INSTRUCTIONS,
     GRADING_SYSTEM_PROMPT, 
-    GRADING_USER_PROMPT_TEMPLATE,
     FEEDBACK_SYSTEM_PROMPT, 
-    FEEDBACK_USER_PROMPT_TEMPLATE
+    FEEDBACK_USER_PROMPT_TEMPLATE,
+    BATCH_GRADE_JSON_INSTRUCTIONS,
+    BATCH_GRADING_SYSTEM_PROMPT,
+    BATCH_QUESTION_TEMPLATE,
+    BATCH_GRADING_USER_PROMPT_TEMPLATE,
+    COHORT_GRADE_JSON_INSTRUCTIONS,
+    COHORT_GRADING_SYSTEM_PROMPT,
+    COHORT_ANSWER_TEMPLATE,
+    COHORT_GRADING_USER_PROMPT_TEMPLATE,
+    GRADE_JSON_INSTRUCTIONS,
+    REPAIR_SYSTEM_PROMPT,
+    REPAIR_USER_PROMPT_TEMPLATE
     )
+from utils.response_parser import try_parse_grade
+from utils.prompt_compiler import compile_assignment, render_prompt_prefix, render_answer
 
 # Import libraries
 from pathlib import Path
@@ -58,77 +69,69 @@ def pick_random_student(students: list[dict]) -> dict:
 
 # Prompt builders - per-question rows with student answers, rubric, ground truth, etc
 def built_prompt_rows(gt, students, rubric):
-    rows = []
-    for student in students:
-        answers = student.get("answers", {})
-        s_id = student.get("id", "")
-        for q in gt.get("questions", []):
-            q_id = q.get("id")
-            q_text = q.get("text")
-            q_ground_truth = q.get("ground_truth", "")
-            answer_text = answers.get(q_id, "No answer provided.")
-
-            rubric_parts = rubric.get("parts", [])
-            for part in rubric_parts:
-                if part.get("qid") == q_id:
-                    criteria = part.get("criteria", "No criteria provided.")
-                    max_marks = part.get("max_marks", 0)
-
-            rows.append({
-                "s_id": s_id,
-                "q_id":q_id, 
-                "q_text": q_text, 
-                "s_answer": answer_text,
-                "ground_truth": q_ground_truth, 
-                "rubric_criteria": criteria, 
-                "max_marks": max_marks})
-    
-    return rows
-
-
-# Table builders - create table - contains dummy data
-def review_table(data):
-    """Create a review table from the data."""
-    df = pd.DataFrame(data, columns=["s_id", "q_id", "s_answer", "max_marks"])
-    df.rename(columns={"s_id": "id", "q_id": "Q", "s_answer": "Student Answers", "max_marks": "Max Marks"}, inplace=True)
-
-    # Dummy data
-    df["Marks Awarded"] = [10, 10, 3, 0]  
-    df["Feedback"] = ["-", "-", "-", "-"]  
-    df["Reasoning"] = [
-        "Good understanding.", 
-        "Well done, good understanding of the concept.", 
-        "Improve on understanding the concept.", 
-        "Improve on understanding the concept."]
-    df["Score"] = df["Marks Awarded"].astype(str) + " / " + df["Max Marks"].astype(str)
-
-    # Add overall row
-#    new_row = {
-#        "id": 1,
-#        "Q": "Total", 
-#        "Student Answers": "-", 
-#        "Score": df["Marks Awarded"].sum().astype(str) + " / " + df["Max Marks"].sum().astype(str), 
-#        "Feedback": "Great effort on this assignment! You demonstrated a solid understanding of the key concepts. Keep up the good work!",
-#        "Reasoning": "-"
-#        }
-#    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-#    df = df[["Q", "Student Answers", "Score", "Feedback", "Reasoning"]]
-   
-    return df
+    return list(iter_prompt_rows(gt, students, rubric))
+
+def iter_prompt_rows(gt, students, rubric):
+    """Yield prompt rows lazily so students can come from a generator (see utils.submission_stream).
+
+    The rubric lookup and static prompt prefix per question are compiled once per assignment.
+    """
+    return compile_assignment(gt, rubric).iter_prompt_rows(students)
+
 
 # Prompt template
 def create_grading_prompt(input):
-    """Create the grading prompt for a specific question part."""
-    user_prompt = GRADING_USER_PROMPT_TEMPLATE.format(
-        question_text=input.get("q_text", ""),
-        student_answer=input.get("s_answer", ""),
-        ground_truth=input.get("ground_truth", ""),
-        rubric_criteria=input.get("rubric_criteria", ""),
-        max_marks=input.get("max_marks", 0),
-        format_instructions=GRADE_JSON_INSTRUCTIONS
-    )
+    """Create the grading prompt for a specific question part.
+
+    Rows from iter_prompt_rows carry the pre-rendered static prefix, so only the answer is appended.
+    """
+    prefix = input.get("prompt_prefix")
+    if prefix is None:
+        prefix = render_prompt_prefix(
+            input.get("q_text", ""),
+            input.get("ground_truth", ""),
+            input.get("rubric_criteria", ""),
+            input.get("max_marks", 0)
+        )
+    user_prompt = prefix + render_answer(input.get("s_answer", ""))
     return GRADING_SYSTEM_PROMPT, user_prompt
 
+def create_batch_grading_prompt(rows):
+    """Create one grading prompt covering all of a student's questions."""
+    questions = "".join(
+        BATCH_QUESTION_TEMPLATE.format(
+            q_id=row.get("q_id", ""),
+            question_text=row.get("q_text", ""),
+            student_answer=row.get("s_answer", ""),
+            ground_truth=row.get("ground_truth", ""),
+            rubric_criteria=row.get("rubric_criteria", ""),
+            max_marks=row.get("max_marks", 0)
+        )
+        for row in rows
+    )
+    user_prompt = BATCH_GRADING_USER_PROMPT_TEMPLATE.format(
+        questions=questions,
+        format_instructions=BATCH_GRADE_JSON_INSTRUCTIONS
+    )
+    return BATCH_GRADING_SYSTEM_PROMPT, user_prompt
+
+def create_cohort_grading_prompt(rows):
+    """Create one grading prompt for several students' answers to the same question."""
+    first = rows[0]
+    answers = "".join(
+        COHORT_ANSWER_TEMPLATE.format(s_id=row.get("s_id", ""), student_answer=row.get("s_answer", ""))
+        for row in rows
+    )
+    user_prompt = COHORT_GRADING_USER_PROMPT_TEMPLATE.format(
+        question_text=first.get("q_text", ""),
+        ground_truth=first.get("ground_truth", ""),
+        rubric_criteria=first.get("rubric_criteria", ""),
+        max_marks=first.get("max_marks", 0),
+        answers=answers,
+        format_instructions=COHORT_GRADE_JSON_INSTRUCTIONS
+    )
+    return COHORT_GRADING_SYSTEM_PROMPT, user_prompt
+
 def create_feedback_prompt(grading_output, feedback_length):
     """Create the feedback prompt based on the grading output."""
     user_prompt = FEEDBACK_USER_PROMPT_TEMPLATE.format(
@@ -137,38 +140,39 @@ def create_feedback_prompt(grading_output, feedback_length):
     )
     return FEEDBACK_SYSTEM_PROMPT, user_prompt
 
+def create_repair_prompt(response, error, max_marks):
+    """Create the short prompt that asks the model to fix an invalid grading response."""
+    user_prompt = REPAIR_USER_PROMPT_TEMPLATE.format(
+        error=error,
+        response=response,
+        max_marks=max_marks,
+        format_instructions=GRADE_JSON_INSTRUCTIONS
+    )
+    return REPAIR_SYSTEM_PROMPT, user_prompt
+
 # Process model response
 def process_model_response(response):
-    try:
-        if isinstance(response, str):
-            parsed = json.loads(response)
-            st.markdown(f"Marks Awarded: {parsed.get('marks_awarded', 10)} / {parsed.get('max_marks', 10)}")
-            st.markdown(f"Reasoning: {parsed.get('reasoning')}")
-        elif isinstance(response, dict):
-            parsed = response
-            st.markdown(f"Marks Awarded: {parsed.get('marks_awarded', 10)} / {parsed.get('max_marks', 10)}")
-            st.markdown(f"Reasoning: {parsed.get('reasoning')}")
-        else:
-            parsed = response
-            st.markdown(parsed)
-        return parsed
-        
-    except json.JSONDecodeError as e:
-        print(f"Error in loading response: {e}")
-        st.markdown(str(response))
-        return response
+    """Render a grading response and return the parsed grade (or the raw response when it holds none)."""
+    grade, error = try_parse_grade(response) if isinstance(response, (str, dict)) else (None, None)
+    if grade is not None:
+        st.markdown(f"Marks Awarded: {grade['marks_awarded']} / {grade['max_marks']}")
+        st.markdown(f"Reasoning: {grade['reasoning']}")
+        return grade
+
+    if error is not None:
+        print(f"Error in loading response: {error}")
+    st.markdown(str(response))
+    return response
 
 # Session state management
 def save_config_func():
     st.session_state.save_config = True
     st.session_state.apply_config = False
-    st.session_state.df = None
+    st.session_state.results_store = None
 
-def apply_config_func():
+def apply_config_func(store):
     st.session_state.apply_config = True
     st.session_state.save_config = True
-    gt, student, rubric = load_defaults()
-    prompt_inputs = built_prompt_rows(gt, student, rubric)
-    st.session_state.df = review_table(prompt_inputs)
+    st.session_state.results_store = store
     
     
\ No newline at end of file
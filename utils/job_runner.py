@@ -0,0 +1,279 @@
+# Import files
+from utils.feedback_pipeline import FeedbackPipeline
+from utils.document_ingest import build_assignment, get_document_extractor
+from utils.excel_export import export_results
+from model_manager.usage_tracker import track_run
+
+# Import libraries
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import itertools
+import threading
+import time
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+CANCEL_POLL_SECONDS = 0.2
+
+
+class Job():
+    """State of one background job, safe to read from the UI thread while the worker updates it."""
+
+    def __init__(self, job_id, name, total=None, store=None):
+        self.id = job_id
+        self.name = name
+        self.total = total
+        self.status = QUEUED
+        self.error = None
+        # With a ResultsStore, results and feedback go into its columns instead of the list / dict
+        self.store = store
+        self.results = []
+        self.feedback = {}
+        self.done = 0
+        self.errors = 0
+        self.feedback_written = 0
+        self.stats = {}
+        self.usage = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self._lock = threading.Lock()
+
+    def add_result(self, result):
+        # Store first, so a reader that sees the new count also sees the result
+        if self.store is not None:
+            self.store.add_result(result)
+        with self._lock:
+            if self.store is None:
+                self.results.append(result)
+            self.done += 1
+            self.errors += int(result.get("error") is not None)
+
+    def add_feedback(self, record):
+        if self.store is not None:
+            self.store.add_feedback(record)
+        with self._lock:
+            if self.store is None:
+                self.feedback[record["s_id"]] = record
+            self.feedback_written += 1
+
+    def set_progress(self, done):
+        """Report progress of a job that does not produce per-row results (e.g. an export)."""
+        with self._lock:
+            self.done = done
+
+    def results_since(self, start=0) -> list:
+        """Results appended after the first `start` ones, for incremental polling."""
+        with self._lock:
+            return self.results[start:]
+
+    @property
+    def finished_ok(self) -> bool:
+        return self.status == DONE
+
+    @property
+    def is_active(self) -> bool:
+        return self.status not in FINISHED
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            done, errors, feedback = self.done, self.errors, self.feedback_written
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "done": done,
+            "total": self.total,
+            "errors": errors,
+            "feedback": feedback,
+            "progress": done / self.total if self.total else None,
+            "elapsed_seconds": round(end - self.started, 1) if self.started else 0.0,
+            "error": self.error,
+        }
+
+
+class JobRunner():
+    """Thread pool plus a registry of jobs that outlives Streamlit reruns.
+
+    A job is a coroutine function taking the Job; it runs on its own event loop in
+    a worker thread, so the script thread is never blocked. `cancel` cancels the
+    job's task on that loop, which cancels its in-flight model calls.
+    """
+
+    def __init__(self, max_workers=2, keep_finished=20):
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, name, coroutine_function, total=None, store=None) -> Job:
+        with self._lock:
+            job = Job(f"job-{next(self._ids)}", name, total=total, store=store)
+            self.jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, coroutine_function)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id) -> bool:
+        job = self.get(job_id)
+        if job is None or not job.is_active:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def list_jobs(self, job_ids=None) -> list:
+        """Snapshots of the registered jobs, or only of `job_ids` (e.g. one browser session's jobs)."""
+        with self._lock:
+            return [job.snapshot() for job in self.jobs.values() if job_ids is None or job.id in job_ids]
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if not job.is_active]
+        for job in sorted(finished, key=lambda job: job.created)[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.id]
+
+    def _run(self, job, coroutine_function):
+        if job.cancel_event.is_set():
+            job.status = CANCELLED
+            job.finished = time.time()
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            with track_run() as usage:
+                job.usage = usage
+                asyncio.run(self._run_cancellable(job, coroutine_function))
+            job.status = DONE
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    async def _run_cancellable(self, job, coroutine_function):
+        task = asyncio.create_task(coroutine_function(job))
+        while not task.done():
+            await asyncio.wait({task}, timeout=CANCEL_POLL_SECONDS)
+            if job.cancel_event.is_set() and not task.done():
+                task.cancel()
+        return task.result()
+
+
+def submit_grading_job(runner, engine, rows, name="Grading", feedback_call=None, question_ids=(),
+                       feedback_length="Standard", store=None) -> Job:
+    """Grade `rows` in the background, recording each result as it completes.
+
+    Results go to job.results, or into `store` (a ResultsStore) when given - then
+    rows may be its lazy store.rows() generator. With a feedback_call, each student's
+    feedback is written as soon as their grades are in (see FeedbackPipeline).
+    """
+    if store is None:
+        rows = list(rows)
+    total = len(store) if store is not None else len(rows)
+
+    async def grade(job):
+        if feedback_call is None:
+            async for result in engine.iter_grades(rows):
+                job.add_result(result)
+        else:
+            pipeline = FeedbackPipeline(engine, feedback_call, question_ids=question_ids, feedback_length=feedback_length)
+            job.stats["feedback"] = pipeline.stats
+            await pipeline.run(rows, on_grade=job.add_result, on_feedback=job.add_feedback)
+        if hasattr(engine, "batch_stats"):
+            job.stats["batching"] = engine.batch_stats
+        job.stats["parsing"] = engine.parse_stats
+        if engine.confidence_summary() is not None:
+            job.stats["confidence"] = engine.confidence_summary()
+        if hasattr(engine, "cascade_summary"):
+            job.stats["cascade"] = engine.cascade_summary()
+
+    return runner.submit(name, grade, total=total, store=store)
+
+
+INGEST_KINDS = ("gt", "rubric", "scripts")
+
+
+def submit_ingest_job(runner, uploads, defaults, name="Reading documents", extractor=None) -> Job:
+    """Extract and parse uploaded documents in the background.
+
+    `uploads` maps "gt", "rubric" and "scripts" to lists of (file name, bytes). Each
+    file's record (name, hash, characters, cached, error) is appended to job.results
+    as soon as it is extracted; the parsed (gt, students, rubric) is left in
+    job.stats["assignment"], taken from `defaults` for the kinds that were not uploaded.
+    """
+    extractor = extractor or get_document_extractor()
+    files = [(kind, file_name, data) for kind in INGEST_KINDS for file_name, data in uploads.get(kind) or ()]
+
+    def on_file(job, record):
+        job.add_result({
+            "name": record["name"],
+            "hash": record["hash"],
+            "chars": len(record["text"] or ""),
+            "cached": record["cached"],
+            "error": record["error"],
+        })
+
+    async def ingest(job):
+        records = await extractor.extract_many(
+            [(file_name, data) for _, file_name, data in files], on_file=lambda record: on_file(job, record)
+            )
+        texts = {kind: [] for kind in INGEST_KINDS}
+        for (kind, file_name, _), record in zip(files, records):
+            if record["text"] is not None:
+                texts[kind].append((file_name, record["text"]))
+        job.stats["extraction"] = {
+            "files": len(records),
+            "unique": len({record["hash"] for record in records}),
+            "cached": sum(record["cached"] for record in records),
+            "errors": sum(record["error"] is not None for record in records),
+        }
+        job.stats["assignment"] = build_assignment(
+            [text for _, text in texts["gt"]],
+            [text for _, text in texts["rubric"]],
+            texts["scripts"],
+            defaults
+            )
+
+    return runner.submit(name, ingest, total=len(files))
+
+
+def submit_export_job(runner, records, paths, total=None, feedback=None, name="Exporting results") -> Job:
+    """Write `records` to the export `paths` in the background.
+
+    job.done counts the rows written so far and job.stats["export"] holds the
+    summary once the files are complete. Cancelling stops at the next progress report.
+    """
+
+    def progress(job, rows):
+        job.set_progress(rows)
+        if job.cancel_event.is_set():
+            raise asyncio.CancelledError
+
+    async def export(job):
+        job.stats["export"] = export_results(
+            records, paths, feedback=feedback, on_progress=lambda rows: progress(job, rows)
+            )
+
+    return runner.submit(name, export, total=total)
+
+
+JOB_RUNNER = JobRunner()
+
+
+def get_job_runner() -> JobRunner:
+    """Return the process-wide job runner; module state survives Streamlit reruns."""
+    return JOB_RUNNER
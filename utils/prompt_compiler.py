@@ -0,0 +1,99 @@
+# Import files
+from prompts import (
+    GRADE_JSON_INSTRUCTIONS,
+    GRADING_USER_PROMPT_PREFIX_TEMPLATE,
+    GRADING_USER_PROMPT_ANSWER_TEMPLATE
+    )
+
+# Import libraries
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_CRITERIA = "No criteria provided."
+DEFAULT_ANSWER = "No answer provided."
+# Compiled assignments kept in memory, least recently used dropped first (AIGS_COMPILED_ASSIGNMENTS)
+MAX_COMPILED = int(os.getenv("AIGS_COMPILED_ASSIGNMENTS", "32"))
+
+
+def render_prompt_prefix(question_text, ground_truth, rubric_criteria, max_marks) -> str:
+    """Render the static (per-question) part of a grading prompt."""
+    return GRADING_USER_PROMPT_PREFIX_TEMPLATE.format(
+        question_text=question_text,
+        ground_truth=ground_truth,
+        rubric_criteria=rubric_criteria,
+        max_marks=max_marks,
+        format_instructions=GRADE_JSON_INSTRUCTIONS
+    )
+
+
+def render_answer(student_answer) -> str:
+    """Render the per-student tail of a grading prompt."""
+    return GRADING_USER_PROMPT_ANSWER_TEMPLATE.format(student_answer=student_answer)
+
+
+class CompiledAssignment():
+    """Per-assignment prompt artifacts, built once.
+
+    Holds a q_id -> rubric part index and, for each question, the pre-rendered
+    static prompt prefix. Rows produced here reference these shared objects, so
+    building rows is O(rows) and each row's prompt (see create_grading_prompt) is the
+    shared prefix plus the answer.
+    """
+
+    def __init__(self, gt, rubric):
+        self.rubric_index = {str(part.get("qid")): part for part in rubric.get("parts", [])}
+        self.questions = []
+
+        for q in gt.get("questions", []):
+            q_id = q.get("id")
+            part = self.rubric_index.get(str(q_id), {})
+            question = {
+                "q_id": q_id,
+                "q_text": q.get("text"),
+                "ground_truth": q.get("ground_truth", ""),
+                "rubric_criteria": part.get("criteria", DEFAULT_CRITERIA),
+                "max_marks": part.get("max_marks", 0),
+            }
+            if not part:
+                print(f"No rubric part found for question {q_id}")
+            question["prompt_prefix"] = render_prompt_prefix(
+                question["q_text"], question["ground_truth"], question["rubric_criteria"], question["max_marks"]
+            )
+            self.questions.append(question)
+
+    def iter_prompt_rows(self, students):
+        """Yield one prompt row per (student, question)."""
+        for student in students:
+            answers = student.get("answers", {})
+            s_id = student.get("id", "")
+            for question in self.questions:
+                row = dict(question)
+                row["s_id"] = s_id
+                row["s_answer"] = answers.get(question["q_id"], DEFAULT_ANSWER)
+                yield row
+
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def compile_assignment(gt, rubric) -> CompiledAssignment:
+    """Return the compiled artifacts for an assignment, reusing them while gt and rubric are unchanged.
+
+    At most MAX_COMPILED assignments are kept; the least recently used is dropped first.
+    """
+    payload = json.dumps({"gt": gt, "rubric": rubric}, sort_keys=True, default=str)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+        if compiled is None:
+            compiled = CompiledAssignment(gt, rubric)
+            _compiled[key] = compiled
+            while len(_compiled) > MAX_COMPILED:
+                _compiled.popitem(last=False)
+        else:
+            _compiled.move_to_end(key)
+        return compiled
@@ -0,0 +1,214 @@
+# Import libraries
+import json
+import re
+
+CODE_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.S)
+GRADE_FIELDS = ("marks_awarded", "max_marks", "reasoning")
+# Start of the parse error for output cut off mid-document, which is regraded rather than repaired
+TRUNCATED = "truncated response"
+
+# JSON schema for one grade, sent to providers that support structured output
+GRADE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "marks_awarded": {"type": "integer"},
+        "max_marks": {"type": "integer"},
+        "reasoning": {"type": "string"},
+    },
+    "required": list(GRADE_FIELDS),
+    "additionalProperties": False,
+}
+
+
+def batch_grade_schema(key) -> dict:
+    """Schema for a batched response - {"grades": [...]} with each grade labelled by `key` (q_id or s_id)."""
+    item = {
+        "type": "object",
+        "properties": dict({key: {"type": "string"}}, **GRADE_SCHEMA["properties"]),
+        "required": [key] + list(GRADE_FIELDS),
+        "additionalProperties": False,
+    }
+    return {
+        "type": "object",
+        "properties": {"grades": {"type": "array", "items": item}},
+        "required": ["grades"],
+        "additionalProperties": False,
+    }
+
+
+class GradeParseError(ValueError):
+    """A model response that does not contain a valid grade."""
+
+
+def _complete_items(text):
+    """The objects of a JSON array that were written out in full before the output was cut off.
+
+    Nothing is closed up: an item the model did not finish (e.g. a marks_awarded number
+    that may be missing digits) is dropped.
+    """
+    decoder = json.JSONDecoder()
+    grades = re.search(r'"grades"\s*:\s*\[', text)
+    position = grades.end() if grades else text.find("[") + 1
+    items = []
+    if position <= 0:
+        return items
+    while True:
+        while position < len(text) and text[position] in " \t\r\n,":
+            position += 1
+        try:
+            item, position = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            return items
+        if isinstance(item, dict):
+            items.append(item)
+
+
+def _json_candidates(response):
+    text = str(response).strip()
+    fenced = CODE_FENCE_RE.search(text)
+    return text, ([fenced.group(1)] if fenced else []) + [text]
+
+
+def extract_json(response):
+    """Return the first JSON object or array in a model response.
+
+    Tolerates code fences and prose around the JSON. A document cut off before it was
+    closed is never patched up (the last number or string may be incomplete); it raises
+    GradeParseError with a message starting with TRUNCATED. A response holding no JSON
+    raises GradeParseError("no JSON found in response ...").
+    """
+    if isinstance(response, (dict, list)):
+        return response
+    if response is None:
+        raise GradeParseError("empty response")
+
+    text, candidates = _json_candidates(response)
+    decoder = json.JSONDecoder()
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            pass
+        for match in re.finditer(r"[{\[]", candidate):
+            try:
+                return decoder.raw_decode(candidate, match.start())[0]
+            except json.JSONDecodeError as e:
+                # A document that runs off the end of the output is not retried from an inner bracket
+                if e.msg.startswith("Unterminated string") or e.pos >= len(candidate):
+                    raise GradeParseError(f"{TRUNCATED}: the JSON was cut off before it was closed: {text[-80:]!r}")
+    raise GradeParseError(f"no JSON found in response: {text[:80]!r}")
+
+
+def _to_number(value, field):
+    if isinstance(value, bool):
+        raise GradeParseError(f"{field} is not a number: {value!r}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise GradeParseError(f"{field} is not a number: {value!r}")
+    return int(number) if number.is_integer() else number
+
+
+def validate_grade(item, max_marks=None) -> dict:
+    """Return a clean {marks_awarded, max_marks, reasoning} dict or raise GradeParseError.
+
+    Every field of GRADE_FIELDS must be present. `max_marks` from the rubric takes
+    precedence over the value the model returned, which must still be a number.
+    """
+    if not isinstance(item, dict):
+        raise GradeParseError(f"expected a JSON object, got {type(item).__name__}")
+    missing = [field for field in GRADE_FIELDS if field not in item]
+    if missing:
+        raise GradeParseError(f"missing {', '.join(missing)}")
+
+    marks = _to_number(item["marks_awarded"], "marks_awarded")
+    returned_max = _to_number(item["max_marks"], "max_marks")
+    if max_marks in (None, "", 0):
+        max_marks = returned_max
+    max_marks = _to_number(max_marks, "max_marks") if max_marks not in (None, "") else None
+
+    if marks < 0:
+        raise GradeParseError(f"marks_awarded {marks} is negative")
+    if max_marks and marks > max_marks:
+        raise GradeParseError(f"marks_awarded {marks} exceeds max_marks {max_marks}")
+    reasoning = item.get("reasoning")
+    return {"marks_awarded": marks, "max_marks": max_marks, "reasoning": "" if reasoning is None else str(reasoning)}
+
+
+def parse_grade(response, max_marks=None) -> dict:
+    """Parse and validate a single-question grading response; raises GradeParseError."""
+    parsed = extract_json(response)
+    if isinstance(parsed, list) and len(parsed) == 1:
+        parsed = parsed[0]
+    return validate_grade(parsed, max_marks)
+
+
+def try_parse_grade(response, max_marks=None):
+    """Return (grade, None) or (None, error message)."""
+    try:
+        return parse_grade(response, max_marks), None
+    except GradeParseError as e:
+        return None, str(e)
+
+
+def _grade_items(parsed, key):
+    """Normalise the accepted batched shapes to a list of grade dicts labelled by `key`."""
+    if isinstance(parsed, dict):
+        if "grades" in parsed:
+            parsed = parsed["grades"]
+        elif "marks_awarded" in parsed:
+            parsed = [parsed]
+        else:
+            parsed = [dict(item, **{key: k}) for k, item in parsed.items() if isinstance(item, dict)]
+    if not isinstance(parsed, list):
+        return []
+    return [item for item in parsed if isinstance(item, dict)]
+
+
+def parse_batch_grades(response, rows, key="q_id") -> dict:
+    """Parse a batched response into {key: grade} for the valid entries only.
+
+    Accepts a JSON array of grades carrying `key`, {"grades": [...]}, or an object keyed by `key` values.
+    From a response cut off part way, only the grades written out in full are kept.
+    """
+    try:
+        parsed = extract_json(response)
+    except GradeParseError as e:
+        # Keep the grades the model finished before a batched response was cut off
+        parsed = [] if response is None else _complete_items(_json_candidates(response)[1][0])
+        if not parsed:
+            print(f"Could not parse batched response: {e}")
+            return {}
+
+    rows_by_key = {str(row.get(key)): row for row in rows}
+    grades = {}
+    for item in _grade_items(parsed, key):
+        item_key = str(item.get(key))
+        if item_key in rows_by_key and item_key not in grades:
+            try:
+                grades[item_key] = validate_grade(item, rows_by_key[item_key].get("max_marks"))
+            except GradeParseError as e:
+                print(f"Invalid grade for {key}={item_key}: {e}")
+    return grades
+
+
+def is_grade_response(response) -> bool:
+    """True when a response holds a valid grade, or a non-empty batch of valid grades."""
+    try:
+        parsed = extract_json(response)
+    except GradeParseError:
+        return False
+    if isinstance(parsed, dict) and "marks_awarded" not in parsed:
+        items = _grade_items(parsed, "key")
+    elif isinstance(parsed, list):
+        items = parsed
+    else:
+        items = [parsed]
+    if not items:
+        return False
+    try:
+        for item in items:
+            validate_grade(item)
+    except GradeParseError:
+        return False
+    return True
@@ -0,0 +1,285 @@
+# Import files
+from utils.prompt_compiler import compile_assignment, DEFAULT_ANSWER
+from utils.response_parser import try_parse_grade
+
+# Import libraries
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+
+PENDING = 0
+GRADED = 1
+FAILED = 2
+STATUS_LABELS = ("Pending", "Graded", "Failed")
+# Review table columns the reviewer may edit, and the store field each one changes
+EDITABLE_COLUMNS = {"Marks Awarded": "marks", "Reasoning": "reasoning", "Feedback": "feedback"}
+
+
+class ResultsStore():
+    """Columnar grading results for one assignment, one entry per (student, question).
+
+    Entries are in prompt-row order (student-major, as iter_prompt_rows yields them),
+    so entry = student * n_questions + question. Question data - text, ground truth,
+    rubric criteria, max marks and the prompt prefix - is held once in the compiled
+    assignment, and student ids and answers once per student. Each entry stores only
+    fixed-width columns (question and student codes, marks, status, confidence,
+    provider code, latency) plus a reference to its answer and reasoning strings.
+    Tables and exports are built column-wise with numpy indexing, not per row.
+
+    Reviewer edits are kept next to the model's output rather than over it: each
+    edited cell is one entry in `edit_log` and sets the matching review column, and
+    tables show the review value where there is one. This keeps "score changed"
+    a vectorised comparison and the model's original marks available.
+    """
+
+    def __init__(self, gt, students, rubric):
+        self.compiled = compile_assignment(gt, rubric)
+        self.students = list(students)
+        questions = self.compiled.questions
+        n_questions, n_students = len(questions), len(self.students)
+
+        self.q_ids = np.array([question["q_id"] for question in questions], dtype=object)
+        self.question_max = np.array([question["max_marks"] or 0 for question in questions], dtype=np.float32)
+        self.s_ids = np.array([student.get("id", "") for student in self.students], dtype=object)
+        self.student_feedback = np.full(n_students, None, dtype=object)
+        self._student_index = {str(s_id): i for i, s_id in enumerate(self.s_ids)}
+        self._question_index = {str(q_id): j for j, q_id in enumerate(self.q_ids)}
+
+        size = n_students * n_questions
+        self.student = np.repeat(np.arange(n_students, dtype=np.int32), n_questions)
+        self.question = np.tile(np.arange(n_questions, dtype=np.int16), n_students)
+        self.status = np.zeros(size, dtype=np.int8)
+        self.marks = np.full(size, np.nan, dtype=np.float32)
+        self.confidence = np.full(size, np.nan, dtype=np.float32)
+        self.latency = np.full(size, np.nan, dtype=np.float32)
+        self.provider = np.full(size, -1, dtype=np.int8)
+        self.providers = []
+        self.reasoning = np.full(size, None, dtype=object)
+        self.review_marks = np.full(size, np.nan, dtype=np.float32)
+        self.review_reasoning = np.full(size, None, dtype=object)
+        self.review_feedback = np.full(n_students, None, dtype=object)
+        self.edit_log = []
+        # References to the students' own answer strings, not copies
+        self.answers = np.array(
+            [student.get("answers", {}).get(q_id, DEFAULT_ANSWER) for student in self.students for q_id in self.q_ids],
+            dtype=object
+            ) if size else np.empty(0, dtype=object)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.status)
+
+    def rows(self):
+        """Prompt rows for grading, built lazily one at a time in entry order."""
+        return self.compiled.iter_prompt_rows(self.students)
+
+    def student_rows(self, s_id) -> list:
+        """Prompt rows of one student, e.g. for the preview."""
+        i = self._student_index.get(str(s_id))
+        return [] if i is None else list(self.compiled.iter_prompt_rows([self.students[i]]))
+
+    def position(self, s_id, q_id):
+        """Entry index of (s_id, q_id), or None when not in this assignment."""
+        i, j = self._student_index.get(str(s_id)), self._question_index.get(str(q_id))
+        if i is None or j is None:
+            return None
+        return i * len(self.q_ids) + j
+
+    def _provider_code(self, name) -> int:
+        if name is None:
+            return -1
+        if name not in self.providers:
+            self.providers.append(name)
+        return self.providers.index(name)
+
+    def add_result(self, result):
+        """Store one grading result record (from GradingEngine / BatchEngine)."""
+        position = self.position(result.get("s_id"), result.get("q_id"))
+        if position is None:
+            print(f"Result for unknown row s_id={result.get('s_id')} q_id={result.get('q_id')}")
+            return
+        max_marks = self.question_max[self.question[position]] or result.get("max_marks")
+        grade, error = try_parse_grade(result.get("response"), max_marks)
+        with self._lock:
+            if grade is not None and result.get("error") is None:
+                self.status[position] = GRADED
+                self.marks[position] = grade["marks_awarded"]
+                self.reasoning[position] = grade["reasoning"]
+            else:
+                self.status[position] = FAILED
+                self.marks[position] = np.nan
+                self.reasoning[position] = result.get("error") or error
+            confidence = result.get("confidence")
+            self.confidence[position] = np.nan if confidence is None else confidence
+            latency = result.get("latency")
+            self.latency[position] = np.nan if latency is None else latency
+            self.provider[position] = self._provider_code(result.get("provider"))
+
+    def add_feedback(self, record):
+        """Store a student's overall feedback record ({"s_id", "feedback", "error"})."""
+        i = self._student_index.get(str(record.get("s_id")))
+        if i is not None:
+            with self._lock:
+                self.student_feedback[i] = record.get("feedback")
+
+    def apply_edit(self, position, column, value) -> bool:
+        """Record one reviewer edit of a review table cell; returns False when nothing changed.
+
+        Feedback is per student, so editing it on any of a student's rows changes it on
+        all of them. Clearing a mark or text restores the model's value.
+        """
+        field = EDITABLE_COLUMNS.get(column)
+        if field is None:
+            raise ValueError(f"Column {column!r} cannot be edited")
+        student, question = int(self.student[position]), int(self.question[position])
+        if field == "marks":
+            value = None if value is None or pd.isna(value) else float(value)
+            max_marks = float(self.question_max[question])
+            if value is not None and (value < 0 or (max_marks and value > max_marks)):
+                raise ValueError(f"Marks for Q{self.q_ids[question]} must be between 0 and {max_marks:g}")
+        elif value is not None and not isinstance(value, str):
+            value = None if pd.isna(value) else str(value)
+        if value == "":
+            value = None
+
+        with self._lock:
+            if field == "marks":
+                column_values, model_values, index = self.review_marks, self.marks, position
+            elif field == "reasoning":
+                column_values, model_values, index = self.review_reasoning, self.reasoning, position
+            else:
+                column_values, model_values, index = self.review_feedback, self.student_feedback, student
+            previous = column_values[index]
+            if field == "marks":
+                previous = None if np.isnan(previous) else float(previous)
+                column_values[index] = np.nan if value is None else value
+            else:
+                column_values[index] = value
+            if previous == value:
+                return False
+            # Log the value the reviewer saw, which is the model's until it is first edited
+            old = model_values[index] if previous is None else previous
+            if field == "marks":
+                old = None if np.isnan(old) else float(old)
+            self.edit_log.append({
+                "s_id": self.s_ids[student],
+                "q_id": None if field == "feedback" else self.q_ids[question],
+                "field": field,
+                "old": old,
+                "new": value,
+                "edited_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            })
+        return True
+
+    def feedback(self) -> dict:
+        """{s_id: overall feedback} with the reviewer's edits applied."""
+        with self._lock:
+            feedback = np.where(pd.isna(self.review_feedback), self.student_feedback, self.review_feedback)
+        return dict(zip(self.s_ids.astype(str), feedback))
+
+    def filter_positions(self, student=None, questions=None, below_confidence=None, changed_only=False):
+        """Entry indices matching the review filters, in entry order.
+
+        student: case-insensitive substring of the student id. questions: question ids to
+        keep. below_confidence: keep the answers that would not be auto-published at this
+        threshold (0-1) - graded below it, unscored, failed or pending.
+        changed_only: keep answers whose mark the reviewer changed.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if student:
+            matches = pd.Series(self.s_ids.astype(str)).str.contains(student, case=False, regex=False).to_numpy()
+            mask &= matches[self.student]
+        if questions:
+            mask &= np.isin(self.q_ids.astype(str), [str(q_id) for q_id in questions])[self.question]
+        with self._lock:
+            if below_confidence is not None:
+                mask &= ~((self.status == GRADED) & (self.confidence >= below_confidence))
+            if changed_only:
+                mask &= ~np.isnan(self.review_marks) & (self.review_marks != self.marks)
+        return np.flatnonzero(mask)
+
+    def changed_count(self) -> int:
+        """Answers whose mark the reviewer changed."""
+        with self._lock:
+            return int(np.count_nonzero(~np.isnan(self.review_marks) & (self.review_marks != self.marks)))
+
+    def review_counts(self, threshold) -> dict:
+        """How many answers are auto-published at a 0-1 confidence threshold (graded at or above
+        it and not changed by the reviewer), reviewed (mark entered by the reviewer) or still
+        need review."""
+        with self._lock:
+            reviewed = ~np.isnan(self.review_marks)
+            auto = (self.status == GRADED) & (self.confidence >= threshold) & ~reviewed
+        auto_published, reviewed = int(np.count_nonzero(auto)), int(np.count_nonzero(reviewed))
+        return {
+            "auto_published": auto_published,
+            "reviewed": reviewed,
+            "needs_review": len(self) - auto_published - reviewed,
+        }
+
+    def counts(self) -> dict:
+        with self._lock:
+            counts = np.bincount(self.status, minlength=len(STATUS_LABELS))
+        return {label.lower(): int(count) for label, count in zip(STATUS_LABELS, counts)}
+
+    def nbytes(self) -> int:
+        """Bytes held by the fixed-width and reference columns (not the strings they point to)."""
+        columns = (self.student, self.question, self.status, self.marks, self.confidence, self.latency,
+                   self.provider, self.reasoning, self.answers)
+        return sum(column.nbytes for column in columns)
+
+    def frame(self, positions=None) -> pd.DataFrame:
+        """Typed results frame for exports - one row per entry (or per given entry index),
+        with categorical status and provider and reviewer edits applied."""
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions, dtype=np.int64)
+        student, question = self.student[positions], self.question[positions]
+        with self._lock:
+            marks, status, provider = self.marks[positions], self.status[positions], self.provider[positions]
+            confidence, latency, reasoning = self.confidence[positions], self.latency[positions], self.reasoning[positions]
+            review_marks, review_reasoning = self.review_marks[positions], self.review_reasoning[positions]
+            feedback, review_feedback = self.student_feedback[student], self.review_feedback[student]
+            providers = list(self.providers)
+        edited = ~np.isnan(review_marks)
+        marks = np.where(edited, review_marks, marks)
+        reasoning = np.where(pd.isna(review_reasoning), reasoning, review_reasoning)
+        feedback = np.where(pd.isna(review_feedback), feedback, review_feedback)
+        return pd.DataFrame({
+            "s_id": self.s_ids.astype(str)[student],
+            "q_id": self.q_ids.astype(str)[question],
+            "answer": self.answers[positions],
+            "marks_awarded": marks,
+            "max_marks": self.question_max[question],
+            "status": pd.Categorical.from_codes(status, categories=STATUS_LABELS),
+            "reasoning": reasoning,
+            "confidence": confidence,
+            "provider": pd.Categorical.from_codes(provider, categories=providers),
+            "latency": latency,
+            "feedback": feedback,
+        })
+
+    def review_table(self, positions=None) -> pd.DataFrame:
+        """The review table shown in the app - for all entries or one page of entry indices -
+        filled in with the grades received so far and the reviewer's edits."""
+        frame = self.frame(positions)
+        marks, max_marks = frame["marks_awarded"], frame["max_marks"]
+        integral = bool(np.all(np.isnan(marks) | (marks == np.round(marks))))
+        marks = pd.array(marks.round(), dtype="Int64") if integral else pd.array(marks, dtype="Float64")
+        if np.all(max_marks == np.round(max_marks)):
+            max_marks = max_marks.astype(np.int64)
+
+        pending = (frame["status"] == STATUS_LABELS[PENDING]).to_numpy() & frame["reasoning"].isna().to_numpy()
+        reasoning = frame["reasoning"].to_numpy(copy=True)
+        reasoning[pending] = STATUS_LABELS[PENDING]
+        score = pd.Series(marks).astype("string").fillna("-") + " / " + max_marks.astype(str)
+        return pd.DataFrame({
+            "id": frame["s_id"],
+            "Q": frame["q_id"],
+            "Student Answers": frame["answer"],
+            "Max Marks": max_marks,
+            "Marks Awarded": marks,
+            "Feedback": frame["feedback"].fillna("-"),
+            "Reasoning": reasoning,
+            "Score": score,
+            "Confidence": frame["confidence"].to_numpy() * 100,
+        })
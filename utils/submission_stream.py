@@ -0,0 +1,56 @@
+# Import files
+from utils.helper_functions import iter_prompt_rows
+
+# Import libraries
+from pathlib import Path
+import json
+
+SUBMISSION_SUFFIXES = (".json", ".jsonl")
+
+
+def iter_jsonl(path):
+    """Yield one JSON object per non-empty line of a JSON Lines file."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping malformed line {line_no} in {path}: {e}")
+
+
+def iter_submission_file(path):
+    """Yield the student records in a single .jsonl or .json file."""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        yield from iter_jsonl(path)
+        return
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(data, list):
+        yield from data
+    else:
+        yield data
+
+
+def iter_students(path):
+    """Yield student records from a .jsonl file, a .json file or a directory of them.
+
+    Only one file is open at a time and JSONL files are read line by line, so memory
+    stays flat regardless of cohort size.
+    """
+    path = Path(path)
+    if not path.is_dir():
+        yield from iter_submission_file(path)
+        return
+
+    for file in sorted(path.iterdir()):
+        if file.is_file() and file.suffix in SUBMISSION_SUFFIXES:
+            yield from iter_submission_file(file)
+
+
+def stream_prompt_rows(gt, rubric, submissions_path):
+    """Yield prompt rows for every student under submissions_path, reading students lazily."""
+    return iter_prompt_rows(gt, iter_students(submissions_path), rubric)